@@ -0,0 +1,288 @@
+# One snippet per line; statements within a snippet are separated by ';'.
+# Used by benchmarks/verify_assembler.py to compare the in-process assembler with GNU as.
+addi r3, r4, 5
+addi r3, r4, -5
+addis r3, r0, 0x8000
+li r3, -1
+lis r3, 0x8034
+ori r3, r3, 0x1234
+oris r3, r3, 0xFFFF
+xori r5, r6, 7
+xoris r5, r6, 7
+andi. r3, r4, 0xFF
+andis. r3, r4, 0xFF
+mulli r3, r4, 100
+subfic r3, r4, 100
+addic r3, r4, 1
+addic. r3, r4, 1
+cmpwi r3, 0
+cmpwi cr7, r3, -1
+cmplwi r3, 0xFFFF
+cmplwi cr1, r3, 1
+cmpw r3, r4
+cmpw cr6, r3, r4
+cmplw cr2, r3, r4
+twi 31, r0, 0
+tw 4, r3, r4
+trap
+lwz r3, 8(r1)
+lwz r3, -8(r1)
+lwzu r3, 8(r1)
+lbz r3, 0(r4)
+lbzu r3, 1(r4)
+lhz r3, 2(r4)
+lhzu r3, 2(r4)
+lha r3, 2(r4)
+lhau r3, 2(r4)
+stw r0, 4(r1)
+stwu r1, -32(r1)
+stb r3, 0(r4)
+stbu r3, 1(r4)
+sth r3, 0(r4)
+sthu r3, 2(r4)
+lmw r29, 0x14(r1)
+stmw r29, 0x14(r1)
+lfs f1, 0(r3)
+lfsu f1, 4(r3)
+lfd f1, 8(r3)
+lfdu f1, 8(r3)
+stfs f1, 0(r3)
+stfsu f1, 4(r3)
+stfd f31, 8(r1)
+stfdu f1, 8(r3)
+rlwinm r3, r4, 2, 0, 29
+rlwinm. r3, r4, 2, 0, 29
+rlwimi r3, r4, 8, 16, 23
+rlwnm r3, r4, r5, 0, 31
+slwi r3, r4, 2
+srwi r3, r4, 2
+srwi. r3, r4, 31
+clrlwi r3, r4, 16
+clrrwi r3, r4, 2
+rotlwi r3, r4, 8
+rotrwi r3, r4, 8
+rotlw r3, r4, r5
+extlwi r3, r4, 8, 4
+extrwi r3, r4, 8, 4
+inslwi r3, r4, 8, 4
+insrwi r3, r4, 8, 4
+clrlslwi r3, r4, 20, 2
+add r3, r4, r5
+add. r3, r4, r5
+addo r3, r4, r5
+addo. r3, r4, r5
+addc r3, r4, r5
+adde r3, r4, r5
+addze r3, r4
+addme r3, r4
+subf r3, r4, r5
+subf. r3, r4, r5
+sub r3, r4, r5
+subc r3, r4, r5
+subfc r3, r4, r5
+subfe r3, r4, r5
+subfze r3, r4
+subfme r3, r4
+neg r3, r4
+nego. r3, r4
+mullw r3, r4, r5
+mulhw r3, r4, r5
+mulhwu r3, r4, r5
+divw r3, r4, r5
+divwu r3, r4, r5
+divwuo. r3, r4, r5
+and r3, r4, r5
+and. r3, r4, r5
+andc r3, r4, r5
+or r3, r4, r5
+orc r3, r4, r5
+xor r3, r4, r5
+nand r3, r4, r5
+nor r3, r4, r5
+eqv r3, r4, r5
+slw r3, r4, r5
+srw r3, r4, r5
+sraw r3, r4, r5
+srawi r3, r4, 5
+srawi. r3, r4, 31
+cntlzw r3, r4
+extsb r3, r4
+extsh. r3, r4
+mr r3, r4
+mr. r3, r4
+not r3, r4
+nop
+cmp cr0, 0, r3, r4
+cmpl cr1, 0, r3, r4
+lwzx r3, r4, r5
+lwzux r3, r4, r5
+lbzx r3, r4, r5
+lhzx r3, r4, r5
+lhax r3, r4, r5
+lwbrx r3, r4, r5
+lhbrx r3, r4, r5
+stwx r3, r4, r5
+stwux r3, r4, r5
+stbx r3, r4, r5
+sthx r3, r4, r5
+stwbrx r3, r4, r5
+sthbrx r3, r4, r5
+lwarx r3, 0, r4
+stwcx. r3, 0, r4
+lfsx f1, r3, r4
+lfdx f1, r3, r4
+stfsx f1, r3, r4
+stfdx f1, r3, r4
+stfiwx f1, r3, r4
+lswi r3, r4, 8
+stswi r3, r4, 8
+dcbst 0, r3
+dcbf 0, r3
+dcbt 0, r3
+dcbtst 0, r3
+dcbi 0, r3
+icbi 0, r3
+dcbz 0, r3
+sync
+isync
+eieio
+sc
+rfi
+mfcr r3
+mtcrf 0xFF, r3
+mtcr r3
+mfmsr r3
+mtmsr r3
+mflr r0
+mtlr r0
+mfctr r12
+mtctr r12
+mfxer r3
+mtxer r3
+mfspr r3, 1008
+mtspr 1008, r3
+mfspr r3, 912
+mtspr 920, r3
+mfsrr0 r3
+mtsrr1 r3
+mfdec r3
+mtdec r3
+mfsprg0 r3
+mftb r3
+mftbu r3
+mfsr r3, 5
+mtsr 5, r3
+mcrf cr1, cr0
+mcrxr cr1
+crxor 6, 6, 6
+cror 2, 1, 2
+crand 0, 1, 2
+crandc 0, 1, 2
+crnand 0, 1, 2
+crnor 0, 1, 2
+creqv 0, 1, 2
+crorc 0, 1, 2
+crset 6
+crclr 6
+crmove 1, 2
+crnot 1, 2
+blr
+blrl
+bctr
+bctrl
+beqlr
+bnelr cr1
+bltctr
+bgectrl
+bdnzlr
+bclr 20, 0
+bcctr 20, 0
+fadd f1, f2, f3
+fadds f1, f2, f3
+fsub f1, f2, f3
+fsubs f1, f2, f3
+fmul f1, f2, f3
+fmuls f1, f2, f3
+fdiv f1, f2, f3
+fdivs f1, f2, f3
+fmadd f1, f2, f3, f4
+fmadds f1, f2, f3, f4
+fmsub f1, f2, f3, f4
+fmsubs f1, f2, f3, f4
+fnmadd f1, f2, f3, f4
+fnmadds f1, f2, f3, f4
+fnmsub f1, f2, f3, f4
+fnmsubs f1, f2, f3, f4
+fsel f1, f2, f3, f4
+fres f1, f2
+frsqrte f1, f2
+fabs f1, f2
+fnabs f1, f2
+fneg f1, f2
+fmr f1, f2
+fmr. f1, f2
+frsp f1, f2
+fctiw f1, f2
+fctiwz f1, f2
+fcmpu cr0, f1, f2
+fcmpo cr1, f1, f2
+mffs f1
+mtfsf 0xFF, f1
+mtfsfi 7, 0
+mtfsb0 31
+mtfsb1 30
+mcrfs cr0, cr1
+ps_add f1, f2, f3
+ps_sub. f1, f2, f3
+ps_mul f1, f2, f3
+ps_div f1, f2, f3
+ps_madd f1, f2, f3, f4
+ps_msub f1, f2, f3, f4
+ps_nmadd f1, f2, f3, f4
+ps_nmsub f1, f2, f3, f4
+ps_sum0 f1, f2, f3, f4
+ps_sum1 f1, f2, f3, f4
+ps_muls0 f1, f2, f3
+ps_muls1 f1, f2, f3
+ps_madds0 f1, f2, f3, f4
+ps_madds1 f1, f2, f3, f4
+ps_sel f1, f2, f3, f4
+ps_res f1, f2
+ps_rsqrte f1, f2
+ps_neg f1, f2
+ps_mr f1, f2
+ps_nabs f1, f2
+ps_abs f1, f2
+ps_cmpu0 cr1, f1, f2
+ps_cmpo0 cr1, f1, f2
+ps_cmpu1 cr1, f1, f2
+ps_cmpo1 cr1, f1, f2
+ps_merge00 f1, f2, f3
+ps_merge01 f1, f2, f3
+ps_merge10 f1, f2, f3
+ps_merge11 f1, f2, f3
+psq_l f1, 8(r3), 0, 2
+psq_lu f1, -8(r3), 1, 7
+psq_st f1, 8(r3), 0, 0
+psq_stu f1, 8(r3), 1, 3
+psq_lx f1, r3, r4, 0, 1
+psq_stx f1, r3, r4, 1, 2
+psq_lux f1, r3, r4, 0, 3
+psq_stux f1, r3, r4, 1, 4
+dcbz_l r3, r4
+start: li r3, 0; loop: addi r3, r3, 1; cmpwi r3, 10; blt loop; bne cr1, done; done: blr
+loop: beq+ loop; beq- loop; bne+ done; bne- done; bdnz+ loop; bdnz- done; done: blr
+loop: bdnzt 4*cr1+eq, loop; bdnzf lt, done; bc 12, 2, loop; bcl 4, 6, done; done: beqlr+; bnelr-; bnectr+
+1: b 1f; b 1b; 1: b 1b; bl 1f; 1: blr
+.set VALUE, 0x80341234; lis r3, VALUE@ha; addi r3, r3, VALUE@l; ori r3, r3, VALUE@l; lis r4, VALUE@h
+.set OFFSET, 0x18; lwz r3, OFFSET(r4); stw r3, OFFSET+4(r4); lwz r5, -OFFSET(r1)
+x = 5; li r3, x; .set x, x+1; li r4, x; .equ y, x*2; li r5, y
+li r3, (1+2)*3; li r4, 1 + 2 & 3; li r5, 8 >> 1; li r6, -(4 << 2); li r7, ~0; li r8, 7 / 2; li r9, -7 % 2
+start: b end; .long end - start; end: blr
+.long 0xDEADBEEF, -1; .short 0x1234, -2; .byte 1, 2, 'a'; .align 2; blr
+.float 1.5, -2; .double 0.1; .asciz "hi\n"; .balign 4, 0xFF; .space 8; .align 3; blr
+.string "a\"b", "\x41\101"; .ascii "xyz"; .align 2; nop
+li r3, 1; .align 4; blr
+mfspr r3, lr; mtspr ctr, r3
+lwz %r3, 4(%r1); addi sp, sp, -16; lwz r2, 0(rtoc)
+.globl main; .type main, @function; main: blr; .size main, .-main
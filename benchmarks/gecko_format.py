@@ -0,0 +1,69 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+#
+# Measures how fast payloads are turned into Gecko code text: the row
+# formatter convert_bytes_to_gecko uses now, against the per-byte loop it
+# replaced, on a 1 MB payload by default.
+#
+# Run from the repository root:
+#   python benchmarks/gecko_format.py [megabytes] [runs]
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from gecko import convert_bytes_to_gecko, format_gecko_rows
+
+def per_byte_rows(data):
+    # The previous formatter: one string per byte with modulo checks, then split into lines
+    code = []
+    counter = 0
+    for b in data:
+        if counter % 8 == 0 and counter != 0:
+            code.append("\n")
+        if counter % 4 == 0 and counter % 8 != 0 and counter != 0:
+            code.append(" ")
+        code.append(f"{b:02X}")
+        counter += 1
+    if counter % 8 != 0:
+        code.append(" 00000000")
+    return "".join(code).splitlines()
+
+def best_of(runs, function, *args):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    data = os.urandom(int(megabytes * 1024 * 1024))
+
+    if format_gecko_rows(data) != per_byte_rows(data):
+        print("The row formatter and the per-byte loop disagree.")
+        sys.exit(1)
+
+    size = len(data) / (1024 * 1024)
+    rows = best_of(runs, format_gecko_rows, data)
+    loop = best_of(runs, per_byte_rows, data)
+    with tempfile.TemporaryDirectory() as work_dir:
+        output_file = os.path.join(work_dir, "b.out")
+        convert = best_of(runs, convert_bytes_to_gecko, data, "80001000", output_file)
+
+    print(f"{size:.2f} MB payload, best of {runs}:")
+    print(f"  row formatter:          {rows * 1000:8.1f} ms  {size / rows:8.1f} MB/s")
+    print(f"  per-byte loop:          {loop * 1000:8.1f} ms  {size / loop:8.1f} MB/s  ({loop / rows:.1f}x slower)")
+    print(f"  convert_bytes_to_gecko: {convert * 1000:8.1f} ms  {size / convert:8.1f} MB/s  (including the file write)")
+
+if __name__ == "__main__":
+    main()
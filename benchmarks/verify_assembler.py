@@ -0,0 +1,91 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+#
+# Checks the in-process assembler against the external Gekko assembler
+# byte for byte on benchmarks/assembler_corpus.s, and compares how long
+# each takes. Needs the toolchain (native powerpc-eabi tools, or the bundled
+# ones under wine).
+#
+# Run from the repository root:
+#   python benchmarks/verify_assembler.py [corpus]
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from elf32 import ElfFile
+from gekko_assembler import assemble, AssemblerError
+from toolchain import get_toolchain
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assembler_corpus.s")
+
+def text_section(elf_path):
+    """Return the .text contents of an ELF32 object"""
+    with open(elf_path, "rb") as f:
+        elf = ElfFile(f.read())
+    section = elf.section_by_name(".text")
+    return bytes(elf.section_data(section)) if section is not None else b""
+
+def external_assemble(toolchain, source, work_dir):
+    asm_path = os.path.join(work_dir, "snippet.s")
+    out_path = os.path.join(work_dir, "snippet.o")
+    with open(asm_path, "w") as f:
+        f.write(source + "\n")
+    cmd = toolchain.command("as") + ["-a32", "-mbig", "-mregnames", "-mgekko", "-o", out_path, asm_path]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=toolchain.env)
+    if result.returncode != 0:
+        return None
+    return text_section(out_path)
+
+def main():
+    corpus = sys.argv[1] if len(sys.argv) > 1 else CORPUS
+    toolchain = get_toolchain()
+    if toolchain.command("as") is None:
+        return
+    if not toolchain.native and toolchain.wine.enabled and shutil.which("wine") is None:
+        print("The bundled assembler needs wine, which is not installed.")
+        return
+
+    with open(corpus) as f:
+        snippets = [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+
+    matched = mismatched = fallbacks = 0
+    internal_time = external_time = 0.0
+    with tempfile.TemporaryDirectory() as work_dir:
+        for snippet in snippets:
+            start = time.perf_counter()
+            try:
+                ours = assemble(snippet)
+            except AssemblerError as e:
+                ours = e
+            internal_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            theirs = external_assemble(toolchain, snippet, work_dir)
+            external_time += time.perf_counter() - start
+
+            if isinstance(ours, AssemblerError):
+                fallbacks += 1
+                print(f"FALLBACK {snippet}\n         {ours}")
+            elif ours == theirs:
+                matched += 1
+            else:
+                mismatched += 1
+                print(f"MISMATCH {snippet}\n         ours   {ours.hex()}\n         as     {theirs.hex() if theirs is not None else 'error'}")
+
+    count = len(snippets)
+    print(f"{count} snippets: {matched} identical, {mismatched} different, {fallbacks} left to the external assembler")
+    print(f"  in-process: {internal_time / count * 1000:8.3f} ms per snippet")
+    print(f"  external:   {external_time / count * 1000:8.3f} ms per snippet ({toolchain.describe()})")
+    sys.exit(1 if mismatched else 0)
+
+if __name__ == "__main__":
+    main()
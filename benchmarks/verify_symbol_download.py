@@ -0,0 +1,153 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+#
+# Checks that symbol downloads revalidate instead of re-downloading: serves a
+# symbol file with an ETag and Last-Modified from a local http.server, then
+# checks the first fetch, a 304 revalidation, a changed file, a server error
+# and a moved URL, and compares how long a download and a revalidation take.
+#
+# Run from the repository root:
+#   python benchmarks/verify_symbol_download.py [kilobytes]
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from downloadSymbols import download_symbol_files, get_session, prefetch_symbol_files
+
+GAME_ID = "GTEST01"
+
+
+class SymbolServer(ThreadingHTTPServer):
+    """Serves one symbol file, answering conditional requests the way a CDN would"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SymbolHandler)
+        self.requests = []
+        self.status = 200
+        self.set_body(b"")
+
+    def set_body(self, body):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    def url(self, path="/symbols.sym"):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class SymbolHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+        if server.status != 200:
+            self.send_response(server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.send_header("ETag", server.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", server.etag)
+        self.send_header("Last-Modified", server.last_modified)
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def symbol_body(kilobytes, seed):
+    lines = []
+    size = 0
+    address = 0x80003100
+    while size < kilobytes * 1024:
+        line = f"{address:08X} 00000010 {address:08X} 0 func_{seed}_{address:08X}\n"
+        lines.append(line)
+        size += len(line)
+        address += 0x10
+    return "".join(lines).encode("utf-8")
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    kilobytes = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    server = SymbolServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = get_session()
+    failures = []
+
+    def check(name, condition):
+        print(f"{'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    try:
+        with tempfile.TemporaryDirectory() as symbol_dir:
+            mapping = {GAME_ID: server.url()}
+            symbol_path = os.path.join(symbol_dir, f"{GAME_ID}.sym")
+
+            def fetch():
+                return download_symbol_files(GAME_ID, symbol_dir, mapping, session)
+
+            def read_symbols():
+                with open(symbol_path, "rb") as f:
+                    return f.read()
+
+            server.set_body(symbol_body(kilobytes, 1))
+            ok, download_time = timed(fetch)
+            check("first fetch downloads the file", ok and read_symbols() == server.body)
+            check("first fetch is unconditional", server.requests[-1][1:] == (None, None))
+
+            stamp = os.stat(symbol_path).st_mtime_ns
+            ok, revalidate_time = timed(fetch)
+            check("second fetch sends the stored ETag and Last-Modified",
+                  server.requests[-1][1:] == (server.etag, server.last_modified))
+            check("304 keeps the file untouched", ok and os.stat(symbol_path).st_mtime_ns == stamp)
+
+            server.set_body(symbol_body(kilobytes, 2))
+            ok = fetch()
+            check("changed file is downloaded again", ok and read_symbols() == server.body)
+
+            body = server.body
+            server.status = 500
+            ok = fetch()
+            check("server error reports failure and keeps the file", not ok and read_symbols() == body)
+            server.status = 200
+
+            mapping[GAME_ID] = server.url("/moved.sym")
+            ok = fetch()
+            check("moved URL is fetched unconditionally", ok and server.requests[-1] == ("/moved.sym", None, None))
+
+            before = len(server.requests)
+            results = prefetch_symbol_files([GAME_ID, "GNONE01"], symbol_dir, {**mapping, "GNONE01": server.url()}, only_existing=True)
+            check("prefetch revalidates only files already held", results == {GAME_ID: True} and len(server.requests) == before + 1)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"{kilobytes} KB symbol file")
+    print(f"  download:     {download_time * 1000:8.1f} ms")
+    print(f"  revalidation: {revalidate_time * 1000:8.1f} ms")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
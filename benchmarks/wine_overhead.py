@@ -0,0 +1,67 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+#
+# Measures the per-invocation cost of running a bundled tool under wine,
+# once as back-to-back calls that each start wine on their own (the old
+# behaviour) and once with the persistent session GameLogic now keeps warm.
+#
+# Run from the repository root on Linux or macOS:
+#   python benchmarks/wine_overhead.py [runs]
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from wine_session import WineSession
+
+TOOL = os.path.join("dependencies", "codewrite", "powerpc-gekko-as.exe")
+
+def run_tool(session):
+    subprocess.run(session.command([TOOL, "--version"]), env=session.env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+def kill_wineserver(session):
+    subprocess.run(["wineserver", "-k"], env=session.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    subprocess.run(["wineserver", "-w"], env=session.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    session = WineSession()
+    if not session.enabled:
+        print("Running on Windows; there is no wine overhead to measure.")
+        return
+
+    # Without the session wine starts its own wineserver, which lingers between calls made back to back
+    kill_wineserver(session)
+    unmanaged = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_tool(session)
+        unmanaged.append(time.perf_counter() - start)
+
+    kill_wineserver(session)
+    session.start()
+    warm = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            run_tool(session)
+            warm.append(time.perf_counter() - start)
+    finally:
+        session.stop()
+
+    unmanaged_ms = sum(unmanaged) / runs * 1000
+    warm_ms = sum(warm) / runs * 1000
+    print(f"{runs} runs of {TOOL} --version")
+    print(f"  without a session:     {unmanaged_ms:8.1f} ms per invocation")
+    print(f"  persistent wineserver: {warm_ms:8.1f} ms per invocation")
+    print(f"  saved:                 {unmanaged_ms - warm_ms:8.1f} ms per invocation ({unmanaged_ms / warm_ms:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+#
+# Builds a whole hook library in one go. The manifest is a JSON list of
+# entries such as
+#   {"source": "hooks/coins.c", "address": "8005A2C4", "game": "GMPE01_00"}
+# with optional "mode" ("C Code", "PowerPC ASM" or "GeckoOS Code", picked
+# from the file extension by default), "name" and "link" (resolve game
+# symbols with the linker). Source paths are relative to the manifest.
+#
+# Run from the repository root:
+#   python src/batch.py manifest.json [-o codes.txt] [-j workers] [--optimize]
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import utils
+from codelist import CodeList
+from gecko_optimizer import optimize_code_list
+from workspace import Workspace
+from wine_session import get_wine_session
+
+MODES_BY_EXTENSION = {
+    ".c": "C Code",
+    ".asm": "PowerPC ASM",
+    ".s": "PowerPC ASM",
+    ".txt": "GeckoOS Code"
+}
+ID_TO_GAME = {game_id: game for game, game_id in utils.GAME_TO_ID.items() if game_id}
+
+
+class _Field:
+    """Stands in for the GUI widget or variable GameLogic reads a value from"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, *args):
+        return self.value
+
+
+class BatchEntry:
+    """One manifest entry, shaped like the GUI state GameLogic builds from"""
+
+    def __init__(self, name, source, mode, address, game=None, link=False):
+        self.name = name
+        self.source = source
+        self.mode = mode
+        self.selected_game = game
+        self.inputCode = _Field(None)
+        self.insertionAddress = _Field(address)
+        self.link_symbols_var = _Field(link)
+
+
+def load_manifest(manifest_path, default_game=None):
+    """Read a manifest into BatchEntry objects; raises ValueError on a malformed entry"""
+    with open(manifest_path, "r") as f:
+        raw_entries = json.load(f)
+    if not isinstance(raw_entries, list):
+        raise ValueError("The manifest must be a JSON list of entries.")
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    for index, raw in enumerate(raw_entries):
+        if not isinstance(raw, dict) or "source" not in raw or "address" not in raw:
+            raise ValueError(f"Entry {index + 1} needs at least a source and an address.")
+
+        source = os.path.join(manifest_dir, raw["source"])
+        mode = raw.get("mode") or MODES_BY_EXTENSION.get(os.path.splitext(source)[1].lower())
+        if mode not in MODES_BY_EXTENSION.values():
+            raise ValueError(f"Entry {index + 1}: cannot tell the input mode of {raw['source']}.")
+
+        # Games may be given by name or by ID
+        game = raw.get("game", default_game)
+        game = ID_TO_GAME.get(game, game) or None
+        if game is not None and game not in utils.GAME_TO_ID:
+            raise ValueError(f"Entry {index + 1}: unknown game {game}.")
+
+        name = raw.get("name") or os.path.splitext(os.path.basename(source))[0]
+        address = str(raw["address"]).lower().removeprefix("0x")
+        entries.append(BatchEntry(name, source, mode, address, game, bool(raw.get("link", False))))
+    return entries
+
+
+_logic = None
+
+def _init_worker():
+    global _logic
+    from game_logic import GameLogic
+    _logic = GameLogic()
+
+def build_entry(entry):
+    """Build one entry in a worker; returns (codes, None) or (None, error message)"""
+    try:
+        with open(entry.source, "r") as f:
+            entry.inputCode = _Field(f.read())
+        if entry.mode == "GeckoOS Code":
+            problems = CodeList.parse(entry.inputCode.get()).validate()
+            if problems:
+                return None, "; ".join(f"line {line}: {message}" for line, message in problems)
+            return entry.inputCode.get().strip(), None
+
+        with Workspace() as job:
+            _logic.build_gecko(entry, entry.mode, job)
+            with open(job.file("b.out"), "r") as output_file:
+                return output_file.read().strip(), None
+
+    except subprocess.CalledProcessError as e:
+        return None, e.stderr.decode().strip() if e.stderr else str(e)
+    except Exception as e:
+        return None, str(e)
+
+def build_batch(entries, max_workers=None):
+    """Build every entry on a bounded process pool, returning (codes, error) pairs in manifest order"""
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(entries)))
+
+    # Workers reuse one wineserver instead of racing to start their own
+    wine = get_wine_session()
+    wine.start()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            return list(pool.map(build_entry, entries))
+    finally:
+        wine.stop()
+
+def format_code_list(entries, results):
+    """Join the built entries into one Gecko code list, one `$name` code per entry"""
+    codes = []
+    for entry, (output_text, error) in zip(entries, results):
+        if error is None:
+            codes.append(f"${entry.name}\n{output_text}\n")
+    return "\n".join(codes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build every hook in a manifest into one Gecko code list.")
+    parser.add_argument("manifest")
+    parser.add_argument("-o", "--output", default="codes.txt")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--game", default=None, help="game name or ID for entries that do not name one")
+    parser.add_argument("--optimize", action="store_true", help="optimize the code list so the codehandler does less each frame")
+    args = parser.parse_args()
+
+    try:
+        entries = load_manifest(args.manifest, args.game)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    if not entries:
+        print("The manifest has no entries.")
+        return
+
+    results = build_batch(entries, args.jobs)
+    code_text = format_code_list(entries, results)
+    if args.optimize:
+        codes, report = optimize_code_list(CodeList.parse(code_text))
+        code_text = codes.serialize()
+        print(report)
+    with open(args.output, "w") as f:
+        f.write(code_text)
+
+    failed = [(entry, error) for entry, (_, error) in zip(entries, results) if error is not None]
+    for entry, error in failed:
+        print(f"FAILED {entry.name} ({entry.source})\n       {error}")
+    print(f"Built {len(entries) - len(failed)} of {len(entries)} entries into {args.output}.")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,106 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from version import appVersion
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_EXTENSION = ".out"
+
+# Part of every key, so entries from older converters are never served. Bump
+# it whenever the same inputs start producing different Gecko code
+OUTPUT_FORMAT = 2
+
+
+class BuildCache:
+    """Content-addressed on-disk cache of build outputs with LRU eviction
+
+    Entries are files named after their key. Recency is kept in the file
+    mtimes so it survives restarts, and the least recently used entries are
+    evicted once the total size passes max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = None  # key -> size, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the parts that determine a build's output, and the code that builds it, into a cache key"""
+        return hashlib.sha256(json.dumps([OUTPUT_FORMAT, appVersion, *parts]).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_EXTENSION)
+
+    def _load_entries(self):
+        if self._entries is not None:
+            return
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    if entry.is_file() and entry.name.endswith(ENTRY_EXTENSION):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, entry.name[:-len(ENTRY_EXTENSION)], stat.st_size))
+        except FileNotFoundError:
+            pass
+        entries.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._entries.values())
+
+    def get(self, key):
+        """Return the cached output for a key, or None on a miss"""
+        with self._lock:
+            self._load_entries()
+            if key in self._entries:
+                try:
+                    with open(self._entry_path(key), 'rb') as entry_file:
+                        data = entry_file.read()
+                    os.utime(self._entry_path(key))
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return data
+                except OSError:
+                    self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Store the output of a build and evict old entries past the size cap"""
+        with self._lock:
+            self._load_entries()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as entry_file:
+                entry_file.write(data)
+            os.replace(temp_path, self._entry_path(key))
+
+            self._total_bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.remove(self._entry_path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            self._load_entries()
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._total_bytes}
@@ -9,184 +9,223 @@ import subprocess
 import sys
 import os
 import re
-import platform
-from CTkMessagebox import CTkMessagebox
+import threading
+from toolchain import get_toolchain
+from symbol_processor import ASM_IDENTIFIER_PATTERN
 
-def get_gcc_command():
-    if getattr(sys, 'frozen', False):
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.getcwd()
-
-    gcc_path = os.path.join(base_path, "dependencies", "powerpc-gcc", "bin", "powerpc-eabi-gcc.exe")
-
-    if os.path.exists(gcc_path):
-        return [gcc_path]
-    else:
-        print(f"Error: GCC executable not found at {gcc_path}")
-        return None
-
-def compile_to_asm(filename):
-    if not filename.endswith(".c"):
-        print("Error: Please provide a valid C file with a .c extension.")
-        return
-    
-    base_name = os.path.splitext(filename)[0]
-    
-    cmd = get_gcc_command()
-    if not platform.system() == "Windows":
-        cmd = ["wine"] + cmd
-        env = {**os.environ, "WINEDEBUG": "-all"}
-    else:
-        env = None
-
-    cmd.extend(["-mcpu=powerpc", "-S", "-fno-asynchronous-unwind-tables", "-fno-ident", "-fno-common", "-O1", "-fno-optimize-sibling-calls", filename, "-o", f"{base_name}.s"])
-
-    try:
-        result = subprocess.run(cmd, check=False, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        if result.returncode != 0:
-            error_msg = result.stderr.decode() if result.stderr else "Unknown error occurred."
-            CTkMessagebox(message=f"Error during compilation: {error_msg}", title="Compilation Error", icon="warning", option_1="OK")
-            return False  # Indicate failure
-
-        print(f"Compiled {filename} to {base_name}.s successfully.")
-        return True
-    
-    except Exception as e:
-        CTkMessagebox(message=f"An unexpected error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
-        return False
-
-def append_codewrite_to_asm(asm_filename, codewrite_lst_filename):
-    try:
-        # Read the contents of the .codewrite.lst file
-        with open(codewrite_lst_filename, 'r') as codewrite_file:
-            codewrite_content = codewrite_file.read()
+GCC_FLAGS = ["-mcpu=powerpc", "-S", "-fno-asynchronous-unwind-tables", "-fno-ident", "-fno-common", "-O1", "-fno-optimize-sibling-calls"]
+AS_FLAGS = ["-a32", "-mbig", "-mregnames", "-mgekko"]
 
-        # Read the contents of the assembly (.s) file
-        with open(asm_filename, 'r') as asm_file:
-            asm_content = asm_file.read()
+BL_CALL_PATTERN = re.compile(r'\bbl (\w+)')
 
-        # Combine the .codewrite.lst content at the top of the .s file content
-        combined_content = codewrite_content + "\n" + asm_content
+# `// @hook 8005A2C4` (or `// @hook 8005A2C4 06`) on the line above a function definition
+HOOK_ANNOTATION_PATTERN = re.compile(r'^[ \t]*//[ \t]*@hook[ \t]+(?:0x)?([0-9A-Fa-f]{8})(?:[ \t]+(C2|06))?[ \t]*$', re.M)
+# Everything of a definition before its `{`: specifiers, the name, then one parameter list
+HOOK_DEFINITION_PATTERN = re.compile(r'\s*([\w\s*]*?)\b([A-Za-z_]\w*)\s*\(([^(){};]*)\)\s*\Z')
 
-        # Write the combined content back to the .s file
-        with open(asm_filename, 'w') as asm_file:
-            asm_file.write(combined_content)
-
-        print(f"Appended {codewrite_lst_filename} to the top of {asm_filename}.")
-    
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-    except Exception as e:
-        print(f"Error while appending {codewrite_lst_filename} to {asm_filename}: {e}")
-
-def remove_gnu_attribute(asm_filename):
-    try:
-        with open(asm_filename, 'r') as asm_file:
-            lines = asm_file.readlines()
+# A bl reaches 32 MB either way; the margin leaves room for the hook itself,
+# since the offset of each call site is not known while lines stream past
+BL_REACH = 0x2000000
+BL_REACH_MARGIN = 0x100000
 
+def get_gcc_command():
+    return get_toolchain().command("gcc")
+
+def long_call(func_name):
+    # r12 is volatile across calls and never carries arguments, so it is free at every call site
+    return (f"lis r12, {func_name}@ha\n"
+            f"	addi r12, r12, {func_name}@l\n"
+            f"	mtctr r12\n"
+            f"	bctrl\n")
+
+def in_bl_reach(target, code_address):
+    return abs(target - code_address) < BL_REACH - BL_REACH_MARGIN
+
+def rewrite_asm_lines(lines, symbols=None, code_addresses=None, set_symbols=True):
+    """Apply every gcc output rewrite in one pass over a stream of lines
+
+    Drops `.gnu_attribute` lines and lowers `bl` calls. Calls to functions
+    in the same unit stay a position independent `bl`. Calls to game
+    symbols stay a `bl` too when code_addresses, the addresses the code is
+    linked at and runs from, are known and all within reach of the target,
+    for the linker to resolve; otherwise they become a long call through
+    r12. With set_symbols the `.set` lines for the game symbols the code
+    references follow the code, so nothing has to be buffered; without it
+    the linker resolves them.
+    """
+    referenced = set()
+
+    def lower_call(match):
+        func_name = match.group(1)
+        target = symbols.lookup(func_name) if symbols is not None else None
+        if target is None:
+            return match.group(0)
+        if code_addresses and all(in_bl_reach(target, address) for address in code_addresses):
+            return match.group(0)
+        return long_call(func_name)
+
+    for line in lines:
         # Remove any line containing `.gnu_attribute`
-        filtered_lines = [line for line in lines if '.gnu_attribute' not in line]
-
-        # Write the filtered content back to the assembly file
-        with open(asm_filename, 'w') as asm_file:
-            asm_file.writelines(filtered_lines)
+        if '.gnu_attribute' in line:
+            continue
+        if symbols is not None and set_symbols:
+            referenced.update(ASM_IDENTIFIER_PATTERN.findall(line))
+        yield BL_CALL_PATTERN.sub(lower_call, line)
 
-        print(f"Removed '.gnu_attribute' from {asm_filename}.")
-    
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-    except Exception as e:
-        print(f"Error while removing '.gnu_attribute' from {asm_filename}: {e}")
+    if symbols is not None and set_symbols:
+        yield "\n" + symbols.set_directives(words=referenced) + "\n"
 
-def replace_bl_calls(asm_filename):
+def _feed(stream, data):
     try:
-        with open(asm_filename, 'r') as asm_file:
-            content = asm_file.read()
-
-        # Replace instances of `bl func` with the new assembly structure
-        def replacement(match):
-            func_name = match.group(1)
-            return (f"mr r0, r13\n"
-                    f"	lis r13, {func_name}@ha\n"
-                    f"	addi r13, r13, {func_name}@l\n"
-                    f"	mtctr r13\n"
-                    f"	mr r13, r0\n"
-                    f"	bctrl\n")
-
-        # Updated regex to match `bl` followed by exactly one space and then the function name
-        new_content = re.sub(r'\bbl (\w+)', replacement, content)
-
-        # Write the modified content back to the assembly file
-        with open(asm_filename, 'w') as asm_file:
-            asm_file.write(new_content)
-
-        print(f"Replaced 'bl' calls in {asm_filename}.")
-    
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-    except Exception as e:
-        print(f"Error while replacing 'bl' calls in {asm_filename}: {e}")
-
-def update_include_paths(file_path, game_id="generic"):
-    print("Updating include paths...")
-    print(f"File path: {file_path}")
-    print(f"Game ID: {game_id}")
+        stream.write(data)
+        stream.close()
+    except BrokenPipeError:
+        pass  # the process exited without reading all of its input
+
+def _drain(stream, chunks):
+    chunks.append(stream.read())
+    stream.close()
+
+def compile_and_assemble(source, object_filename, symbols=None, include=None, code_addresses=None, set_symbols=True, flags=GCC_FLAGS):
+    """Compile C source and assemble it into an object file without intermediate files
+
+    gcc reads the source from stdin and writes assembly to stdout, which is
+    rewritten line by line straight into the assembler's stdin. A header
+    given as include is force-included ahead of the source, which lets gcc
+    pick up its precompiled .gch. Calls are lowered by rewrite_asm_lines
+    with symbols, code_addresses and set_symbols. Compiler and assembler errors raise
+    CalledProcessError, so callers without a window (batch builds) can
+    report them.
+    """
+    gcc_cmd = get_gcc_command()
+    as_cmd = get_toolchain().command("as")
+    if gcc_cmd is None or as_cmd is None:
+        raise FileNotFoundError("The PowerPC compiler or assembler was not found.")
+    env = get_toolchain().env
+
+    gcc_cmd.extend(flags)
+    if include is not None:
+        gcc_cmd.extend(["-include", include])
+    gcc_cmd.extend(["-x", "c", "-", "-o", "-"])
+    as_cmd.extend(AS_FLAGS + ["-o", object_filename])
+
+    gcc = subprocess.Popen(gcc_cmd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assembler = subprocess.Popen(as_cmd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # Feed gcc and drain every stderr/stdout we are not streaming on threads so no pipe fills up
+    gcc_errors, as_output, as_errors = [], [], []
+    threads = [
+        threading.Thread(target=_feed, args=(gcc.stdin, source)),
+        threading.Thread(target=_drain, args=(gcc.stderr, gcc_errors)),
+        threading.Thread(target=_drain, args=(assembler.stdout, as_output)),
+        threading.Thread(target=_drain, args=(assembler.stderr, as_errors))
+    ]
+    for thread in threads:
+        thread.start()
 
     try:
-        with open(file_path, 'r') as file:
-            content = file.read()
-        print("File content read successfully.")
+        for line in rewrite_asm_lines(gcc.stdout, symbols, code_addresses, set_symbols):
+            assembler.stdin.write(line)
+    except BrokenPipeError:
+        pass  # the assembler stopped early; its exit status and stderr say why
+    finally:
+        gcc.stdout.close()
+        try:
+            assembler.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    gcc_status = gcc.wait()
+    as_status = assembler.wait()
+    for thread in threads:
+        thread.join()
+
+    if gcc_status != 0:
+        error_msg = "".join(gcc_errors) or "Unknown error occurred."
+        raise subprocess.CalledProcessError(gcc_status, gcc_cmd, stderr=f"Error during compilation: {error_msg}".encode())
+    if as_status != 0:
+        raise subprocess.CalledProcessError(as_status, as_cmd, output="".join(as_output).encode(), stderr="".join(as_errors).encode())
+
+    print(f"Compiled and assembled C code to {object_filename} in one pass.")
+    return True
+
+def find_game_header(game_id="generic"):
+    """Return the path of the game's header, or None if there is none"""
+    # Determine the base paths for includes
+    if getattr(sys, 'frozen', False):
+        base_include_paths = [sys._MEIPASS, os.path.dirname(sys.executable)]
+    else:
+        base_include_paths = [os.getcwd()]
 
-        # Remove existing include for types.h
-        content = re.sub(r'#include "include/types.h"', '', content)
-        print("Removed existing include for types.h.")
+    found = None
 
-        # Prepare new include paths
-        #if getattr(sys, 'frozen', False):
-        #    new_includes = f'#include "{os.path.join(sys._MEIPASS, "include", "generic_types.h")}"\n'
-        #else:
-        #    new_includes = '#include "include/generic_types.h"\n'
+    # Recursively scan include/gc/ for .h files in both paths
+    for base_include_path in base_include_paths:
+        #gc_include_dir = os.path.join(base_include_path, 'include', 'gc')
+        #for root, _, files in os.walk(gc_include_dir):
+        #    for file in files:
+        #        if file.endswith('.h'):
+        #            relative_path = os.path.relpath(os.path.join(root, file), start='include')
+        #             new_includes += f'#include "../{relative_path}"\n'
 
-        # Determine the base paths for includes
         if getattr(sys, 'frozen', False):
-            base_include_paths = [sys._MEIPASS, os.path.dirname(sys.executable)]
+            game_id_header = os.path.join(sys._MEIPASS, 'include', f'{game_id}.h')
+        else:
+            game_id_header = os.path.join(base_include_path, 'include', f'{game_id}.h')
+
+        print(f"Looking for header file at: {game_id_header}")
+
+        if os.path.exists(game_id_header):
+            print(f"Header file found: {game_id_header}")
+            found = game_id_header
         else:
-            base_include_paths = [os.getcwd()]
-
-        # Recursively scan include/gc/ for .h files in both paths
-        for base_include_path in base_include_paths:
-            #gc_include_dir = os.path.join(base_include_path, 'include', 'gc')
-            #for root, _, files in os.walk(gc_include_dir):
-            #    for file in files:
-            #        if file.endswith('.h'):
-            #            relative_path = os.path.relpath(os.path.join(root, file), start='include')
-            #             new_includes += f'#include "../{relative_path}"\n'
-
-            if getattr(sys, 'frozen', False):
-                game_id_header = os.path.join(sys._MEIPASS, 'include', f'{game_id}.h')
-            else:
-                game_id_header = os.path.join(base_include_path, 'include', f'{game_id}.h')
-            
-            print(f"Looking for header file at: {game_id_header}")
-            
-            if os.path.exists(game_id_header):
-                print(f"Header file found: {game_id_header}")
-                new_includes = f'#include "{game_id_header}"\n'
-            else:
-                print(f"Header file not found: {game_id_header}")
-
-        # Prepend new includes to the existing content
-        updated_content = new_includes + content
-        print("Prepended new includes to the content.")
-
-        with open(file_path, 'w') as file:
-            file.write(updated_content)
-        print(f"Updated include paths in {file_path}.")
-
-    except FileNotFoundError as e:
-        CTkMessagebox(message=f"Error occurred: {e}", title="Error", icon="warning", option_1="OK")
-    except Exception as e:
-        error_msg = e.stderr.decode()
-        CTkMessagebox(message=f"Error occurred: {error_msg}", title="Error", icon="warning", option_1="OK")
+            print(f"Header file not found: {game_id_header}")
+    return found
+
+def find_hook_annotations(source):
+    """Return (function name, address, code type) for every `@hook` annotated function in C source
+
+    The code type is "C2" (insert the function at the address) unless the
+    annotation asks for "06" (write the function over the code at the address).
+    Raises ValueError when an annotation is not followed by the definition of
+    a function the linker can use as an entry point.
+    """
+    hooks = []
+    for match in HOOK_ANNOTATION_PATTERN.finditer(source):
+        line_number = source.count("\n", 0, match.start()) + 1
+        rest = source[match.end():]
+        end = re.search(r'[{;]', rest)
+        definition = HOOK_DEFINITION_PATTERN.match(rest[:end.start()]) if end and end.group() == "{" else None
+        if definition is None:
+            raise ValueError(f"Line {line_number}: @hook must be on the line above a function definition.")
+        name = definition.group(2)
+        if "static" in definition.group(1).split():
+            raise ValueError(f"Line {line_number}: hook function {name} must not be static.")
+        hooks.append((name, int(match.group(1), 16), match.group(2) or "C2"))
+    return hooks
+
+def include_game_header(content, game_id="generic", game_header=None):
+    """Return C source with the game's header included in place of include/types.h
+
+    Pass game_header=False when the header is force-included some other way
+    (a precompiled header) and only include/types.h should be dropped.
+    """
+    # Remove existing include for types.h
+    content = re.sub(r'#include "include/types.h"', '', content)
+    print("Removed existing include for types.h.")
+    if game_header is False:
+        return content
+
+    # Prepare new include paths
+    #if getattr(sys, 'frozen', False):
+    #    new_includes = f'#include "{os.path.join(sys._MEIPASS, "include", "generic_types.h")}"\n'
+    #else:
+    #    new_includes = '#include "include/generic_types.h"\n'
+
+    if game_header is None:
+        game_header = find_game_header(game_id)
+    new_includes = f'#include "{game_header}"\n' if game_header else ""
+
+    # Prepend new includes to the existing content
+    print("Prepended new includes to the content.")
+    return new_includes + content
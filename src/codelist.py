@@ -0,0 +1,162 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import re
+from array import array
+from gecko import code_kind, payload_rows
+
+CANONICAL_ROW_PATTERN = re.compile(r'[0-9A-F]{8} [0-9A-F]{8}\Z')
+GECKO_ROW_PATTERN = re.compile(r'\s*([0-9A-Fa-f]{8})[ \t]+([0-9A-Fa-f]{8})(?![0-9A-Za-z])(.*)\Z', re.S)
+
+# What each line of a code list is
+ROW, NAME, COMMENT, TEXT = range(4)
+
+# Code types as normalized by code_kind
+KNOWN_CODE_KINDS = (
+    {0x00, 0x02, 0x04, 0x06, 0x08}
+    | set(range(0x20, 0x30, 2)) | set(range(0x40, 0x50, 2)) | set(range(0x60, 0x70, 2))
+    | set(range(0x80, 0x90, 2)) | set(range(0xA0, 0xB0, 2))
+    | {0xC0, 0xC2, 0xC6, 0xCC, 0xCE, 0xE0, 0xE2, 0xF0, 0xF2, 0xF4, 0xF6}
+)
+
+
+class CodeList:
+    """A Gecko code list held as arrays, serialized back exactly as it was read
+
+    Every two-word row is stored in `words`, and every text line has a kind
+    in `line_kinds` (ROW, NAME, COMMENT or TEXT). `$Name` headers, `*`
+    comments, blank lines and anything else are kept verbatim in `texts`,
+    as are rows written in any form other than `XXXXXXXX YYYYYYYY` (lower
+    case, extra spacing, `;` annotations). Codes and `$Name` entries are
+    indexed by the row they start at.
+    """
+
+    def __init__(self):
+        self.words = array('I')
+        self.row_lines = array('I')
+        self.line_kinds = array('B')
+        self.texts = {}
+        self.code_rows = array('I')
+        self.code_lengths = array('I')
+        self.entry_names = []
+        self.entry_rows = array('I')
+
+    @classmethod
+    def parse(cls, text):
+        codes = cls()
+        words = codes.words
+        row_lines = codes.row_lines
+        line_kinds = codes.line_kinds
+        texts = codes.texts
+        code_rows = codes.code_rows
+        code_lengths = codes.code_lengths
+        remaining = 0  # Payload rows left in the current code
+
+        for line_index, line in enumerate(text.split("\n")):
+            first = None
+            if CANONICAL_ROW_PATTERN.match(line):
+                first, second = int(line[:8], 16), int(line[9:], 16)
+            else:
+                # Rows in any other form are kept verbatim
+                match = GECKO_ROW_PATTERN.match(line)
+                if match:
+                    first, second = int(match.group(1), 16), int(match.group(2), 16)
+                    texts[line_index] = line
+
+            if first is None:
+                stripped = line.lstrip()
+                if stripped.startswith("$"):
+                    line_kinds.append(NAME)
+                    codes.entry_names.append(stripped[1:].strip())
+                    codes.entry_rows.append(len(row_lines))
+                    remaining = 0  # A new entry always starts a new code
+                else:
+                    line_kinds.append(COMMENT if stripped.startswith("*") else TEXT)
+                texts[line_index] = line
+                continue
+
+            line_kinds.append(ROW)
+            if remaining:
+                remaining -= 1
+            else:
+                kind = code_kind(first)
+                code_rows.append(len(row_lines))
+                remaining = payload_rows(kind, first, second)
+                code_lengths.append(remaining)
+            words.append(first)
+            words.append(second)
+            row_lines.append(line_index)
+
+        return codes
+
+    def __len__(self):
+        return len(self.row_lines)
+
+    def row(self, index):
+        return self.words[2 * index], self.words[2 * index + 1]
+
+    def set_row(self, index, first, second):
+        self.words[2 * index] = first & 0xFFFFFFFF
+        self.words[2 * index + 1] = second & 0xFFFFFFFF
+
+    def codes(self):
+        """Yield (first row, code kind, payload row count) for every code"""
+        words = self.words
+        for row, length in zip(self.code_rows, self.code_lengths):
+            yield row, code_kind(words[2 * row]), length
+
+    def entries(self):
+        """Yield (name, first row, end row) for every `$Name` entry"""
+        ends = list(self.entry_rows[1:]) + [len(self)]
+        return zip(self.entry_names, self.entry_rows, ends)
+
+    def validate(self):
+        """Return (line number, message) for every code that is malformed or cut short"""
+        problems = []
+        boundaries = sorted(set(self.entry_rows[1:]) | {len(self)})
+        boundary = 0
+        for row, kind, length in self.codes():
+            while boundaries[boundary] <= row:
+                boundary += 1
+            line_number = self.row_lines[row] + 1
+            first = self.words[2 * row]
+            if kind not in KNOWN_CODE_KINDS:
+                problems.append((line_number, f"unknown code type {first >> 24:02X}"))
+            available = boundaries[boundary] - row - 1
+            if length > available:
+                problems.append((line_number, f"{first >> 24:02X} code declares {length} line(s) but only {available} follow"))
+            elif kind in (0xC0, 0xC2) and length == 0:
+                problems.append((line_number, f"{first >> 24:02X} code has no instructions"))
+            elif kind == 0xC2 and self.words[2 * (row + length) + 1] != 0:
+                problems.append((line_number, "C2 code must end with a 00000000 word for the branch back"))
+        return problems
+
+    def serialize(self):
+        lines = []
+        words = self.words
+        texts = self.texts
+        row = 0
+        for line_index, kind in enumerate(self.line_kinds):
+            if kind != ROW:
+                lines.append(texts[line_index])
+                continue
+            first, second = words[2 * row], words[2 * row + 1]
+            row += 1
+            original = texts.get(line_index)
+            if original is not None:
+                match = GECKO_ROW_PATTERN.match(original)
+                if match and (int(match.group(1), 16), int(match.group(2), 16)) == (first, second):
+                    lines.append(original)
+                    continue
+                if match:
+                    lines.append(f"{first:08X} {second:08X}{match.group(3)}")  # Keep an annotation on a changed row
+                    continue
+            lines.append(f"{first:08X} {second:08X}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.serialize()
@@ -0,0 +1,102 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import struct
+from collections import namedtuple
+
+DOL_HEADER_SIZE = 0x100
+TEXT_SECTION_COUNT = 7
+DATA_SECTION_COUNT = 11
+SECTION_COUNT = TEXT_SECTION_COUNT + DATA_SECTION_COUNT
+SECTION_ALIGN = 0x20
+
+DolSection = namedtuple("DolSection", ["index", "offset", "address", "size"])
+
+
+class DolFile:
+    """A GameCube main.dol held in memory as its section table and a mutable copy of the file
+
+    The first seven sections are text, the other eleven data; unused slots
+    have a size of zero. Addresses passed to read() and write() are the
+    ones the sections are loaded to, not file offsets.
+    """
+
+    def __init__(self, data):
+        if len(data) < DOL_HEADER_SIZE:
+            raise ValueError("not a DOL file")
+        self.data = bytearray(data)
+        offsets = struct.unpack_from(f'>{SECTION_COUNT}I', data, 0x00)
+        addresses = struct.unpack_from(f'>{SECTION_COUNT}I', data, 0x48)
+        sizes = struct.unpack_from(f'>{SECTION_COUNT}I', data, 0x90)
+        self.sections = [DolSection(*fields) for fields in zip(range(SECTION_COUNT), offsets, addresses, sizes)]
+        self.bss_address, self.bss_size, self.entry_point = struct.unpack_from('>III', data, 0xD8)
+
+        for section in self.sections:
+            if section.size and section.offset + section.size > len(data):
+                raise ValueError(f"DOL section {section.index} runs past the end of the file")
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+    def text_sections(self):
+        return [section for section in self.sections[:TEXT_SECTION_COUNT] if section.size]
+
+    def data_sections(self):
+        return [section for section in self.sections[TEXT_SECTION_COUNT:] if section.size]
+
+    def section_at(self, address, size=1, text_only=False):
+        """Return the section holding all of [address, address + size), or None"""
+        sections = self.text_sections() if text_only else self.text_sections() + self.data_sections()
+        for section in sections:
+            if section.address <= address and address + size <= section.address + section.size:
+                return section
+        return None
+
+    def read(self, address, size):
+        section = self.section_at(address, size)
+        if section is None:
+            raise ValueError(f"{address:08X} is not loaded from the DOL")
+        start = section.offset + address - section.address
+        return bytes(self.data[start:start + size])
+
+    def write(self, address, data):
+        section = self.section_at(address, len(data))
+        if section is None:
+            raise ValueError(f"{address:08X} is not loaded from the DOL")
+        start = section.offset + address - section.address
+        self.data[start:start + len(data)] = data
+
+    def add_text_section(self, address, data):
+        """Append a text section loaded to address; raises ValueError if no slot is free or it overlaps"""
+        if address % SECTION_ALIGN:
+            raise ValueError(f"a new section must start on a {SECTION_ALIGN:#x} boundary")
+        slot = next((section.index for section in self.sections[:TEXT_SECTION_COUNT] if not section.size), None)
+        if slot is None:
+            raise ValueError("the DOL has no free text section")
+
+        data = bytes(data) + bytes(-len(data) % SECTION_ALIGN)
+        end = address + len(data)
+        loaded = [(section.address, section.address + section.size) for section in self.sections if section.size]
+        loaded.append((self.bss_address, self.bss_address + self.bss_size))
+        for start, stop in loaded:
+            if start < end and address < stop:
+                raise ValueError(f"a new section at {address:08X} overlaps {start:08X}-{stop:08X}")
+
+        self.data.extend(bytes(-len(self.data) % SECTION_ALIGN))
+        offset = len(self.data)
+        self.data.extend(data)
+        struct.pack_into('>I', self.data, 0x00 + 4 * slot, offset)
+        struct.pack_into('>I', self.data, 0x48 + 4 * slot, address)
+        struct.pack_into('>I', self.data, 0x90 + 4 * slot, len(data))
+        self.sections[slot] = DolSection(slot, offset, address, len(data))
+        return self.sections[slot]
@@ -7,34 +7,96 @@
 
 import sys
 import os
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from utils import SYMBOL_URL_MAPPING
 
-def download_symbol_files(game_id: str) -> bool:
-    if game_id not in SYMBOL_URL_MAPPING:
-        print(f"Error: No symbol file URL found for game ID {game_id}")
-        return False
+MAX_PARALLEL_DOWNLOADS = 4
+
+_session = None
+_session_lock = threading.Lock()
 
+def get_session() -> requests.Session:
+    """Return the connection-pooled session shared by every symbol download"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_PARALLEL_DOWNLOADS, pool_maxsize=MAX_PARALLEL_DOWNLOADS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+def get_symbol_dir() -> str:
     if getattr(sys, 'frozen', False):
         # If the application is frozen, use the directory of the executable
-        symbol_dir = os.path.join(os.path.dirname(sys.executable), "symbols")
-    else:
-        # Otherwise, use the directory of the script
-        symbol_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols")
+        return os.path.join(os.path.dirname(sys.executable), "symbols")
+    # Otherwise, use the directory of the script
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols")
+
+def _write_atomically(path: str, data: bytes) -> None:
+    # Write to a temp file in the same directory, then rename over the target
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def _load_metadata(metadata_path: str) -> dict:
+    try:
+        with open(metadata_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def download_symbol_files(game_id: str, symbol_dir: str = None, url_mapping: dict = None,
+                          session: requests.Session = None) -> bool:
+    url_mapping = SYMBOL_URL_MAPPING if url_mapping is None else url_mapping
+    if game_id not in url_mapping:
+        print(f"Error: No symbol file URL found for game ID {game_id}")
+        return False
+
+    symbol_dir = get_symbol_dir() if symbol_dir is None else symbol_dir
+    session = get_session() if session is None else session
 
     # Create the symbols directory if it doesn't exist
     os.makedirs(symbol_dir, exist_ok=True)
 
-    symbol_url = SYMBOL_URL_MAPPING[game_id]
+    symbol_url = url_mapping[game_id]
     output_path = os.path.join(symbol_dir, f"{game_id}.sym")
+    metadata_path = os.path.join(symbol_dir, f"{game_id}.meta")
+
+    # Revalidate instead of re-downloading when we already hold this URL's file
+    headers = {}
+    metadata = _load_metadata(metadata_path)
+    if os.path.exists(output_path) and metadata.get("url") == symbol_url:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
 
     try:
         print(f"Downloading symbol file from {symbol_url}...")
-        response = requests.get(symbol_url, timeout=10)
+        response = session.get(symbol_url, headers=headers, timeout=10)
 
-        if response.status_code == 200:
-            with open(output_path, "wb") as f:
-                f.write(response.content)
+        if response.status_code == 304:
+            print(f"Symbol file for {game_id} is up to date.")
+            return True
+        elif response.status_code == 200:
+            _write_atomically(output_path, response.content)
+            metadata = {
+                "url": symbol_url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            }
+            _write_atomically(metadata_path, json.dumps(metadata).encode("utf-8"))
             print("Symbol file downloaded successfully.")
             return True
         else:
@@ -46,4 +108,25 @@ def download_symbol_files(game_id: str) -> bool:
         return False
     except Exception as e:
         print(f"Unexpected error: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def prefetch_symbol_files(game_ids=None, symbol_dir: str = None, url_mapping: dict = None,
+                          only_existing: bool = False) -> dict:
+    """Download or revalidate several symbol files in parallel
+
+    Defaults to every game in the URL mapping. With only_existing, games
+    whose symbol file was never downloaded are skipped. Returns a
+    game ID -> success mapping.
+    """
+    url_mapping = SYMBOL_URL_MAPPING if url_mapping is None else url_mapping
+    symbol_dir = get_symbol_dir() if symbol_dir is None else symbol_dir
+    game_ids = list(url_mapping) if game_ids is None else list(game_ids)
+    if only_existing:
+        game_ids = [game_id for game_id in game_ids if os.path.exists(os.path.join(symbol_dir, f"{game_id}.sym"))]
+    if not game_ids:
+        return {}
+
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+        results = executor.map(lambda game_id: download_symbol_files(game_id, symbol_dir, url_mapping, session), game_ids)
+        return dict(zip(game_ids, results))
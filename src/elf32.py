@@ -0,0 +1,219 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import struct
+from collections import namedtuple
+
+SHT_SYMTAB = 2
+SHT_RELA = 4
+SHT_NOBITS = 8
+SHT_REL = 9
+SHF_ALLOC = 0x2
+EM_PPC = 20
+
+# PowerPC relocations that only depend on the distance between two places in the image
+R_PPC_REL24 = 10
+R_PPC_REL14 = 11
+R_PPC_REL32 = 26
+RELATIVE_RELOCATIONS = (R_PPC_REL24, R_PPC_REL14, R_PPC_REL32)
+
+# PowerPC relocations that store an address as it is once linked: R_PPC_ADDR32
+# through R_PPC_ADDR14_BRNTAKEN, and the small data forms that point off r13
+ABSOLUTE_RELOCATIONS = set(range(1, 10)) | {32, 109}
+
+Section = namedtuple("Section", ["index", "name", "type", "flags", "address", "offset", "size", "link", "info", "align", "entry_size"])
+ElfSymbol = namedtuple("ElfSymbol", ["name", "value", "size", "kind", "binding", "section"])
+Relocation = namedtuple("Relocation", ["offset", "type", "symbol", "addend"])
+
+
+class ElfFile:
+    """Read-only view of an ELF32 file that never copies section data
+
+    Headers are decoded with struct.unpack_from straight out of the buffer
+    (bytes, bytearray or an mmap), and section contents are handed out as
+    memoryview slices. Call release() before closing an mmap the file was
+    read from.
+    """
+
+    def __init__(self, buffer):
+        if buffer[:4] != b'\x7fELF' or buffer[4] != 1:
+            raise ValueError("not an ELF32 file")
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.endian = '>' if buffer[5] == 2 else '<'
+        self.machine, = struct.unpack_from(self.endian + 'H', buffer, 0x12)
+
+        section_header = struct.Struct(self.endian + 'IIIIIIIIII')
+        section_offset, = struct.unpack_from(self.endian + 'I', buffer, 0x20)
+        header_size, count, names_index = struct.unpack_from(self.endian + 'HHH', buffer, 0x2E)
+        headers = [section_header.unpack_from(buffer, section_offset + i * header_size) for i in range(count)]
+
+        names_base = headers[names_index][4] if names_index < count else None
+        self.sections = [
+            Section(i, self.string(names_base, header[0]) if names_base is not None else "", *header[1:])
+            for i, header in enumerate(headers)
+        ]
+
+    def release(self):
+        self.view.release()
+
+    def string(self, table_offset, offset):
+        """Read a NUL terminated string from a string table"""
+        start = table_offset + offset
+        return self.buffer[start:self.buffer.find(b'\0', start)].decode('utf-8', errors='replace')
+
+    def section_by_name(self, name):
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def section_data(self, section):
+        """Return a section's contents as a memoryview; empty for .bss style sections"""
+        if section.type == SHT_NOBITS:
+            return self.view[0:0]
+        return self.view[section.offset:section.offset + section.size]
+
+    def allocated_sections(self):
+        """Sections loaded into memory, in address order (file order for an unlinked object)"""
+        sections = [section for section in self.sections if section.flags & SHF_ALLOC and section.size]
+        return sorted(sections, key=lambda section: (section.address, section.index))
+
+    def symbols(self):
+        """Yield every entry of the symbol tables after the null symbol"""
+        for table in self.sections:
+            if table.type == SHT_SYMTAB:
+                yield from self._table_symbols(table, 1)
+
+    def _table_symbols(self, table, first=0):
+        entry = struct.Struct(self.endian + 'IIIBBH')
+        strings_base = self.sections[table.link].offset
+        entry_size = table.entry_size or entry.size
+        for offset in range(table.offset + first * entry_size, table.offset + table.size, entry_size):
+            name_offset, value, size, info, _, section_index = entry.unpack_from(self.buffer, offset)
+            name = self.string(strings_base, name_offset) if name_offset else ""
+            yield ElfSymbol(name, value, size, info & 0xF, info >> 4, section_index)
+
+    def relocations(self):
+        """Yield (section relocated, symbol table, Relocation) for every REL and RELA entry"""
+        for table in self.sections:
+            if table.type not in (SHT_REL, SHT_RELA):
+                continue
+            with_addend = table.type == SHT_RELA
+            entry = struct.Struct(self.endian + ('IIi' if with_addend else 'II'))
+            entry_size = table.entry_size or entry.size
+            target = self.sections[table.info]
+            symbol_table = self.sections[table.link]
+            for offset in range(table.offset, table.offset + table.size, entry_size):
+                fields = entry.unpack_from(self.buffer, offset)
+                addend = fields[2] if with_addend else 0
+                yield target, symbol_table, Relocation(fields[0], fields[1] & 0xFF, fields[1] >> 8, addend)
+
+    def image(self):
+        """Lay the allocated sections out back to back, as they would be loaded
+
+        Each section starts at its own alignment; .bss style sections become
+        zeros unless they only trail the image. Branches and other PC-relative
+        references between sections of a PowerPC object are resolved, since
+        they hold wherever the image is loaded; anything that needs the final
+        address is left as assembled.
+        """
+        sections = self.allocated_sections()
+        while sections and sections[-1].type == SHT_NOBITS:
+            sections.pop()
+
+        image = bytearray()
+        placement = {}
+        for section in sections:
+            align = max(section.align, 1)
+            image.extend(bytes(-len(image) % align))
+            placement[section.index] = len(image)
+            if section.type == SHT_NOBITS:
+                image.extend(bytes(section.size))
+            else:
+                image.extend(self.section_data(section))
+
+        if self.machine == EM_PPC:
+            self._resolve_relative(image, placement)
+        return bytes(image)
+
+    def _symbol_relocations(self, sections, types):
+        """Yield (section relocated, symbol, Relocation) for every relocation of the given types made from sections"""
+        symbol_lists = {}
+        for target, symbol_table, relocation in self.relocations():
+            if relocation.type not in types or target.index not in sections:
+                continue
+            if symbol_table.index not in symbol_lists:
+                symbol_lists[symbol_table.index] = list(self._table_symbols(symbol_table))
+            yield target, symbol_lists[symbol_table.index][relocation.symbol], relocation
+
+    def _relative_relocations(self, sections):
+        """Yield (section relocated, symbol, Relocation) for every PC-relative reference made from sections"""
+        return self._symbol_relocations(sections, RELATIVE_RELOCATIONS)
+
+    def sections_reached(self, name):
+        """Return the indexes of the allocated sections a section pulls in through its relocations, itself included
+
+        This is what `ld --gc-sections` keeps when that section is the entry.
+        """
+        root = self.section_by_name(name)
+        if root is None:
+            return set()
+        allocated = {section.index for section in self.allocated_sections()}
+        reached = {root.index}
+        pending = [root.index]
+        relocations = list(self._symbol_relocations(allocated, range(256)))
+        while pending:
+            current = pending.pop()
+            for target, symbol, _ in relocations:
+                if target.index == current and symbol.section in allocated and symbol.section not in reached:
+                    reached.add(symbol.section)
+                    pending.append(symbol.section)
+        return reached
+
+    def absolute_internal_references(self, sections):
+        """Return the names of symbols inside the given sections that those sections refer to by absolute address
+
+        Section symbols are named after their section. These references only
+        hold when the code runs from the address it was linked at.
+        """
+        names = set()
+        for _, symbol, _ in self._symbol_relocations(sections, ABSOLUTE_RELOCATIONS):
+            if symbol.section in sections:
+                names.add(symbol.name or self.sections[symbol.section].name)
+        return names
+
+    def unresolved_branches(self):
+        """Return the names of symbols outside the image that PowerPC branches or other PC-relative references point at
+
+        image() leaves these as assembled; they only hold once a linker has
+        placed the code at the address it runs from.
+        """
+        if self.machine != EM_PPC:
+            return set()
+        sections = {section.index for section in self.allocated_sections()}
+        return {symbol.name for _, symbol, _ in self._relative_relocations(sections) if symbol.section not in sections}
+
+    def _resolve_relative(self, image, placement):
+        for target, symbol, relocation in self._relative_relocations(placement):
+            if symbol.section not in placement:
+                continue  # undefined, absolute or outside the image: only the linker knows
+
+            place = placement[target.index] + relocation.offset
+            distance = placement[symbol.section] + symbol.value + relocation.addend - place
+            word, = struct.unpack_from(self.endian + 'I', image, place)
+            if relocation.type == R_PPC_REL24:
+                if not -0x2000000 <= distance < 0x2000000:
+                    continue
+                word = (word & ~0x03FFFFFC) | (distance & 0x03FFFFFC)
+            elif relocation.type == R_PPC_REL14:
+                if not -0x8000 <= distance < 0x8000:
+                    continue
+                word = (word & ~0xFFFC) | (distance & 0xFFFC)
+            else:
+                word = distance & 0xFFFFFFFF
+            struct.pack_into(self.endian + 'I', image, place, word)
@@ -2,12 +2,33 @@ import os
 import subprocess
 import platform
 import sys
-import shutil
+import threading
 from CTkMessagebox import CTkMessagebox
 import gecko
 import utils
-from cCompiler import compile_to_asm, append_codewrite_to_asm, remove_gnu_attribute, replace_bl_calls, update_include_paths
-from symbol_processor import dtkSymbolsTxtToLst, parse_lst_file
+from gekko_assembler import assemble, AssemblerError
+from build_cache import BuildCache
+from wine_session import get_wine_session
+from toolchain import get_toolchain
+from remap import AddressRemapper
+from cCompiler import AS_FLAGS, GCC_FLAGS, compile_and_assemble, find_game_header, find_hook_annotations, include_game_header
+from pch_cache import PrecompiledHeaderCache, header_tree_stamps
+from symbol_index import load_symbol_index, get_linker_script, find_symbol_file
+from workspace import Workspace
+from codelist import CodeList
+from gecko_optimizer import optimize_code_list
+from gecko_baker import bake_code_list
+from dol import DolFile
+from elf32 import ElfFile
+
+# Lays out one annotated hook: its own function first, then whatever it needs
+# from the rest of the unit. --gc-sections drops everything it does not use
+HOOK_LINKER_SCRIPT = """SECTIONS
+{{
+  .text : {{ *(.text.{func_name}) *(.text .text.* .rodata .rodata.* .sdata .sdata.* .data .data.* .sbss .sbss.* .bss .bss.*) }}
+  /DISCARD/ : {{ *(.comment) *(.note*) *(.eh_frame) *(.gnu.attributes) }}
+}}
+"""
 
 class GameLogic:
     def __init__(self):
@@ -16,66 +37,335 @@ class GameLogic:
             self.base_path = sys._MEIPASS
         else:
             self.base_path = os.getcwd()
+
+        # One warm wineserver shared by every toolchain invocation
+        self.wine = get_wine_session()
+        threading.Thread(target=self.wine.start, daemon=True).start()
+
+        # Native powerpc-eabi tools when the host has them, the bundled ones under wine otherwise
+        self.toolchain = get_toolchain(self.base_path)
+
+        # Finished builds keyed by everything that affects their output
+        self.build_cache = BuildCache(os.path.join(os.getcwd(), "cache", "builds"))
+        self.toolchain_identity = self.toolchain.identity()
+
+        # Game headers precompiled once per header, flags and toolchain
+        self.precompiled_headers = PrecompiledHeaderCache(os.path.join(os.getcwd(), "cache", "pch"))
         
     def _get_environment(self):
         """Return the appropriate environment based on platform"""
-        if platform.system() != "Windows":
-            return {**os.environ, "WINEDEBUG": "-all"}
-        return None
+        return self.wine.env
+
+    def shutdown(self):
+        """Release resources held for the lifetime of the app"""
+        self.wine.stop()
 
-    def _create_temp_asm(self, app):
-        """Create a temporary assembly file with input code"""
+    def _create_temp_asm(self, app, job):
+        """Create a temporary assembly file with input code in the job's workspace"""
         input_text = app.inputCode.get("1.0", "end-1c")
-        with open("temp.asm", "w") as temp_file:
+        with open(job.file("temp.asm"), "w") as temp_file:
             temp_file.write(input_text)
-            
-    def _cleanup_files(self, files_to_clean=None):
-        """Clean up temporary files"""
-        if files_to_clean is None:
-            files_to_clean = ["temp.asm", "a.out", "b.out", "b.txt", "temp.out", "temp_codewrite.out", "temp.c", "temp.s"]
-        for file in files_to_clean:
-            try:
-                if os.path.exists(file):
-                    os.remove(file)
-            except:
-                pass
-        shutil.rmtree("tmp/")
 
     def get_gcc_gekko_command(self):
-        """Get the GCC Gekko command with appropriate path"""
-        gcc_path = os.path.join(self.base_path, "dependencies", "codewrite", "powerpc-gekko-as.exe")
-        print(gcc_path)
-        cmd = [gcc_path]
-        if platform.system() != "Windows":
-            cmd = ["wine"] + cmd
+        """Get the Gekko assembler command from the active toolchain"""
+        cmd = self.toolchain.command("as")
+        if cmd is None:
+            raise FileNotFoundError(f"Assembler not found at: {self.toolchain.paths['as']}")
         return cmd
 
-    def add_symbols_to_temp_asm(self, app):
-        """Add symbols to the temp assembly file"""
+    def get_gekko_ld_command(self):
+        """Get the Gekko linker command from the active toolchain"""
+        cmd = self.toolchain.command("ld")
+        if cmd is None:
+            raise FileNotFoundError(f"Linker not found at: {self.toolchain.paths['ld']}")
+        return cmd
+
+    def use_linked_symbols(self, app):
+        """Whether game symbols should be resolved by the linker instead of a `.set` prelude"""
+        return app.selected_game is not None and app.link_symbols_var.get()
+
+    def assemble_to_gecko(self, app, job, asm_filename):
+        """Assemble a file and convert the result to Gecko code in the job's b.out"""
+        object_filename = job.file("a.out")
+        cmd = self.get_gcc_gekko_command()
+        cmd.extend(AS_FLAGS + ["-o", object_filename, asm_filename])
+
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self.toolchain.env)
+
+        self.object_to_gecko(app, job, object_filename)
+
+    def object_to_gecko(self, app, job, object_filename):
+        """Convert an assembled object to Gecko code in the job's b.out, linking it first when symbols are linked"""
+        env = self.toolchain.env
+        start_address = app.insertionAddress.get("1.0", "end-1c")
+
+        # The C0 or C2 code runs from the codehandler's code list, not from the
+        # insertion address, so a relative branch out of it would land elsewhere
+        with open(object_filename, "rb") as object_file:
+            branches = ElfFile(object_file.read()).unresolved_branches()
+        if branches:
+            raise RuntimeError(f"The code branches relative to {', '.join(sorted(branches))}, which only works from a fixed address. "
+                               "Call game functions through a register instead (lis/ori, mtctr, bctrl).")
+
+        if not self.use_linked_symbols(app):
+            gecko.convert_aout_to_gecko(object_filename, start_address, job.file("b.out"), overwrite=False)
+            return
+
+        # Game symbols were left undefined; resolve them from the cached per-game linker script
         game_id = utils.GAME_TO_ID[app.selected_game]
-        symbol_file_path = os.path.join(os.getcwd(), f"symbols/{game_id}.sym")
+        symbol_file_path = self.get_symbol_file_path(game_id)
+        linker_script = get_linker_script(symbol_file_path)
+        link_address = int(start_address, 16) if start_address else 0x80000000
+
+        cmd = self.get_gekko_ld_command()
+        cmd.extend([f"-Ttext=0x{link_address:08X}", "--oformat", "binary", "-o", job.file("a.bin"), object_filename, linker_script])
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+
+        gecko.convert_bin_to_gecko(job.file("a.bin"), start_address, job.file("b.out"), overwrite=False)
+
+    def hooks_to_gecko(self, app, job, object_filename, hooks):
+        """Link each annotated hook out of one object and write all of their Gecko codes to the job's b.out"""
+        env = self.toolchain.env
+        game_inputs = []
+        if self.use_linked_symbols(app):
+            game_id = utils.GAME_TO_ID[app.selected_game]
+            game_inputs.append(get_linker_script(self.get_symbol_file_path(game_id)))
 
-        dtkSymbolsTxtToLst(symbol_file_path, "temp.out")
-        output_filename = parse_lst_file("temp.out", "temp_codewrite.out")
+        with open(object_filename, "rb") as object_file:
+            elf = ElfFile(object_file.read())
+
+        codes = []
+        for func_name, address, code_type in hooks:
+            # A C2 body runs from the codehandler's code list, so an absolute
+            # reference to its own code or data would point into the game at the hook
+            if code_type == "C2":
+                references = elf.absolute_internal_references(elf.sections_reached(f".text.{func_name}"))
+                if references:
+                    raise RuntimeError(f"C2 hook {func_name} refers to {', '.join(sorted(references))} by absolute address, "
+                                       f"which only works from {address:08X}. Give it an 06 hook, or keep its data on the stack.")
+
+            script_path = job.file(f"{func_name}.ld")
+            with open(script_path, "w") as script_file:
+                script_file.write(HOOK_LINKER_SCRIPT.format(func_name=func_name))
+
+            bin_path = job.file(f"{func_name}.bin")
+            cmd = self.get_gekko_ld_command()
+            cmd.extend([f"-Ttext=0x{address:08X}", "--oformat", "binary", "--gc-sections", "-e", func_name,
+                        "-T", script_path, "-o", bin_path, object_filename] + game_inputs)
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            if not os.path.exists(bin_path) or os.path.getsize(bin_path) == 0:
+                raise RuntimeError(f"Hook {func_name} produced no code; hook functions must not be static.")
 
-        with open(output_filename, 'r') as output_file:
-            generated_code = output_file.read()
+            output_path = job.file(f"{func_name}.out")
+            gecko.convert_bin_to_gecko(bin_path, f"{address:08X}", output_path, overwrite=code_type == "06")
+            with open(output_path, "r") as output_file:
+                codes.append(output_file.read().strip())
+            print(f"Built hook {func_name} at {address:08X} ({code_type}).")
+
+        with open(job.file("b.out"), "w") as output_file:
+            output_file.write("\n".join(codes) + "\n")
+
+    def get_symbol_file_path(self, game_id):
+        """Get the symbol file for a game: a dtk .sym, a CodeWarrior .map or an .elf"""
+        return find_symbol_file(os.path.join(os.getcwd(), "symbols"), game_id)
+
+    def get_symbols(self, game_id):
+        """Get the symbol table for a game, loaded from its cached index"""
+        symbol_file_path = self.get_symbol_file_path(game_id)
+        return load_symbol_index(symbol_file_path)
+
+    def annotate_output(self, app, output_text):
+        """Annotate Gecko output with the game symbols its addresses resolve to"""
+        game_id = utils.GAME_TO_ID.get(app.selected_game, "")
+        symbol_file_path = self.get_symbol_file_path(game_id)
+        if not game_id or not os.path.exists(symbol_file_path):
+            return output_text
+        return gecko.annotate_gecko_code(output_text, load_symbol_index(symbol_file_path))
+
+    def add_symbols_to_temp_asm(self, app, job):
+        """Add symbols to the temp assembly file in the job's workspace"""
+        game_id = utils.GAME_TO_ID[app.selected_game]
+        symbols = self.get_symbols(game_id)
 
         input_text = app.inputCode.get("1.0", "end-1c")
-        compiled_code = generated_code + "\n" + input_text
 
-        if not os.path.exists('temp.asm'):
-            open('temp.asm', 'w').close()
+        temp_asm = job.file("temp.asm")
+        if not os.path.exists(temp_asm):
+            open(temp_asm, 'w').close()
             
-        with open('temp.asm', 'r+') as temp_file:
+        with open(temp_asm, 'r+') as temp_file:
             existing_content = temp_file.read()
+            generated_code = symbols.set_directives(input_text + "\n" + existing_content)
+            compiled_code = generated_code + "\n" + input_text
             temp_file.seek(0)
             temp_file.write(compiled_code + "\n" + existing_content)
 
         print("Successfully added symbols to the temp.asm file.")
 
-    def prepare_rom_path(self, rom_path):
-        """Convert RVZ to ISO if needed"""
+    def report_code_list_problems(self, code_text):
+        """Show what is wrong with a Gecko code list; returns whether anything was"""
+        problems = CodeList.parse(code_text).validate()
+        if not problems:
+            return False
+        details = "\n".join(f"Line {line}: {message}" for line, message in problems[:20])
+        CTkMessagebox(message=f"The Gecko code list has {len(problems)} problem(s):\n{details}", title="Warning", icon="warning", option_1="OK")
+        return True
+
+    def optimize_code_list(self, code_text):
+        """Return a code list the codehandler gets through with less work each frame, showing what was saved"""
+        codes, report = optimize_code_list(CodeList.parse(code_text))
+        print(report)
+        CTkMessagebox(message=str(report), title="Optimized", icon="info", option_1="OK")
+        return codes.serialize()
+
+    def port_to_revision(self, app):
+        """Port the input code from the selected game revision to its sibling revision"""
+        try:
+            source_id = utils.GAME_TO_ID.get(app.selected_game, "")
+            target_id = utils.GAME_REVISIONS.get(source_id)
+            if target_id is None:
+                CTkMessagebox(message="The selected game has no other revision to port to.", title="Error", icon="warning", option_1="OK")
+                return
+
+            remapper = AddressRemapper(self.get_symbols(source_id), self.get_symbols(target_id))
+            input_text = app.inputCode.get("1.0", "end-1c")
+            if app.input_file_var.get() == "GeckoOS Code":
+                output_text, unmapped = remapper.remap_gecko_codes(input_text)
+            else:
+                output_text, unmapped = remapper.remap_asm(input_text)
+
+            app.output.delete("1.0", "end")
+            app.output.insert("1.0", output_text)
+
+            if unmapped:
+                details = "\n".join(f"Line {line}: {address:08X}" for line, address in unmapped[:20])
+                CTkMessagebox(message=f"Ported to {target_id}. {len(unmapped)} address(es) are outside any known symbol and were left unchanged:\n{details}",
+                              title="Warning", icon="warning", option_1="OK")
+            else:
+                CTkMessagebox(message=f"Ported to {target_id} successfully.", title="Success", icon="check", option_1="OK")
+
+        except Exception as e:
+            CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
+
+    def get_build_key(self, app, input_mode):
+        """Hash every input that determines the Gecko output of a build"""
+        game_id = utils.GAME_TO_ID.get(app.selected_game, "") if app.selected_game is not None else None
+        symbol_hash = None
+        if game_id:
+            symbol_file_path = self.get_symbol_file_path(game_id)
+            if os.path.exists(symbol_file_path):
+                symbol_hash = load_symbol_index(symbol_file_path).source_hash.hex()
+
+        # The game header pulls in others from the include tree, so any of them changing changes the build
+        header_stamp = None
+        if input_mode == "C Code":
+            header_stamp = header_tree_stamps(os.path.join(self.base_path, "include"))
+
+        return BuildCache.make_key(
+            app.inputCode.get("1.0", "end-1c"),
+            input_mode,
+            app.insertionAddress.get("1.0", "end-1c"),
+            game_id,
+            symbol_hash,
+            bool(self.use_linked_symbols(app)),
+            header_stamp,
+            self.toolchain_identity
+        )
+
+    def build_gecko(self, app, input_mode, job):
+        """Build the input code into Gecko code in the job's b.out, reusing a cached build when nothing changed"""
+        key = self.get_build_key(app, input_mode)
+        cached = self.build_cache.get(key)
+        if cached is not None:
+            with open(job.file("b.out"), "wb") as output_file:
+                output_file.write(cached)
+            print(f"Build cache hit ({self.build_cache.hits} hits, {self.build_cache.misses} misses).")
+            return True
+
+        if input_mode == "C Code":
+            built = self._build_c_code(app, job)
+        else:
+            built = self._build_powerpc_asm(app, job)
+
+        if built:
+            with open(job.file("b.out"), "rb") as output_file:
+                self.build_cache.put(key, output_file.read())
+        return built
+
+    def assemble_in_process(self, app, input_text, job):
+        """Assemble the input code into the job's b.out without the external toolchain
+
+        Returns False when the code needs something only the external
+        assembler or linker can do, so the caller can fall back to them.
+        """
+        start_address = app.insertionAddress.get("1.0", "end-1c")
+        symbols = None
+        if app.selected_game is not None:
+            symbols = self.get_symbols(utils.GAME_TO_ID[app.selected_game])
+
+        # No base address even when linking: the C0 or C2 code runs from the
+        # codehandler's code list, so branches to game symbols must not resolve
+        try:
+            data = assemble(input_text, symbols)
+        except AssemblerError as e:
+            print(f"In-process assembler cannot handle this code ({e}); using the external assembler.")
+            return False
+
+        gecko.convert_bytes_to_gecko(data, start_address, job.file("b.out"), overwrite=False)
+        return True
+
+    def _build_powerpc_asm(self, app, job):
+        """Assemble the input code into the job's b.out, in process when possible"""
+        if self.assemble_in_process(app, app.inputCode.get("1.0", "end-1c"), job):
+            return True
+
+        if app.selected_game is not None and not self.use_linked_symbols(app):
+            self.add_symbols_to_temp_asm(app, job)
+        else:
+            self._create_temp_asm(app, job)
+
+        self.assemble_to_gecko(app, job, job.file("temp.asm"))
+        return True
+
+    def _build_c_code(self, app, job):
+        """Compile and assemble the input code into the job's b.out in one streaming pass"""
+        # `@hook` annotations turn one unit into several hooks, each function in its own section
+        input_text = app.inputCode.get("1.0", "end-1c")
+        hooks = find_hook_annotations(input_text)
+        flags = GCC_FLAGS + ["-ffunction-sections"] if hooks else GCC_FLAGS
+
+        # Set game ID and include its header, precompiled when gcc can
+        game_id = utils.GAME_TO_ID.get(app.selected_game, "generic")
+        game_header = find_game_header(game_id)
+        include = self.precompiled_headers.get(game_header, flags) if game_header else None
+        if include is not None or game_header is None:
+            game_header = False
+        source = include_game_header(input_text, game_id, game_header)
+
+        # Game symbols become `.set` lines unless the linker resolves them. The
+        # codehandler runs C2 and C0 codes from its code list, so their final
+        # address is unknown and calls into the game use the long form. `06`
+        # hooks are linked where they are written, so a unit of only those
+        # keeps direct calls the linker can reach
+        symbols = None
+        if app.selected_game is not None:
+            symbols = self.get_symbols(game_id)
+        code_addresses = None
+        if hooks and all(code_type == "06" for _, _, code_type in hooks):
+            code_addresses = [address for _, address, _ in hooks]
+
+        # Compile C straight into the assembler and convert to Gecko code
+        object_filename = job.file("a.out")
+        compile_and_assemble(source, object_filename, symbols, include, code_addresses,
+                             set_symbols=not self.use_linked_symbols(app), flags=flags)
+        if hooks:
+            self.hooks_to_gecko(app, job, object_filename, hooks)
+        else:
+            self.object_to_gecko(app, job, object_filename)
+        return True
+
+    def prepare_rom_path(self, rom_path, job):
+        """Convert RVZ to an ISO in the job's workspace if needed"""
         if not rom_path.endswith(".rvz"):
             return rom_path
             
@@ -85,64 +375,81 @@ class GameLogic:
         else:
             dolphin_tool_path = "dolphintool"
             
-        cmd = [dolphin_tool_path, "convert", "-i", rom_path, "-f", "iso", "-o", "tmp.iso"]
+        iso_path = job.file("tmp.iso")
+        cmd = [dolphin_tool_path, "convert", "-i", rom_path, "-f", "iso", "-o", iso_path]
         result = subprocess.run(cmd, env=env, capture_output=True, text=True)
         
         if result.returncode == 0:
-            return "tmp.iso"
+            return iso_path
         else:
             error_msg = result.stderr if result.stderr else "Unknown error occurred."
             raise RuntimeError(f"RVZ to ISO conversion failed: {error_msg}")
 
-    def extract_iso(self, rom_path):
-        """Extract ISO to tmp folder"""
+    def extract_iso(self, rom_path, job):
+        """Extract ISO to the tmp folder of the job's workspace"""
         py_iso_tools_path = os.path.join(self.base_path, "dependencies", "pyisotools.exe")
         if not os.path.exists(py_iso_tools_path):
             raise FileNotFoundError(f"PyISOTools not found at: {py_iso_tools_path}")
             
         env = self._get_environment()
-        cmd = [py_iso_tools_path]
-        if platform.system() != "Windows":
-            cmd = ["wine"] + cmd
+        cmd = self.wine.command([py_iso_tools_path])
             
-        cmd += [rom_path, "E", "--dest=tmp/"]
+        cmd += [rom_path, "E", f"--dest={os.path.join(job.file('tmp'), '')}"]
         result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         if result.returncode != 0:
             error_msg = result.stderr.decode() if result.stderr else "Unknown error occurred."
             raise RuntimeError(f"Game extraction failed: {error_msg}")
 
-    def patch_dol_with_gecko(self, gecko_code_file):
-        """Patch DOL file with Gecko codes"""
+    def patch_dol_with_gecko(self, gecko_code_file, job, move_codes=None):
+        """Patch the extracted DOL file with Gecko codes"""
         gecko_loader_path = os.path.join(self.base_path, "dependencies", "GeckoLoader.exe")
         if not os.path.exists(gecko_loader_path):
             raise FileNotFoundError(f"GeckoLoader not found at: {gecko_loader_path}")
             
         env = self._get_environment()
-        cmd = [gecko_loader_path]
-        if platform.system() != "Windows":
-            cmd = ["wine"] + cmd
+        cmd = self.wine.command([gecko_loader_path])
             
-        cmd += ["--hooktype=GX", "--optimize", "tmp/root/sys/main.dol", gecko_code_file, "--dest", "tmp/root/sys/main.dol"]
+        dol_path = job.file("tmp", "root", "sys", "main.dol")
+        cmd += ["--hooktype=GX", "--optimize", dol_path, gecko_code_file, "--dest", dol_path]
+        if move_codes is not None:
+            cmd.append(f"--movecodes={move_codes}")
         result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         if result.returncode != 0:
             error_msg = result.stderr.decode() if result.stderr else "Unknown error occurred."
             raise RuntimeError(f"Game patching failed: {error_msg}")
 
-    def rebuild_iso(self, original_path):
-        """Rebuild ISO from extracted files"""
+    def bake_gecko_into_dol(self, gecko_code_file, job):
+        """Apply static writes and C2 hooks to the extracted DOL, leaving only the rest to the codehandler"""
+        with open(gecko_code_file, "r") as f:
+            codes = CodeList.parse(f.read())
+
+        dol_path = job.file("tmp", "root", "sys", "main.dol")
+        dol = DolFile.from_file(dol_path)
+        remaining, report = bake_code_list(codes, dol)
+        dol.save(dol_path)
+        print(report)
+
+        # Only conditional and dynamic codes still need GeckoLoader and the codehandler
+        if len(remaining):
+            remaining_file = job.file("remaining.txt")
+            with open(remaining_file, "w") as f:
+                f.write(remaining.serialize())
+            # Trampolines sit above the codehandler, so the code list goes to the arena
+            self.patch_dol_with_gecko(remaining_file, job, "ARENA" if report.hooks else None)
+
+    def rebuild_iso(self, original_path, job):
+        """Rebuild ISO from the job's extracted files"""
         output_path = original_path[:-4] + "_modified.iso"
         py_iso_tools_path = os.path.join(self.base_path, "dependencies", "pyisotools.exe")
         if not os.path.exists(py_iso_tools_path):
             raise FileNotFoundError(f"PyISOTools not found at: {py_iso_tools_path}")
             
         env = self._get_environment()
-        cmd = [py_iso_tools_path]
-        if platform.system() != "Windows":
-            cmd = ["wine"] + cmd
+        cmd = self.wine.command([py_iso_tools_path])
             
-        cmd += ["tmp/root", "B", f"--dest={output_path}"]
+        cmd += [job.file("tmp", "root"), "B", f"--dest={output_path}"]
         result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         if result.returncode != 0:
@@ -174,9 +481,7 @@ class GameLogic:
             raise FileNotFoundError(f"XDelta not found at: {xdelta_path}")
             
         env = self._get_environment()
-        cmd = [xdelta_path]
-        if platform.system() != "Windows":
-            cmd = ["wine"] + cmd
+        cmd = self.wine.command([xdelta_path])
             
         cmd += ["-e", "-s", iso_path_stock, modified_iso_path, xdeltaFile]
         result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -185,8 +490,8 @@ class GameLogic:
             error_msg = result.stderr.decode() if result.stderr else "Unknown error occurred."
             raise RuntimeError(f"ISO rebuilding failed: {error_msg}")
 
-    def process_rom(self, app, gecko_code_file):
-        """Process ROM with Gecko codes"""
+    def process_rom(self, app, gecko_code_file, job, bake=False):
+        """Process ROM with Gecko codes, baking what it can into main.dol when asked to"""
         rom_file_path = app.rom_file_entry.get()
         if not rom_file_path:
             CTkMessagebox(message="No ROM file selected.", title="Error", icon="warning", option_1="OK")
@@ -194,10 +499,13 @@ class GameLogic:
             
         try:
             # Process ROM
-            working_rom_path = self.prepare_rom_path(rom_file_path)
-            self.extract_iso(working_rom_path)
-            self.patch_dol_with_gecko(gecko_code_file)
-            modified_iso = self.rebuild_iso(rom_file_path)
+            working_rom_path = self.prepare_rom_path(rom_file_path, job)
+            self.extract_iso(working_rom_path, job)
+            if bake:
+                self.bake_gecko_into_dol(gecko_code_file, job)
+            else:
+                self.patch_dol_with_gecko(gecko_code_file, job)
+            modified_iso = self.rebuild_iso(rom_file_path, job)
             
             # Convert back to RVZ if needed
             if rom_file_path.endswith(".rvz"):
@@ -212,39 +520,33 @@ class GameLogic:
 
     def handle_geckoos_code(self, app):
         """Handle Gecko OS Code"""
+        job = Workspace()
         try:
             if app.selected_game is not None:
-                self.add_symbols_to_temp_asm(app)
+                self.add_symbols_to_temp_asm(app, job)
             else:
-                self._create_temp_asm(app)
+                self._create_temp_asm(app, job)
 
             input_text = app.inputCode.get("1.0", "end-1c")
+            if not self.report_code_list_problems(input_text) and app.optimize_codes_var.get():
+                input_text = self.optimize_code_list(input_text)
             app.output.delete("1.0", "end")
             app.output.insert("1.0", input_text)
             
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
 
     def handle_powerpc_asm(self, app):
         """Handle PowerPC Assembly Code"""
+        job = Workspace()
         try:
-            if app.selected_game is not None:
-                self.add_symbols_to_temp_asm(app)
-            else:
-                self._create_temp_asm(app)
-
-            cmd = self.get_gcc_gekko_command()
-            cmd.extend(["-a32", "-mbig", "-mregnames", "-mgekko", "temp.asm"])
-            env = self._get_environment()
-
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-            start_address = app.insertionAddress.get("1.0", "end-1c")
-            gecko.convert_aout_to_gecko('a.out', start_address, 'b.out', overwrite=False)
+            if not self.build_gecko(app, "PowerPC ASM", job):
+                return
             
-            with open("b.out", "r") as output_file:
-                output_text = output_file.read()
+            with open(job.file("b.out"), "r") as output_file:
+                output_text = self.annotate_output(app, output_file.read())
             app.output.delete("1.0", "end")
             app.output.insert("1.0", output_text)
 
@@ -256,51 +558,19 @@ class GameLogic:
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
 
     def handle_c_code(self, app):
         """Handle C Code"""
+        job = Workspace()
         try:
-            # Write C code to temp file
-            input_text = app.inputCode.get("1.0", "end-1c")
-            with open("temp.c", "w") as temp_file:
-                temp_file.write(input_text)
-                
-            # Set game ID and update include paths
-            game_id = utils.GAME_TO_ID.get(app.selected_game, "generic")
-            update_include_paths("temp.c", game_id)
-            
-            # Compile C to ASM
-            if not compile_to_asm("temp.c"):
+            # Compile C and convert to Gecko code
+            if not self.build_gecko(app, "C Code", job):
                 return
-                
-            # Process symbols if game is selected
-            if app.selected_game is not None:
-                symbol_file_path = os.path.join(os.getcwd(), f"symbols/{game_id}.sym")
-                dtkSymbolsTxtToLst(symbol_file_path, "temp.out")
-                output_filename = parse_lst_file("temp.out", "temp_codewrite.out")
-                asm_filename = "temp.s"
-                append_codewrite_to_asm(asm_filename, "temp_codewrite.out")
-
-            # Clean up ASM file
-            asm_filename = "temp.s"
-            remove_gnu_attribute(asm_filename)
-            replace_bl_calls(asm_filename)
-            
-            # Compile ASM with GCC
-            cmd = self.get_gcc_gekko_command()
-            cmd.extend(["-a32", "-mbig", "-mregnames", "-mgekko", asm_filename])
-            env = self._get_environment()
-            
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-            
-            # Convert to Gecko code
-            start_address = app.insertionAddress.get("1.0", "end-1c")
-            gecko.convert_aout_to_gecko('a.out', start_address, 'b.out', overwrite=False)
             
             # Display output
-            with open("b.out", "r") as output_file:
-                output_text = output_file.read()
+            with open(job.file("b.out"), "r") as output_file:
+                output_text = self.annotate_output(app, output_file.read())
             app.output.delete("1.0", "end")
             app.output.insert("1.0", output_text)
 
@@ -312,153 +582,106 @@ class GameLogic:
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
 
-    def handle_powerpc_asm_rom(self, app):
+    def handle_powerpc_asm_rom(self, app, bake=False):
         """Handle PowerPC Assembly Code for ROM patching"""
+        job = Workspace()
         try:
-            # Create ASM file
-            if app.selected_game is not None:
-                self.add_symbols_to_temp_asm(app)
-            else:
-                self._create_temp_asm(app)
-
-            # Compile ASM
-            cmd = self.get_gcc_gekko_command()
-            cmd.extend(["-a32", "-mbig", "-mregnames", "-mgekko", "temp.asm"])
-            env = self._get_environment()
-            
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-            
-            # Convert to Gecko code
-            start_address = app.insertionAddress.get("1.0", "end-1c")
-            gecko.convert_aout_to_gecko('a.out', start_address, 'b.out', overwrite=False)
+            # Compile ASM and convert to Gecko code
+            if not self.build_gecko(app, "PowerPC ASM", job):
+                return
             
             # Create Gecko code file
-            with open("b.out", "r") as output_file:
+            with open(job.file("b.out"), "r") as output_file:
                 output_text = output_file.read()
                 
-            with open("b.txt", "w") as output_file:
+            with open(job.file("b.txt"), "w") as output_file:
                 output_file.write("$CodeFusion\n" + output_text)
                 
             # Process ROM
-            self.process_rom(app, "b.txt")
+            self.process_rom(app, job.file("b.txt"), job, bake)
             
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
 
-    def handle_c_code_rom(self, app):
+    def handle_c_code_rom(self, app, bake=False):
         """Handle C Code for ROM patching"""
+        job = Workspace()
         try:
-            # Write C code to temp file
-            input_text = app.inputCode.get("1.0", "end-1c")
-            with open("temp.c", "w") as temp_file:
-                temp_file.write(input_text)
-                
-            # Set game ID and update include paths
-            game_id = utils.GAME_TO_ID.get(app.selected_game, "generic")
-            update_include_paths("temp.c", game_id)
-            
-            # Compile C to ASM
-            if not compile_to_asm("temp.c"):
+            # Compile C and convert to Gecko code
+            if not self.build_gecko(app, "C Code", job):
                 return
-                
-            # Process symbols if game is selected
-            if app.selected_game is not None:
-                symbol_file_path = os.path.join(os.getcwd(), f"symbols/{game_id}.sym")
-                dtkSymbolsTxtToLst(symbol_file_path, "temp.out")
-                output_filename = parse_lst_file("temp.out", "temp_codewrite.out")
-                asm_filename = "temp.s"
-                append_codewrite_to_asm(asm_filename, "temp_codewrite.out")
-
-            # Clean up ASM file
-            asm_filename = "temp.s"
-            remove_gnu_attribute(asm_filename)
-            replace_bl_calls(asm_filename)
-            
-            # Compile ASM with GCC
-            cmd = self.get_gcc_gekko_command()
-            cmd.extend(["-a32", "-mbig", "-mregnames", "-mgekko", asm_filename])
-            env = self._get_environment()
-            
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-            
-            # Convert to Gecko code
-            start_address = app.insertionAddress.get("1.0", "end-1c")
-            gecko.convert_aout_to_gecko('a.out', start_address, 'b.out', overwrite=False)
             
             # Create Gecko code file
-            with open("b.out", "r") as output_file:
+            with open(job.file("b.out"), "r") as output_file:
                 output_text = output_file.read()
                 
-            with open("b.txt", "w") as output_file:
+            with open(job.file("b.txt"), "w") as output_file:
                 output_file.write("$CodeFusion\n" + output_text)
                 
             # Process ROM
-            self.process_rom(app, "b.txt")
+            self.process_rom(app, job.file("b.txt"), job, bake)
             
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
 
-    def handle_geckoos_code_rom(self, app):
+    def handle_geckoos_code_rom(self, app, bake=False):
         """Handle Gecko OS Code for ROM patching"""
+        job = Workspace()
         try:
             # Create Gecko code file
             if app.selected_game is not None:
-                self.add_symbols_to_temp_asm(app)
+                self.add_symbols_to_temp_asm(app, job)
             else:
-                self._create_temp_asm(app)
+                self._create_temp_asm(app, job)
                 
-            with open("temp.asm", "r") as temp_file:
-                output_text = temp_file.read()
+            # Do not spend a ROM rebuild on a code list the codehandler would misread
+            input_text = app.inputCode.get("1.0", "end-1c")
+            if self.report_code_list_problems(input_text):
+                return
+
+            if app.optimize_codes_var.get():
+                output_text = self.optimize_code_list(input_text)
+            else:
+                with open(job.file("temp.asm"), "r") as temp_file:
+                    output_text = temp_file.read()
                 
-            with open("b.txt", "w") as output_file:
+            with open(job.file("b.txt"), "w") as output_file:
                 output_file.write("$CodeFusion\n" + output_text)
                 
             # Process ROM
-            self.process_rom(app, "b.txt")
+            self.process_rom(app, job.file("b.txt"), job, bake)
             
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
 
     def handle_powerpc_asm_delta(self, app):
         """Handle PowerPC Assembly Code for XDelta patching"""
+        job = Workspace()
         try:
-            # Create ASM file
-            if app.selected_game is not None:
-                self.add_symbols_to_temp_asm(app)
-            else:
-                self._create_temp_asm(app)
-
-            # Compile ASM
-            cmd = self.get_gcc_gekko_command()
-            cmd.extend(["-a32", "-mbig", "-mregnames", "-mgekko", "temp.asm"])
-            env = self._get_environment()
-            
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-            
-            # Convert to Gecko code
-            start_address = app.insertionAddress.get("1.0", "end-1c")
-            gecko.convert_aout_to_gecko('a.out', start_address, 'b.out', overwrite=False)
+            # Compile ASM and convert to Gecko code
+            if not self.build_gecko(app, "PowerPC ASM", job):
+                return
             
             # Create Gecko code file
-            with open("b.out", "r") as output_file:
+            with open(job.file("b.out"), "r") as output_file:
                 output_text = output_file.read()
                 
-            with open("b.txt", "w") as output_file:
+            with open(job.file("b.txt"), "w") as output_file:
                 output_file.write("$CodeFusion\n" + output_text)
                 
             # Process ROM
-            self.process_rom(app, "b.txt")
+            self.process_rom(app, job.file("b.txt"), job)
             self.patch_xdelta(app.rom_file_entry.get(), app.rom_file_entry.get()[:-4] + "_modified.iso", app.rom_file_entry.get()[:-4] + "_modified.xdelta")
             
         except Exception as e:
             CTkMessagebox(message=f"Error occurred: {str(e)}", title="Error", icon="warning", option_1="OK")
         finally:
-            self._cleanup_files()
+            job.cleanup()
@@ -5,7 +5,29 @@
 # License: MIT
 # ===========================================
 
-import struct
+from elf32 import ElfFile
+
+# Code types whose first word carries a game address (pointer-relative types excluded)
+ADDRESSED_CODE_TYPES = {0x00, 0x02, 0x04, 0x06, 0x08, 0x20, 0x22, 0x24, 0x26, 0x28, 0x2A, 0x2C, 0x2E, 0xC2, 0xC6}
+
+def code_kind(first):
+    """Return the code type of a code's first word with the pointer and address bits cleared"""
+    code_type = first >> 24
+    return code_type & 0xFE if code_type >= 0xE0 else code_type & 0xEE
+
+def payload_rows(kind, first, second):
+    """Return how many rows follow the first row of a code"""
+    if kind == 0x06:
+        return (second + 7) // 8
+    if kind == 0x08:
+        return 1
+    if kind in (0xC0, 0xC2):
+        return second
+    if kind in (0xF2, 0xF4):
+        return second & 0xFF
+    if kind == 0xF6:
+        return first & 0xFF
+    return 0
 
 def remove_unnecessary_blank_lines(text):
     # Split the text into lines
@@ -22,12 +44,38 @@ def convert_aout_to_gecko(input_file, start_address, output_file, overwrite=Fals
     with open(input_file, 'rb') as f:
         data = f.read()
     
-    # Extract relevant data
-    data = data[52:data.index(b'\x00\x2E\x73\x79\x6D\x74\x61\x62')]  # Adjusted for Python
-    
-    # Prepare the output code
-    code = []
+    # Extract exactly the loaded sections, with branches between them resolved
+    data = ElfFile(data).image()
+    data += bytes(-len(data) % 4)  # Gecko codes are made of whole words
     
+    convert_bytes_to_gecko(data, start_address, output_file, overwrite)
+
+def convert_bin_to_gecko(input_file, start_address, output_file, overwrite=False):
+    # Read the raw binary produced by `ld --oformat binary`
+    with open(input_file, 'rb') as f:
+        data = f.read()
+
+    convert_bytes_to_gecko(data, start_address, output_file, overwrite)
+
+def format_gecko_rows(data):
+    """Format a payload as Gecko code rows of two words each
+
+    The payload is hex encoded in one pass and cut into eight byte rows; a
+    final partial row is padded with a zero word.
+    """
+    view = memoryview(data)
+    full = len(view) - len(view) % 8
+    hex_text = view[:full].hex().upper()
+    rows = [hex_text[i:i + 8] + " " + hex_text[i + 8:i + 16] for i in range(0, len(hex_text), 16)]
+
+    if full != len(view):
+        tail = view[full:].hex().upper()
+        if len(tail) > 8:
+            tail = tail[:8] + " " + tail[8:]
+        rows.append(tail + " 00000000")
+    return rows
+
+def convert_bytes_to_gecko(data, start_address, output_file, overwrite=False):
     # Ensure start_address is a string before conversion
     if not start_address:  # Check if start_address is empty or None
         start_address = '0x80000000'  # Default value
@@ -51,51 +99,103 @@ def convert_aout_to_gecko(input_file, start_address, output_file, overwrite=Fals
         else:
             start_address_int = (start_address_int & ~0xFF000000) | (0xD2 << 24)  # Swap 81 to D2    
     
-    # Prepare the output code with spacing
-    counter = 0
-    for b in data:
-        if counter % 8 == 0 and counter != 0:
-            code.append("\n")  # New line after every 8 bytes
-    
-        if counter % 4 == 0 and counter % 8 != 0 and counter != 0:
-            code.append(" ")  # Add space after every 4 bytes
-    
-        code.append(f"{b:02X}")  # Append the byte in hex format
-        counter += 1
-    
-    # Add padding if necessary
-    if not overwrite:
-        if counter % 8 != 0:
-            code.append(" 00000000")  # Add padding if not a multiple of 8
-    
+    # Prepare the output code, eight bytes per row
+    rows = format_gecko_rows(data)
+
     if overwrite:
-        num_lines = (len(data))  # Calculate number of lines (rounding up) and add 1 for the final line
+        num_lines = len(data)  # 06 codes count bytes
     else:
-        num_lines = (len(data) + 7) // 8  # Calculate number of lines (rounding up) and add 1 for the final line
-    
+        num_lines = len(rows)
+        if len(data) % 8 == 0:
+            rows.append("60000000 00000000")  # Final line only if complete
+            num_lines += 1
+
     # Add the initial line with the starting address and number of lines
-    code.insert(0, f"{start_address_int:08X} {num_lines:08X}\n")  # Insert at the beginning
-    
-    if not overwrite and len(data) % 8 == 0:
-            code.append("\n60000000 00000000")  # Final line only if complete
-    
-    if overwrite:
-        if not len(data) % 8 == 0:
-            code.append(" 00000000")
-    
-    code.append(f"\n")
-    
-    # Join the code into a single string
-    formatted_code = ''.join(code)
-    
-    if not overwrite and formatted_code.strip().endswith("60000000 00000000"):
-        first_line = formatted_code.splitlines()[0]  # Get the first line
-        address_part = first_line.split()[1]  # Get the second half (the number of lines)
-        new_address = hex(int(address_part, 16) + 1)[2:].upper().zfill(8)  # Add 1 and format
-        formatted_code = formatted_code.replace(address_part, new_address, 1)
-    
-    formatted_code = remove_unnecessary_blank_lines(formatted_code)
-    
+    formatted_code = "\n".join([f"{start_address_int:08X} {num_lines:08X}"] + rows)
+
     # Write to dist/code.txt
     with open(output_file, "w") as output_file:
-        output_file.write(remove_unnecessary_blank_lines(formatted_code))
+        output_file.write(formatted_code)
+
+def _signed(value, bits):
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+def _word_references(word, word_address, high_halves):
+    """Return the addresses an instruction branches to or finishes loading, if known"""
+    opcode = word >> 26
+
+    if opcode == 18:  # b / bl
+        displacement = _signed(word & 0x03FFFFFC, 26)
+        if word & 2:
+            return [displacement & 0xFFFFFFFF]
+        if word_address is not None:
+            return [(word_address + displacement) & 0xFFFFFFFF]
+        return []
+
+    register_d = (word >> 21) & 31
+    register_a = (word >> 16) & 31
+
+    if opcode == 15 and register_a == 0:  # lis rD, hi
+        high_halves[register_d] = (word & 0xFFFF) << 16
+        return []
+    if opcode == 14 and register_a in high_halves:  # addi rD, rA, lo
+        address = (high_halves.pop(register_a) + _signed(word & 0xFFFF, 16)) & 0xFFFFFFFF
+        return [address]
+    if opcode == 24 and register_d in high_halves:  # ori rA, rS, lo
+        return [high_halves.pop(register_d) | (word & 0xFFFF)]
+    return []
+
+def annotate_gecko_code(code_text, symbols):
+    """Append `; symbol+0xOFFSET` comments to a Gecko code listing
+
+    Code addresses and every branch or lis/addi address load in C0, C2 and
+    06 payloads that resolves to a known symbol are annotated.
+    """
+    annotated = []
+    remaining = 0  # Payload lines left in the current code
+    decode = False  # Whether the current payload holds instructions or data to decode
+    payload_address = None  # Address of the next payload word, known only for 06 writes
+    high_halves = {}
+
+    for line in code_text.splitlines():
+        words = line.split()
+        if len(words) != 2 or any(len(word) != 8 for word in words):
+            if line.lstrip().startswith("$"):
+                remaining = 0  # A new entry always starts a new code
+            annotated.append(line)
+            continue
+        try:
+            first, second = int(words[0], 16), int(words[1], 16)
+        except ValueError:
+            annotated.append(line)
+            continue
+
+        addresses = []
+        if remaining == 0:
+            code_type = first >> 24 & 0xFE
+            if code_type in ADDRESSED_CODE_TYPES:
+                address = 0x80000000 | (first & 0x01FFFFFF)
+                if 0x20 <= code_type <= 0x2E:
+                    address &= ~1  # Low bit is the endif flag
+                addresses.append(address)
+            if code_type == 0xC6:
+                addresses.append(second)
+
+            kind = code_kind(first)
+            remaining = payload_rows(kind, first, second)
+            decode = kind in (0xC0, 0xC2, 0x06)
+            payload_address = 0x80000000 | (first & 0x01FFFFFF) if code_type == 0x06 else None
+            high_halves = {}
+        else:
+            if decode:
+                for word in (first, second):
+                    addresses.extend(_word_references(word, payload_address, high_halves))
+                    if payload_address is not None:
+                        payload_address += 4
+            remaining -= 1
+
+        names = [name for name in map(symbols.describe, addresses) if name]
+        annotated.append(f"{line}  ; {', '.join(names)}" if names else line)
+
+    return "\n".join(annotated)
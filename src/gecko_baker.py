@@ -0,0 +1,169 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import struct
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from codelist import CodeList, NAME, ROW
+from gecko_optimizer import ADDRESS_MASK, BASE_ADDRESS, JUMP_KINDS, base_address_after, write_spans
+
+# Free memory below the first DOL section that the OS leaves alone. GeckoLoader
+# puts the codehandler at its start, so trampolines go above it when one is installed
+LOW_MEMORY_START = 0x80001800
+LOW_MEMORY_END = 0x80003000
+CODEHANDLER_SIZE = 0x1000
+BRANCH_REACH = 0x2000000
+
+# Codes that make the codes after them conditional until an endif
+IF_KINDS = set(range(0x20, 0x30, 2)) | set(range(0xA0, 0xB0, 2)) | {0xCE, 0xF2, 0xF4}
+# Codes that depend on where other lines of their entry are; such entries stay whole
+FIXED_ENTRY_KINDS = JUMP_KINDS | {0xCC}
+
+
+class BakeReport(namedtuple("BakeReport", ["writes", "hooks", "trampoline_address", "trampoline_size", "remaining_lines"])):
+
+    def __str__(self):
+        text = f"Baked {self.writes} write(s) and {self.hooks} hook(s) into main.dol"
+        if self.hooks:
+            text += f" with {self.trampoline_size} bytes of trampolines at {self.trampoline_address:08X}"
+        if self.remaining_lines:
+            return text + f"; {self.remaining_lines} line(s) left for the codehandler"
+        return text + "; no codehandler needed"
+
+
+def branch(source, target):
+    """Encode `b target` placed at source"""
+    distance = target - source
+    if not -BRANCH_REACH <= distance < BRANCH_REACH:
+        raise ValueError(f"{target:08X} is out of branch range of {source:08X}")
+    return 0x48000000 | (distance & 0x03FFFFFC)
+
+def _span_bytes(spans):
+    return {address + i for address, data in spans for i in range(len(data))}
+
+def _static_codes(codes, dol):
+    """Return {code index: spans} for every code the DOL can take in place of the codehandler
+
+    A code qualifies when it runs every frame no matter what: outside any
+    if block, before any F0 end code, while ba is 0x80000000, and in an
+    entry without line-relative codes. Its writes must land in a text
+    section; data sections hold game state the codehandler keeps
+    rewriting, which a baked initial value would not. C2 hooks appear
+    with a None payload for the four bytes of their hook site. Anything
+    that shares a byte with a code left to the codehandler is left to it
+    too, so the order in which the two write stays as it was.
+    """
+    fixed_entries = {bisect_right(codes.entry_rows, row) - 1 for row, kind, _ in codes.codes() if kind in FIXED_ENTRY_KINDS}
+    candidates = {}
+    kept = set()
+    depth = 0
+    base_known = True
+    ended = False
+
+    for index, (row, kind, length) in enumerate(codes.codes()):
+        code = [codes.row(i) for i in range(row, row + length + 1)]
+        first, second = code[0]
+        static = not ended and depth == 0 and base_known and bisect_right(codes.entry_rows, row) - 1 not in fixed_entries
+
+        spans = write_spans(code) if base_known else None
+        if spans is not None:
+            if static and all(dol.section_at(address, len(data), text_only=True) for address, data in spans):
+                candidates[index] = spans
+            else:
+                kept |= _span_bytes(spans)
+        elif first >> 24 in (0xC2, 0xC3) and base_known:
+            hook = BASE_ADDRESS + (first & ADDRESS_MASK)
+            if static and length and code[-1][1] == 0 and dol.section_at(hook, 4, text_only=True):
+                candidates[index] = [(hook, None)]
+            else:
+                kept.update(range(hook, hook + 4))
+
+        if kind in IF_KINDS:
+            if 0x20 <= first >> 24 < 0x40 and first & 1:
+                depth = max(depth - 1, 0)  # The if applies an endif first
+            depth += 1
+        elif kind == 0xE2:
+            depth = max(depth - (first & 0xFF), 0)
+        elif kind == 0xE0:
+            depth = 0
+        elif kind == 0xF0:
+            ended = True
+        base_known = base_address_after(code, base_known)
+
+    changed = True
+    while changed:
+        changed = False
+        for index, spans in list(candidates.items()):
+            addresses = _span_bytes([(address, bytes(4) if data is None else data) for address, data in spans])
+            if not kept.isdisjoint(addresses):
+                del candidates[index]
+                kept |= addresses
+                changed = True
+    return candidates
+
+def _remaining_text(codes, baked_rows):
+    """Return the code list text without the baked rows, dropping entries left empty"""
+    lines = codes.serialize().split("\n")
+    name_lines = [i for i, kind in enumerate(codes.line_kinds) if kind == NAME]
+    output = []
+    for start, end in zip([0] + name_lines, name_lines + [len(lines)]):
+        first_row = bisect_left(codes.row_lines, start)
+        end_row = bisect_left(codes.row_lines, end)
+        if end_row > first_row and all(row in baked_rows for row in range(first_row, end_row)):
+            continue
+        row = first_row
+        for i in range(start, end):
+            if codes.line_kinds[i] == ROW:
+                row += 1
+                if row - 1 in baked_rows:
+                    continue
+            output.append(lines[i])
+    return "\n".join(output)
+
+def bake_code_list(codes, dol):
+    """Apply every static write and C2 hook of a code list to a DolFile
+
+    Writes go straight into the DOL's text. Each C2 hook becomes a branch
+    at its hook site to a copy of its instructions in a new text section,
+    whose final word branches back to the instruction after the hook.
+    Returns (CodeList of what the codehandler still has to run, BakeReport).
+    """
+    candidates = _static_codes(codes, dol)
+    code_list = list(codes.codes())
+    baked_rows = set()
+    for index in candidates:
+        row, _, length = code_list[index]
+        baked_rows.update(range(row, row + length + 1))
+    remaining = CodeList.parse(_remaining_text(codes, baked_rows))
+
+    trampoline_address = LOW_MEMORY_START + (CODEHANDLER_SIZE if len(remaining) else 0)
+    trampoline_size = sum(8 * code_list[index][2] for index, spans in candidates.items() if spans[0][1] is None)
+    if trampoline_address + trampoline_size > LOW_MEMORY_END:
+        raise ValueError(f"The hooks need {trampoline_size} bytes of trampolines, more than fit below {LOW_MEMORY_END:08X}.")
+
+    trampolines = bytearray()
+    writes = hooks = 0
+    for index in sorted(candidates):
+        row, _, length = code_list[index]
+        spans = candidates[index]
+        if spans[0][1] is not None:
+            for address, data in spans:
+                dol.write(address, data)
+            writes += 1
+            continue
+
+        hook = spans[0][0]
+        place = trampoline_address + len(trampolines)
+        words = [word for i in range(row + 1, row + length + 1) for word in codes.row(i)]
+        words[-1] = branch(place + 4 * (len(words) - 1), hook + 4)
+        trampolines.extend(struct.pack(f'>{len(words)}I', *words))
+        dol.write(hook, struct.pack('>I', branch(hook, place)))
+        hooks += 1
+
+    if trampolines:
+        dol.add_text_section(trampoline_address, trampolines)
+    return remaining, BakeReport(writes, hooks, trampoline_address, len(trampolines), len(remaining))
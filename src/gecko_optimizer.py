@@ -0,0 +1,288 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from codelist import CodeList, NAME, ROW, code_kind
+
+BASE_ADDRESS = 0x80000000
+ADDRESS_MASK = 0x01FFFFFF
+WRITE_SIZES = {0x00: 1, 0x02: 2, 0x04: 4}
+SERIAL_SIZE_TYPES = {1: 0, 2: 1, 4: 2}
+
+# Folding only pays once it saves a row: a serial write is always two rows,
+# a string write one row plus one per two words
+MIN_SERIAL_WRITES = 3
+MIN_STRING_WORDS = 4
+MAX_SERIAL_WRITES = 0x1000
+MAX_SERIAL_STRIDE = 0xFFFF
+MAX_ENDIFS = 0xFF
+
+# Codes that jump by a number of lines; an entry using them is left as written
+JUMP_KINDS = set(range(0x60, 0x70, 2))
+
+
+class OptimizationReport(namedtuple("OptimizationReport", [
+        "lines_before", "lines_after", "shadowed", "serial", "string", "terminators"])):
+
+    @property
+    def bytes_before(self):
+        return self.lines_before * 8
+
+    @property
+    def bytes_after(self):
+        return self.lines_after * 8
+
+    def __str__(self):
+        return (f"Code list: {self.lines_before} lines ({self.bytes_before} bytes) -> "
+                f"{self.lines_after} lines ({self.bytes_after} bytes); "
+                f"{self.shadowed} shadowed write(s) dropped, {self.serial} write(s) folded into serial writes, "
+                f"{self.string} write(s) merged into string writes, {self.terminators} terminator(s) collapsed")
+
+
+def write_spans(code):
+    """Return the (address, bytes) a plain base address write stores, or None for any other code"""
+    first, second = code[0]
+    code_type = first >> 24
+    if code_type >= 0x0A:
+        return None  # pointer writes, and everything that is not a write
+    kind = code_kind(first)
+    address = BASE_ADDRESS + (first & ADDRESS_MASK)
+
+    if kind == 0x00:
+        return [(address, bytes([second & 0xFF]) * ((second >> 16) + 1))]
+    if kind == 0x02:
+        return [(address, (second & 0xFFFF).to_bytes(2, 'big') * ((second >> 16) + 1))]
+    if kind == 0x04:
+        return [(address, second.to_bytes(4, 'big'))]
+    if kind == 0x06:
+        payload = b''.join(high.to_bytes(4, 'big') + low.to_bytes(4, 'big') for high, low in code[1:])
+        return [(address, payload[:second])]
+
+    step, increment = code[1]
+    size_type = step >> 28
+    if size_type > 2:
+        return None
+    size = 1 << size_type
+    mask = (1 << (8 * size)) - 1
+    return [
+        (address + i * (step & 0xFFFF), ((second + i * increment) & mask).to_bytes(size, 'big'))
+        for i in range(((step >> 16) & 0xFFF) + 1)
+    ]
+
+def _serial_write(writes):
+    """Encode evenly spaced writes of one size as an 08 code"""
+    address, size, value = writes[0][1:4]
+    stride = writes[1][1] - address
+    mask = (1 << (8 * size)) - 1
+    increment = (writes[1][3] - value) & mask
+    step = (SERIAL_SIZE_TYPES[size] << 28) | ((len(writes) - 1) << 16) | stride
+    return [(0x08000000 | (address & ADDRESS_MASK), value), (step, increment)]
+
+def _string_write(writes):
+    """Encode back to back word writes as an 06 code"""
+    address = writes[0][1]
+    values = [write[3] for write in writes]
+    if len(values) % 2:
+        values.append(0)
+    rows = [(0x06000000 | (address & ADDRESS_MASK), 4 * len(writes))]
+    return rows + list(zip(values[0::2], values[1::2]))
+
+def _optimize_run(run, counts):
+    """Rewrite a run of consecutive plain writes, which the codehandler applies with nothing reading in between"""
+    # Drop every write whose bytes are all written again later in the run
+    live = []
+    covered = set()
+    for code, spans in reversed(run):
+        addresses = {address + i for address, data in spans for i in range(len(data))}
+        if addresses <= covered:
+            counts["shadowed"] += 1
+            continue
+        covered |= addresses
+        live.append((code, addresses))
+    live.reverse()
+
+    # Writes that share no byte with any other can be reordered and combined freely
+    owners = Counter()
+    for _, addresses in live:
+        owners.update(addresses)
+    singles = {}
+    for index, (code, addresses) in enumerate(live):
+        first, second = code[0]
+        size = WRITE_SIZES.get(code_kind(first))
+        if size is None or (size < 4 and second >> 16) or any(owners[address] > 1 for address in addresses):
+            continue
+        value = second & ((1 << (8 * size)) - 1)
+        singles.setdefault(size, []).append((index, BASE_ADDRESS + (first & ADDRESS_MASK), size, value))
+
+    replacements = {}
+    folded = set()
+
+    # Evenly spaced writes with evenly stepping values become one 08 serial write
+    for size, writes in singles.items():
+        writes.sort(key=lambda write: write[1])
+        mask = (1 << (8 * size)) - 1
+        start = 0
+        while start + 1 < len(writes):
+            stride = writes[start + 1][1] - writes[start][1]
+            increment = (writes[start + 1][3] - writes[start][3]) & mask
+            end = start + 2
+            while (end < len(writes) and end - start < MAX_SERIAL_WRITES
+                   and writes[end][1] - writes[end - 1][1] == stride
+                   and (writes[end][3] - writes[end - 1][3]) & mask == increment):
+                end += 1
+            if end - start >= MIN_SERIAL_WRITES and stride <= MAX_SERIAL_STRIDE:
+                group = writes[start:end]
+                replacements[min(write[0] for write in group)] = _serial_write(group)
+                folded.update(write[0] for write in group)
+                counts["serial"] += len(group)
+                start = end
+            else:
+                start += 1
+
+    # Whatever word writes are left back to back become one 06 string write
+    words = [write for write in singles.get(4, []) if write[0] not in folded]
+    start = 0
+    while start < len(words):
+        end = start + 1
+        while end < len(words) and words[end][1] == words[end - 1][1] + 4:
+            end += 1
+        if end - start >= MIN_STRING_WORDS:
+            group = words[start:end]
+            replacements[min(write[0] for write in group)] = _string_write(group)
+            folded.update(write[0] for write in group)
+            counts["string"] += len(group)
+        start = end
+
+    optimized = []
+    for index, (code, _) in enumerate(live):
+        if index in replacements:
+            optimized.append(replacements[index])
+        elif index not in folded:
+            optimized.append(code)
+    return optimized
+
+def _plain_endif(first, second):
+    return first >> 24 == 0xE2 and not (first >> 20) & 0xF and second == 0
+
+def _merge_terminators(previous, code):
+    """Return the one code that does the work of two neighbouring codes, or None"""
+    (previous_first, previous_second), (first, second) = previous[0], code[0]
+    code_type = first >> 24
+
+    if _plain_endif(previous_first, previous_second):
+        if _plain_endif(first, second) and (previous_first & 0xFF) + (first & 0xFF) <= MAX_ENDIFS:
+            return [(0xE2000000 | ((previous_first & 0xFF) + (first & 0xFF)), 0)]
+        if code_type == 0xE0:
+            return code  # A full terminator clears every condition anyway
+        if previous_first & 0xFF == 1 and 0x20 <= code_type < 0x40 and not first & 1:
+            return [(first | 1, second)] + code[1:]  # An if code can apply one endif itself
+    if previous_first >> 24 == 0xE0 and code_type == 0xE0 and second in (0, previous_second):
+        return previous
+    return None
+
+def _collapse_terminators(codes, counts):
+    collapsed = []
+    for code in codes:
+        while collapsed:
+            merged = _merge_terminators(collapsed[-1], code)
+            if merged is None:
+                break
+            collapsed.pop()
+            code = merged
+            counts["terminators"] += 1
+        collapsed.append(code)
+    return collapsed
+
+def base_address_after(code, base_known):
+    """Track whether ba still holds 0x80000000 after a code"""
+    first, second = code[0]
+    kind = code_kind(first)
+    if kind in (0x40, 0x42, 0x46):
+        return False
+    if kind in (0xE0, 0xE2) and second >> 16:
+        return second >> 16 == 0x8000
+    return base_known
+
+def _optimize_entry(codes, base_known, counts):
+    """Optimize one entry's codes; returns (codes, whether ba is known to be 0x80000000 afterwards)"""
+    skip = any(code_kind(code[0][0]) in JUMP_KINDS for code in codes)
+    optimized = []
+    run = []
+    for code in codes:
+        spans = None if skip or not base_known else write_spans(code)
+        if spans is not None:
+            run.append((code, spans))
+            continue
+        if run:
+            optimized.extend(_optimize_run(run, counts))
+            run = []
+        optimized.append(code)
+        base_known = base_address_after(code, base_known)
+    if run:
+        optimized.extend(_optimize_run(run, counts))
+    if not skip:
+        optimized = _collapse_terminators(optimized, counts)
+    return optimized, base_known
+
+def optimize_code_list(codes):
+    """Return (optimized CodeList, OptimizationReport) for a parsed code list
+
+    Each `$Name` entry is optimized on its own, since any of them may be
+    switched off. Within an entry, runs of consecutive unconditional-looking
+    base address writes (the codehandler applies a run with nothing reading
+    memory in between) lose writes that a later write of the run covers,
+    fold evenly spaced writes into 08 serial writes and merge back to back
+    word writes into 06 string writes. Endifs are then merged with each
+    other, with a following full terminator or into the next if code.
+    Writes are only touched while ba is known to be 0x80000000, and entries
+    that jump by line counts are left alone. Entries that come out unchanged
+    keep their text exactly.
+    """
+    lines = codes.serialize().split("\n")
+    name_lines = [i for i, kind in enumerate(codes.line_kinds) if kind == NAME]
+    starts = [0] + name_lines
+    ends = name_lines + [len(lines)]
+
+    code_list = list(codes.codes())
+    counts = Counter()
+    base_known = True
+    output = []
+    next_code = 0
+
+    for start, end in zip(starts, ends):
+        first_row = bisect_left(codes.row_lines, start)
+        end_row = bisect_left(codes.row_lines, end)
+        entry_codes = []
+        complete = True
+        while next_code < len(code_list) and code_list[next_code][0] < end_row:
+            row, _, length = code_list[next_code]
+            next_code += 1
+            if row + length >= end_row:
+                complete = False  # Cut short; the codehandler would misread it anyway
+                continue
+            entry_codes.append([codes.row(i) for i in range(row, row + length + 1)])
+
+        if not complete:
+            output.extend(lines[start:end])
+            base_known = False
+            continue
+
+        optimized, base_known = _optimize_entry(entry_codes, base_known, counts)
+        if optimized == entry_codes:
+            output.extend(lines[start:end])
+            continue
+
+        # Text lines before the last row stay above the codes, the rest below them
+        last_row_line = codes.row_lines[end_row - 1] if end_row > first_row else start
+        output.extend(lines[i] for i in range(start, end) if codes.line_kinds[i] != ROW and i < last_row_line)
+        output.extend(f"{first:08X} {second:08X}" for code in optimized for first, second in code)
+        output.extend(lines[i] for i in range(last_row_line + 1, end) if codes.line_kinds[i] != ROW)
+
+    optimized_codes = CodeList.parse("\n".join(output))
+    report = OptimizationReport(len(codes), len(optimized_codes), counts["shadowed"], counts["serial"], counts["string"], counts["terminators"])
+    return optimized_codes, report
@@ -0,0 +1,929 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import re
+import struct
+
+class AssemblerError(Exception):
+    """Raised for source the in-process assembler cannot encode exactly like GNU as"""
+
+    def __init__(self, message, line=None):
+        super().__init__(f"line {line}: {message}" if line is not None else message)
+        self.line = line
+
+
+# Register names accepted with -mregnames (case-insensitive, optional % prefix)
+REGISTERS = {"sp": ("r", 1), "rtoc": ("r", 2)}
+for _n in range(32):
+    REGISTERS[f"r{_n}"] = ("r", _n)
+    REGISTERS[f"f{_n}"] = ("f", _n)
+for _n in range(8):
+    REGISTERS[f"cr{_n}"] = ("cr", _n)
+
+REGISTER_KINDS = {"r": "a general purpose", "f": "a floating point", "cr": "a condition"}
+
+# Condition register bit names usable in CR bit operands, e.g. 4*cr1+eq
+CR_BITS = {"lt": 0, "gt": 1, "eq": 2, "so": 3, "un": 3}
+
+SPECIAL_REGISTERS = {
+    "xer": 1, "lr": 8, "ctr": 9, "dsisr": 18, "dar": 19, "dec": 22, "sdr1": 25,
+    "srr0": 26, "srr1": 27, "sprg0": 272, "sprg1": 273, "sprg2": 274, "sprg3": 275,
+    "ear": 282, "tbl": 284, "tbu": 285, "pvr": 287
+}
+
+# Operand fields: (parse kind, shift, bits); a trailing ? in an instruction's field list marks it optional
+FIELDS = {
+    "D": ("gpr", 21, 5), "S": ("gpr", 21, 5), "A": ("gpr", 16, 5), "B": ("gpr", 11, 5),
+    "FD": ("fpr", 21, 5), "FA": ("fpr", 16, 5), "FB": ("fpr", 11, 5), "FC": ("fpr", 6, 5),
+    "SIMM": ("simm", 0, 16),     # signed
+    "SIMMX": ("simmx", 0, 16),   # signed, unsigned values up to 0xFFFF also accepted
+    "UIMM": ("uimm", 0, 16),     # unsigned
+    "UIMMX": ("uimmx", 0, 16),   # unsigned, negative values down to -0x8000 also accepted
+    "MEM": ("mem", 0, 16), "MEMU": ("memu", 0, 16), "MEMS": ("mems", 0, 16), "MEM12": ("mem", 0, 12),
+    "CRFD": ("crf", 23, 3), "CRFS": ("crf", 18, 3), "L": ("uimm", 21, 1),
+    "SH": ("uimm", 11, 5), "MB": ("uimm", 6, 5), "ME": ("uimm", 1, 5),
+    "CRBD": ("crb", 21, 5), "CRBA": ("crb", 16, 5), "CRBB": ("crb", 11, 5),
+    "BO": ("uimm", 21, 5), "BI": ("crb", 16, 5), "BD": ("target", 0, 16), "LI": ("target", 0, 26),
+    "SPR": ("spr", 11, 10), "TBR": ("spr", 11, 10),
+    "CRM": ("uimm", 12, 8), "FM": ("uimm", 17, 8), "IMM": ("uimm", 12, 4), "SR": ("uimm", 16, 4),
+    "TO": ("uimm", 21, 5), "NB": ("uimm", 11, 5),
+    "W": ("uimm", 15, 1), "I": ("uimm", 12, 3), "WX": ("uimm", 10, 1), "IX": ("uimm", 7, 3)
+}
+
+FIELD_DEFAULTS = {"TBR": 268}
+
+def _form(primary, xo=0):
+    return (primary << 26) | (xo << 1)
+
+# mnemonic -> (base word, fields); instructions in RC take a `.` variant, those in OE also `o` and `o.`
+INSTRUCTIONS = {}
+RC = set()
+OE = set()
+
+def _define(names, word, fields, rc=False, oe=False):
+    for name in names.split():
+        INSTRUCTIONS[name] = (word, fields)
+        if rc:
+            RC.add(name)
+        if oe:
+            OE.add(name)
+
+# Integer immediates, loads and stores
+_define("twi", _form(3), ("TO", "A", "SIMM"))
+_define("mulli", _form(7), ("D", "A", "SIMM"))
+_define("subfic", _form(8), ("D", "A", "SIMM"))
+_define("cmpli", _form(10), ("CRFD", "L?", "A", "UIMMX"))
+_define("cmpi", _form(11), ("CRFD", "L?", "A", "SIMM"))
+_define("addic", _form(12), ("D", "A", "SIMM"))
+_define("addic.", _form(13), ("D", "A", "SIMM"))
+_define("addi", _form(14), ("D", "A", "SIMM"))
+_define("addis", _form(15), ("D", "A", "SIMMX"))
+for _name, _primary in (("ori", 24), ("oris", 25), ("xori", 26), ("xoris", 27), ("andi.", 28), ("andis.", 29)):
+    _define(_name, _form(_primary), ("A", "S", "UIMM"))
+for _name, _primary in (("lwz", 32), ("lbz", 34), ("stw", 36), ("stb", 38), ("lhz", 40), ("lha", 42),
+                        ("sth", 44), ("lmw", 46), ("stmw", 47)):
+    _define(_name, _form(_primary), ("D", "MEM"))
+for _name, _primary in (("lwzu", 33), ("lbzu", 35), ("lhzu", 41), ("lhau", 43)):
+    _define(_name, _form(_primary), ("D", "MEMU"))
+for _name, _primary in (("stwu", 37), ("stbu", 39), ("sthu", 45)):
+    _define(_name, _form(_primary), ("D", "MEMS"))
+for _name, _primary in (("lfs", 48), ("lfd", 50), ("stfs", 52), ("stfd", 54)):
+    _define(_name, _form(_primary), ("FD", "MEM"))
+    _define(_name + "u", _form(_primary + 1), ("FD", "MEMS"))
+_define("psq_l", _form(56), ("FD", "MEM12", "W", "I"))
+_define("psq_lu", _form(57), ("FD", "MEM12", "W", "I"))
+_define("psq_st", _form(60), ("FD", "MEM12", "W", "I"))
+_define("psq_stu", _form(61), ("FD", "MEM12", "W", "I"))
+
+# Rotates
+_define("rlwimi", _form(20), ("A", "S", "SH", "MB", "ME"), rc=True)
+_define("rlwinm", _form(21), ("A", "S", "SH", "MB", "ME"), rc=True)
+_define("rlwnm", _form(23), ("A", "S", "B", "MB", "ME"), rc=True)
+
+# Branches and condition register logic
+_define("b", _form(18), ("LI",))
+_define("bl", _form(18) | 1, ("LI",))
+_define("ba", _form(18) | 2, ("LI",))
+_define("bla", _form(18) | 3, ("LI",))
+_define("bc", _form(16), ("BO", "BI", "BD"))
+_define("bcl", _form(16) | 1, ("BO", "BI", "BD"))
+_define("bca", _form(16) | 2, ("BO", "BI", "BD"))
+_define("bcla", _form(16) | 3, ("BO", "BI", "BD"))
+_define("bclr", _form(19, 16), ("BO", "BI"))
+_define("bclrl", _form(19, 16) | 1, ("BO", "BI"))
+_define("bcctr", _form(19, 528), ("BO", "BI"))
+_define("bcctrl", _form(19, 528) | 1, ("BO", "BI"))
+_define("sc", _form(17) | 2, ())
+_define("mcrf", _form(19, 0), ("CRFD", "CRFS"))
+_define("rfi", _form(19, 50), ())
+_define("isync", _form(19, 150), ())
+for _name, _xo in (("crnor", 33), ("crandc", 129), ("crxor", 193), ("crnand", 225), ("crand", 257),
+                   ("creqv", 289), ("crorc", 417), ("cror", 449)):
+    _define(_name, _form(19, _xo), ("CRBD", "CRBA", "CRBB"))
+
+# Integer arithmetic and logic (primary opcode 31)
+for _name, _xo in (("subfc", 8), ("addc", 10), ("subf", 40), ("subfe", 136), ("adde", 138), ("mullw", 235),
+                   ("add", 266), ("divwu", 459), ("divw", 491)):
+    _define(_name, _form(31, _xo), ("D", "A", "B"), rc=True, oe=True)
+_define("mulhwu", _form(31, 11), ("D", "A", "B"), rc=True)
+_define("mulhw", _form(31, 75), ("D", "A", "B"), rc=True)
+for _name, _xo in (("neg", 104), ("subfze", 200), ("addze", 202), ("subfme", 232), ("addme", 234)):
+    _define(_name, _form(31, _xo), ("D", "A"), rc=True, oe=True)
+for _name, _xo in (("slw", 24), ("and", 28), ("andc", 60), ("nor", 124), ("eqv", 284), ("xor", 316),
+                   ("orc", 412), ("or", 444), ("nand", 476), ("srw", 536), ("sraw", 792)):
+    _define(_name, _form(31, _xo), ("A", "S", "B"), rc=True)
+for _name, _xo in (("cntlzw", 26), ("extsh", 922), ("extsb", 954)):
+    _define(_name, _form(31, _xo), ("A", "S"), rc=True)
+_define("srawi", _form(31, 824), ("A", "S", "SH"), rc=True)
+_define("cmp", _form(31, 0), ("CRFD", "L?", "A", "B"))
+_define("cmpl", _form(31, 32), ("CRFD", "L?", "A", "B"))
+_define("tw", _form(31, 4), ("TO", "A", "B"))
+for _name, _xo in (("lwarx", 20), ("lwzx", 23), ("lwzux", 55), ("lbzx", 87), ("lbzux", 119), ("lhzx", 279),
+                   ("lhzux", 311), ("lhax", 343), ("lhaux", 375), ("eciwx", 310), ("lswx", 533), ("lwbrx", 534),
+                   ("lhbrx", 790), ("stwx", 151), ("stwux", 183), ("stbx", 215), ("stbux", 247), ("sthx", 407),
+                   ("sthux", 439), ("ecowx", 438), ("stswx", 661), ("stwbrx", 662), ("sthbrx", 918)):
+    _define(_name, _form(31, _xo), ("D", "A", "B"))
+_define("stwcx.", _form(31, 150) | 1, ("S", "A", "B"))
+for _name, _xo in (("lfsx", 535), ("lfsux", 567), ("lfdx", 599), ("lfdux", 631), ("stfsx", 663),
+                   ("stfsux", 695), ("stfdx", 727), ("stfdux", 759), ("stfiwx", 983)):
+    _define(_name, _form(31, _xo), ("FD", "A", "B"))
+_define("lswi", _form(31, 597), ("D", "A", "NB"))
+_define("stswi", _form(31, 725), ("S", "A", "NB"))
+for _name, _xo in (("dcbst", 54), ("dcbf", 86), ("dcbtst", 246), ("dcbt", 278), ("dcbi", 470),
+                   ("icbi", 982), ("dcbz", 1014)):
+    _define(_name, _form(31, _xo), ("A", "B"))
+_define("mfcr", _form(31, 19), ("D",))
+_define("mfmsr", _form(31, 83), ("D",))
+_define("mtmsr", _form(31, 146), ("S",))
+_define("mtcrf", _form(31, 144), ("CRM", "S"))
+_define("mcrxr", _form(31, 512), ("CRFD",))
+_define("mfspr", _form(31, 339), ("D", "SPR"))
+_define("mtspr", _form(31, 467), ("SPR", "S"))
+_define("mftb", _form(31, 371), ("D", "TBR?"))
+_define("mfsr", _form(31, 595), ("D", "SR"))
+_define("mtsr", _form(31, 210), ("SR", "S"))
+_define("mfsrin", _form(31, 659), ("D", "B"))
+_define("mtsrin", _form(31, 242), ("S", "B"))
+_define("tlbie", _form(31, 306), ("B",))
+_define("tlbsync", _form(31, 566), ())
+_define("sync", _form(31, 598), ())
+_define("eieio", _form(31, 854), ())
+
+# Floating point (primary opcodes 63 and 59)
+_define("fcmpu", _form(63, 0), ("CRFD", "FA", "FB"))
+_define("fcmpo", _form(63, 32), ("CRFD", "FA", "FB"))
+_define("mcrfs", _form(63, 64), ("CRFD", "CRFS"))
+for _name, _xo in (("frsp", 12), ("fctiw", 14), ("fctiwz", 15), ("fneg", 40), ("fmr", 72), ("fnabs", 136),
+                   ("fabs", 264), ("frsqrte", 26)):
+    _define(_name, _form(63, _xo), ("FD", "FB"), rc=True)
+_define("fres", _form(59, 24), ("FD", "FB"), rc=True)
+_define("mffs", _form(63, 583), ("FD",), rc=True)
+_define("mtfsf", _form(63, 711), ("FM", "FB"), rc=True)
+_define("mtfsfi", _form(63, 134), ("CRFD", "IMM"), rc=True)
+_define("mtfsb0", _form(63, 70), ("CRBD",), rc=True)
+_define("mtfsb1", _form(63, 38), ("CRBD",), rc=True)
+for _suffix, _primary in (("", 63), ("s", 59)):
+    for _name, _xo in (("fdiv", 18), ("fsub", 20), ("fadd", 21)):
+        _define(_name + _suffix, _form(_primary, _xo), ("FD", "FA", "FB"), rc=True)
+    _define("fmul" + _suffix, _form(_primary, 25), ("FD", "FA", "FC"), rc=True)
+    for _name, _xo in (("fmsub", 28), ("fmadd", 29), ("fnmsub", 30), ("fnmadd", 31)):
+        _define(_name + _suffix, _form(_primary, _xo), ("FD", "FA", "FC", "FB"), rc=True)
+_define("fsel", _form(63, 23), ("FD", "FA", "FC", "FB"), rc=True)
+
+# Paired singles (primary opcode 4)
+for _name, _xo in (("ps_cmpu0", 0), ("ps_cmpo0", 32), ("ps_cmpu1", 64), ("ps_cmpo1", 96)):
+    _define(_name, _form(4, _xo), ("CRFD", "FA", "FB"))
+for _name, _xo in (("ps_sum0", 10), ("ps_sum1", 11), ("ps_madds0", 14), ("ps_madds1", 15), ("ps_sel", 23),
+                   ("ps_msub", 28), ("ps_madd", 29), ("ps_nmsub", 30), ("ps_nmadd", 31)):
+    _define(_name, _form(4, _xo), ("FD", "FA", "FC", "FB"), rc=True)
+for _name, _xo in (("ps_muls0", 12), ("ps_muls1", 13), ("ps_mul", 25)):
+    _define(_name, _form(4, _xo), ("FD", "FA", "FC"), rc=True)
+for _name, _xo in (("ps_div", 18), ("ps_sub", 20), ("ps_add", 21), ("ps_merge00", 528), ("ps_merge01", 560),
+                   ("ps_merge10", 592), ("ps_merge11", 624)):
+    _define(_name, _form(4, _xo), ("FD", "FA", "FB"), rc=True)
+for _name, _xo in (("ps_res", 24), ("ps_rsqrte", 26), ("ps_neg", 40), ("ps_mr", 72), ("ps_nabs", 136),
+                   ("ps_abs", 264)):
+    _define(_name, _form(4, _xo), ("FD", "FB"), rc=True)
+for _name, _xo in (("psq_lx", 6), ("psq_stx", 7), ("psq_lux", 38), ("psq_stux", 39)):
+    _define(_name, _form(4, _xo), ("FD", "A", "B", "WX", "IX"))
+_define("dcbz_l", _form(4, 1014), ("A", "B"))
+
+# Simplified mnemonics: mnemonic -> (instruction, fields, operand builder)
+ALIASES = {}
+ALIAS_RC = set()
+ALIAS_OE = set()
+
+def _alias(name, target, fields, build, rc=False, oe=False):
+    ALIASES[name] = (target, fields, build)
+    if rc:
+        ALIAS_RC.add(name)
+    if oe:
+        ALIAS_OE.add(name)
+
+_alias("li", "addi", ("D", "SIMM"), lambda d, v: (d, 0, v))
+_alias("lis", "addis", ("D", "SIMMX"), lambda d, v: (d, 0, v))
+_alias("la", "addi", ("D", "MEM"), lambda d, m: (d, m[1], m[0]))
+_alias("subi", "addi", ("D", "A", "SIMM"), lambda d, a, v: (d, a, -v))
+_alias("subis", "addis", ("D", "A", "SIMMX"), lambda d, a, v: (d, a, -v))
+_alias("subic", "addic", ("D", "A", "SIMM"), lambda d, a, v: (d, a, -v))
+_alias("subic.", "addic.", ("D", "A", "SIMM"), lambda d, a, v: (d, a, -v))
+_alias("nop", "ori", (), lambda: (0, 0, 0))
+_alias("mr", "or", ("A", "S"), lambda a, s: (a, s, s), rc=True)
+_alias("not", "nor", ("A", "S"), lambda a, s: (a, s, s), rc=True)
+_alias("sub", "subf", ("D", "A", "B"), lambda d, a, b: (d, b, a), rc=True, oe=True)
+_alias("subc", "subfc", ("D", "A", "B"), lambda d, a, b: (d, b, a), rc=True, oe=True)
+_alias("cmpw", "cmp", ("CRFD?", "A", "B"), lambda c, a, b: (c, 0, a, b))
+_alias("cmplw", "cmpl", ("CRFD?", "A", "B"), lambda c, a, b: (c, 0, a, b))
+_alias("cmpwi", "cmpi", ("CRFD?", "A", "SIMM"), lambda c, a, v: (c, 0, a, v))
+_alias("cmplwi", "cmpli", ("CRFD?", "A", "UIMMX"), lambda c, a, v: (c, 0, a, v))
+_alias("slwi", "rlwinm", ("A", "S", "SH"), lambda a, s, n: (a, s, n, 0, 31 - n), rc=True)
+_alias("srwi", "rlwinm", ("A", "S", "SH"), lambda a, s, n: (a, s, (32 - n) & 31, n, 31), rc=True)
+_alias("clrlwi", "rlwinm", ("A", "S", "SH"), lambda a, s, n: (a, s, 0, n, 31), rc=True)
+_alias("clrrwi", "rlwinm", ("A", "S", "SH"), lambda a, s, n: (a, s, 0, 0, 31 - n), rc=True)
+_alias("rotlwi", "rlwinm", ("A", "S", "SH"), lambda a, s, n: (a, s, n, 0, 31), rc=True)
+_alias("rotrwi", "rlwinm", ("A", "S", "SH"), lambda a, s, n: (a, s, (32 - n) & 31, 0, 31), rc=True)
+_alias("rotlw", "rlwnm", ("A", "S", "B"), lambda a, s, b: (a, s, b, 0, 31), rc=True)
+_alias("extlwi", "rlwinm", ("A", "S", "SH", "MB"), lambda a, s, n, b: (a, s, b, 0, n - 1), rc=True)
+_alias("extrwi", "rlwinm", ("A", "S", "SH", "MB"), lambda a, s, n, b: (a, s, (b + n) & 31, 32 - n, 31), rc=True)
+_alias("inslwi", "rlwimi", ("A", "S", "SH", "MB"), lambda a, s, n, b: (a, s, (32 - b) & 31, b, b + n - 1), rc=True)
+_alias("insrwi", "rlwimi", ("A", "S", "SH", "MB"),
+       lambda a, s, n, b: (a, s, (32 - b - n) & 31, b, b + n - 1), rc=True)
+_alias("clrlslwi", "rlwinm", ("A", "S", "MB", "SH"), lambda a, s, b, n: (a, s, n, b - n, 31 - n), rc=True)
+_alias("crset", "creqv", ("CRBD",), lambda d: (d, d, d))
+_alias("crclr", "crxor", ("CRBD",), lambda d: (d, d, d))
+_alias("crmove", "cror", ("CRBD", "CRBA"), lambda d, a: (d, a, a))
+_alias("crnot", "crnor", ("CRBD", "CRBA"), lambda d, a: (d, a, a))
+_alias("mtcr", "mtcrf", ("S",), lambda s: (0xFF, s))
+_alias("mftbu", "mftb", ("D",), lambda d: (d, 269))
+_alias("trap", "tw", (), lambda: (31, 0, 0))
+_alias("blr", "bclr", (), lambda: (20, 0))
+_alias("blrl", "bclrl", (), lambda: (20, 0))
+_alias("bctr", "bcctr", (), lambda: (20, 0))
+_alias("bctrl", "bcctrl", (), lambda: (20, 0))
+for _name, _number in SPECIAL_REGISTERS.items():
+    if _name not in ("tbl", "tbu"):
+        _alias("mf" + _name, "mfspr", ("D",), lambda d, spr=_number: (d, spr))
+    if _name != "pvr":
+        _alias("mt" + _name, "mtspr", ("S",), lambda s, spr=_number: (spr, s))
+
+# Conditional branches: BO for "branch if the CR bit is set/clear" and the CR bit each condition tests
+BRANCH_CONDITIONS = {"lt": (12, 0), "gt": (12, 1), "eq": (12, 2), "so": (12, 3), "un": (12, 3),
+                     "ge": (4, 0), "nl": (4, 0), "le": (4, 1), "ng": (4, 1), "ne": (4, 2), "ns": (4, 3), "nu": (4, 3)}
+BRANCH_DECREMENTS = {"dnz": 16, "dz": 18}
+BRANCH_DECREMENTS_ON_BIT = {"dnzt": 8, "dnzf": 0, "dzt": 10, "dzf": 2, "t": 12, "f": 4}
+for _cond, (_bo, _bit) in BRANCH_CONDITIONS.items():
+    for _suffix, _target in (("", "bc"), ("l", "bcl"), ("a", "bca"), ("la", "bcla")):
+        _alias(f"b{_cond}{_suffix}", _target, ("CRFD?", "BD"), lambda c, t, bo=_bo, bit=_bit: (bo, c * 4 + bit, t))
+    for _suffix, _target in (("lr", "bclr"), ("lrl", "bclrl"), ("ctr", "bcctr"), ("ctrl", "bcctrl")):
+        _alias(f"b{_cond}{_suffix}", _target, ("CRFD?",), lambda c, bo=_bo, bit=_bit: (bo, c * 4 + bit))
+for _cond, _bo in BRANCH_DECREMENTS.items():
+    for _suffix, _target in (("", "bc"), ("l", "bcl"), ("a", "bca"), ("la", "bcla")):
+        _alias(f"b{_cond}{_suffix}", _target, ("BD",), lambda t, bo=_bo: (bo, 0, t))
+    for _suffix, _target in (("lr", "bclr"), ("lrl", "bclrl")):
+        _alias(f"b{_cond}{_suffix}", _target, (), lambda bo=_bo: (bo, 0))
+for _cond, _bo in BRANCH_DECREMENTS_ON_BIT.items():
+    for _suffix, _target in (("", "bc"), ("l", "bcl"), ("a", "bca"), ("la", "bcla")):
+        _alias(f"b{_cond}{_suffix}", _target, ("BI", "BD"), lambda i, t, bo=_bo: (bo, i, t))
+    for _suffix, _target in (("lr", "bclr"), ("lrl", "bclrl")) + ((("ctr", "bcctr"), ("ctrl", "bcctrl"))
+                                                                    if _bo in (4, 12) else ()):
+        _alias(f"b{_cond}{_suffix}", _target, ("BI",), lambda i, bo=_bo: (bo, i))
+
+# Directives that never change the emitted bytes
+IGNORED_DIRECTIVES = {".text", ".globl", ".global", ".local", ".weak", ".hidden", ".type", ".size",
+                      ".file", ".ident", ".machine", ".abiversion"}
+DATA_DIRECTIVES = {".long": (4, ">I"), ".int": (4, ">I"), ".4byte": (4, ">I"), ".short": (2, ">H"),
+                   ".half": (2, ">H"), ".hword": (2, ">H"), ".2byte": (2, ">H"), ".byte": (1, ">B"),
+                   ".quad": (8, ">Q"), ".8byte": (8, ">Q")}
+FLOAT_DIRECTIVES = {".float": ">f", ".single": ">f", ".double": ">d"}
+STRING_DIRECTIVES = {".ascii": False, ".asciz": True, ".string": True}
+SPACE_DIRECTIVES = {".space", ".skip", ".zero"}
+ALIGN_DIRECTIVES = {".align": True, ".p2align": True, ".balign": False}
+SET_DIRECTIVES = {".set", ".equ"}
+
+NOP = 0x60000000
+
+TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<number>0[xX][0-9A-Fa-f]+|0[bB][01]+(?![\w.$])|\d+[bf](?![\w.$])|\d+)
+    |(?P<name>%?[A-Za-z_.$][\w.$]*)
+    |(?P<char>'(?:\\.|[^\\']))'?
+    |(?P<op><<|>>|[-+*/%&|^~!()@])
+    )""", re.VERBOSE)
+LABEL_PATTERN = re.compile(r"\s*([A-Za-z_.$][\w.$]*|\d+)\s*:(?!:)")
+ASSIGN_PATTERN = re.compile(r"\s*([A-Za-z_.$][\w.$]*)\s*=(?!=)(.*)$")
+RELOCATION_SUFFIXES = {"l", "h", "ha"}
+
+# gas precedence: * / % << >> bind tightest, then | & ^, then + -
+BINARY_PRECEDENCE = {"*": 3, "/": 3, "%": 3, "<<": 3, ">>": 3, "|": 2, "&": 2, "^": 2, "+": 1, "-": 1}
+
+def _split_statements(source):
+    """Yield (line number, statement) with comments removed and `;` separated statements split"""
+    source = re.sub(r"/\*.*?\*/", lambda match: "\n" * match.group().count("\n"), source, flags=re.DOTALL)
+    for line_number, line in enumerate(source.splitlines(), 1):
+        statement = []
+        quote = False
+        escaped = False
+        for char in line:
+            if quote:
+                statement.append(char)
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    quote = False
+            elif char == "#":
+                break
+            elif char == ";":
+                yield line_number, "".join(statement)
+                statement = []
+            else:
+                if char == '"':
+                    quote = True
+                statement.append(char)
+        yield line_number, "".join(statement)
+
+def _split_operands(text):
+    """Split an operand list on top-level commas"""
+    operands = []
+    depth = 0
+    quote = False
+    start = 0
+    for index, char in enumerate(text):
+        if quote:
+            if char == '"' and text[index - 1] != "\\":
+                quote = False
+        elif char == '"':
+            quote = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            operands.append(text[start:index].strip())
+            start = index + 1
+    last = text[start:].strip()
+    if operands or last:
+        operands.append(last)
+    return operands
+
+def _c_divide(left, right, line):
+    if right == 0:
+        raise AssemblerError("division by zero", line)
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+def _sign_extend_16(value):
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+def _parse_string(text, line):
+    """Decode a gas string literal"""
+    if len(text) < 2 or text[0] != '"' or text[-1] != '"':
+        raise AssemblerError(f"expected a string, got {text!r}", line)
+    output = bytearray()
+    index = 1
+    end = len(text) - 1
+    escapes = {"n": 10, "t": 9, "r": 13, "b": 8, "f": 12, "\\": 92, '"': 34, "'": 39}
+    while index < end:
+        char = text[index]
+        if char != "\\":
+            output += char.encode("utf-8")
+            index += 1
+            continue
+        index += 1
+        char = text[index]
+        if char in escapes:
+            output.append(escapes[char])
+            index += 1
+        elif char in "01234567":
+            digits = re.match(r"[0-7]{1,3}", text[index:end]).group()
+            output.append(int(digits, 8) & 0xFF)
+            index += len(digits)
+        elif char in "xX":
+            digits = re.match(r"[0-9A-Fa-f]*", text[index + 1:end]).group()
+            if not digits:
+                raise AssemblerError("bad \\x escape", line)
+            output.append(int(digits, 16) & 0xFF)
+            index += 1 + len(digits)
+        else:
+            raise AssemblerError(f"unknown escape \\{char}", line)
+    return bytes(output)
+
+
+class _ExpressionParser:
+    """Parse one operand into an expression tree
+
+    Nodes are tuples: ("num", value), ("sym", name), ("reg", kind, number),
+    ("dot",), ("neg"/"not"/"lnot", node), ("bin", op, left, right),
+    ("suffix", name, node) and ("mem", displacement, register).
+    """
+
+    def __init__(self, text, line, local_label):
+        self.line = line
+        self.local_label = local_label
+        self.tokens = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                raise AssemblerError(f"cannot parse {text[position:]!r}", line)
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.index += 1
+        return token
+
+    def expect(self, value):
+        kind, text = self.take()
+        if text != value:
+            raise AssemblerError(f"expected {value!r}", self.line)
+
+    def parse_operand(self):
+        if not self.tokens:
+            raise AssemblerError("missing operand", self.line)
+        node = self.parse_expression()
+        if self.peek()[1] == "@":
+            self.take()
+            kind, name = self.take()
+            if kind != "name" or name.lower() not in RELOCATION_SUFFIXES:
+                raise AssemblerError(f"unsupported relocation @{name}", self.line)
+            # identifier@suffix+constant adds the constant before the suffix applies
+            if self.peek()[1] in ("+", "-"):
+                op = self.take()[1]
+                node = ("bin", op, node, self.parse_expression())
+            node = ("suffix", name.lower(), node)
+        if self.peek()[1] == "(":
+            self.take()
+            register = self.parse_expression()
+            self.expect(")")
+            node = ("mem", node, register)
+        if self.index != len(self.tokens):
+            raise AssemblerError(f"unexpected {self.peek()[1]!r}", self.line)
+        return node
+
+    def parse_expression(self, min_precedence=1):
+        node = self.parse_unary()
+        while True:
+            kind, op = self.peek()
+            precedence = BINARY_PRECEDENCE.get(op) if kind == "op" else None
+            if precedence is None or precedence < min_precedence:
+                return node
+            self.take()
+            node = ("bin", op, node, self.parse_expression(precedence + 1))
+
+    def parse_unary(self):
+        kind, text = self.take()
+        if kind == "op" and text in ("-", "~", "!", "+"):
+            operand = self.parse_unary()
+            return operand if text == "+" else ({"-": "neg", "~": "not", "!": "lnot"}[text], operand)
+        if kind == "op" and text == "(":
+            node = self.parse_expression()
+            self.expect(")")
+            return node
+        if kind == "number":
+            if text[-1] in "bf" and not text.lower().startswith(("0x", "0b")) or text in ("0b", "0f"):
+                return ("sym", self.local_label(text[:-1], text[-1] == "f"))
+            if text.lower().startswith("0x"):
+                return ("num", int(text, 16))
+            if text.lower().startswith("0b"):
+                return ("num", int(text[2:], 2))
+            if len(text) > 1 and text[0] == "0":
+                return ("num", int(text, 8))
+            return ("num", int(text))
+        if kind == "char":
+            return ("num", _parse_string('"' + text[1:] + '"', self.line)[0])
+        if kind == "name":
+            register = REGISTERS.get(text.lstrip("%").lower())
+            if register is not None:
+                return ("reg",) + register
+            if text.startswith("%"):
+                raise AssemblerError(f"unknown register {text}", self.line)
+            if text == ".":
+                return ("dot",)
+            return ("sym", text)
+        raise AssemblerError(f"unexpected {text!r}" if text else "missing operand", self.line)
+
+
+class Assembler:
+    """Two-pass assembler for the Gekko/Broadway instructions CodeFusion accepts
+
+    Covers the integer, floating point and paired-single instruction sets
+    that `as -mgekko -mregnames` takes, plus labels, numeric local labels,
+    `.set`/`=`, @ha/@h/@l and the common data directives. The output is the
+    raw text section bytes the external assembler would produce.
+
+    The code is position independent: labels are section offsets, and
+    anything that would need a relocation raises AssemblerError so the
+    caller can fall back to the external toolchain.
+    """
+
+    def __init__(self, symbols=None):
+        self.symbols = symbols
+
+    def assemble(self, source):
+        """Return the text section bytes for an assembly source"""
+        self.labels = {}
+        self.final_sets = {}
+        self.local_counts = {}
+        items = self._first_pass(source)
+
+        self.sets = {}
+        output = bytearray()
+        for line, kind, offset, payload in items:
+            self.line = line
+            self.offset = offset
+            if kind == "set":
+                self.sets[payload[0]] = self._evaluate(payload[1])
+            elif kind == "insn":
+                output += struct.pack(">I", self._encode(*payload))
+            elif kind == "data":
+                size, fmt, nodes = payload
+                for node in nodes:
+                    output += struct.pack(fmt, self._absolute(node) & ((1 << (size * 8)) - 1))
+                    self.offset += size
+            else:
+                output += payload
+        return bytes(output)
+
+    # First pass: statements, label offsets and sizes
+
+    def _local_label(self, number, forward):
+        count = self.local_counts.get(number, 0) + (1 if forward else 0)
+        if count == 0:
+            raise AssemblerError(f"local label {number}b is not defined yet", self.line)
+        return f"{number}\x02{count}"
+
+    def _parse(self, text):
+        return _ExpressionParser(text, self.line, self._local_label).parse_operand()
+
+    def _define_label(self, name):
+        if name.isdigit():
+            self.local_counts[name] = self.local_counts.get(name, 0) + 1
+            name = f"{name}\x02{self.local_counts[name]}"
+        elif name in self.labels or name in self.final_sets or name.lower() in REGISTERS:
+            raise AssemblerError(f"symbol `{name}' is already defined", self.line)
+        elif self.symbols is not None and name in self.symbols:
+            raise AssemblerError(f"symbol `{name}' is already defined by the game symbols", self.line)
+        self.labels[name] = self.offset
+
+    def _first_pass(self, source):
+        items = []
+        self.offset = 0
+        self.sets = self.final_sets
+        for line, statement in _split_statements(source):
+            self.line = line
+            while True:
+                match = LABEL_PATTERN.match(statement)
+                if not match:
+                    break
+                self._define_label(match.group(1))
+                statement = statement[match.end():]
+            statement = statement.strip()
+            if not statement:
+                continue
+
+            assignment = ASSIGN_PATTERN.match(statement)
+            if assignment:
+                self._first_pass_set(items, assignment.group(1), assignment.group(2))
+                continue
+
+            parts = statement.split(None, 1)
+            mnemonic = parts[0].lower()
+            operands = _split_operands(parts[1]) if len(parts) > 1 else []
+            if mnemonic.startswith("."):
+                self._first_pass_directive(items, mnemonic, operands, parts[1] if len(parts) > 1 else "")
+            else:
+                items.append((line, "insn", self.offset, (mnemonic, [self._parse(operand) for operand in operands])))
+                self.offset += 4
+        return items
+
+    def _first_pass_set(self, items, name, text):
+        if name in self.labels or name.lower() in REGISTERS:
+            raise AssemblerError(f"symbol `{name}' is already defined", self.line)
+        node = self._parse(text)
+        items.append((self.line, "set", self.offset, (name, node)))
+        try:
+            self.final_sets[name] = self._evaluate(node)
+        except _Unresolved:
+            self.final_sets[name] = node
+
+    def _first_pass_directive(self, items, directive, operands, text):
+        line = self.line
+        if directive in IGNORED_DIRECTIVES:
+            return
+        if directive == ".section":
+            if operands and operands[0] == ".text":
+                return
+            raise AssemblerError("only the .text section is supported", line)
+        if directive in SET_DIRECTIVES:
+            if len(operands) != 2:
+                raise AssemblerError(f"{directive} takes a name and a value", line)
+            self._first_pass_set(items, operands[0], operands[1])
+        elif directive in DATA_DIRECTIVES:
+            size, fmt = DATA_DIRECTIVES[directive]
+            nodes = [self._parse(operand) for operand in operands]
+            items.append((line, "data", self.offset, (size, fmt, nodes)))
+            self.offset += size * len(nodes)
+        elif directive in FLOAT_DIRECTIVES:
+            fmt = FLOAT_DIRECTIVES[directive]
+            data = b""
+            for operand in operands:
+                try:
+                    data += struct.pack(fmt, float(re.sub(r"^0[fFdDeE]", "", operand)))
+                except (ValueError, OverflowError):
+                    raise AssemblerError(f"bad floating point constant {operand!r}", line)
+            self._emit(items, data)
+        elif directive in STRING_DIRECTIVES:
+            terminate = STRING_DIRECTIVES[directive]
+            data = b"".join(_parse_string(operand, line) + (b"\x00" if terminate else b"") for operand in operands)
+            self._emit(items, data)
+        elif directive in SPACE_DIRECTIVES:
+            if not 1 <= len(operands) <= 2:
+                raise AssemblerError(f"{directive} takes a size and an optional fill", line)
+            size = self._absolute(self._parse(operands[0]))
+            fill = self._absolute(self._parse(operands[1])) & 0xFF if len(operands) == 2 else 0
+            if size < 0:
+                raise AssemblerError(f"negative {directive} size", line)
+            self._emit(items, bytes([fill]) * size)
+        elif directive in ALIGN_DIRECTIVES:
+            if not 1 <= len(operands) <= 2:
+                raise AssemblerError(f"unsupported {directive} form", line)
+            alignment = self._absolute(self._parse(operands[0]))
+            if ALIGN_DIRECTIVES[directive]:
+                alignment = 1 << alignment
+            if alignment <= 0 or alignment & (alignment - 1):
+                raise AssemblerError("alignment is not a power of 2", line)
+            padding = -self.offset % alignment
+            if len(operands) == 2:
+                self._emit(items, bytes([self._absolute(self._parse(operands[1])) & 0xFF]) * padding)
+            else:
+                # Code sections are padded with zeros up to a word boundary, then nops
+                self._emit(items, bytes(padding & 3) + struct.pack(">I", NOP) * (padding >> 2))
+        else:
+            raise AssemblerError(f"unsupported directive {directive}", line)
+
+    def _emit(self, items, data):
+        items.append((self.line, "bytes", self.offset, data))
+        self.offset += len(data)
+
+    # Expressions
+
+    def _lookup(self, name):
+        """Return (value, relative) for a symbol, raising _Unresolved if it is not known yet"""
+        if name in self.labels:
+            return self.labels[name], True
+        value = self.sets.get(name)
+        if value is None and self.symbols is not None:
+            address = self.symbols.lookup(name)
+            if address is not None:
+                return address, False
+        if value is None:
+            value = self.final_sets.get(name)
+        if value is None:
+            raise _Unresolved(name)
+        if isinstance(value, tuple) and isinstance(value[0], str):
+            # A .set whose value depended on a later label; resolve it now
+            value = self._evaluate(value)
+        return value
+
+    def _evaluate(self, node, cr_names=False):
+        """Return (value, relative) for an expression tree"""
+        kind = node[0]
+        if kind == "num":
+            return node[1], False
+        if kind == "sym":
+            name = node[1]
+            if cr_names and name in CR_BITS:
+                return CR_BITS[name], False
+            return self._lookup(name)
+        if kind == "dot":
+            return self.offset, True
+        if kind == "reg":
+            if cr_names and node[1] == "cr":
+                return node[2], False
+            raise AssemblerError("register used as a value", self.line)
+        if kind in ("neg", "not", "lnot"):
+            value, relative = self._evaluate(node[1], cr_names)
+            if relative:
+                raise AssemblerError("expression needs a relocation", self.line)
+            return {"neg": -value, "not": ~value, "lnot": int(not value)}[kind], False
+        if kind == "bin":
+            op = node[1]
+            left, left_relative = self._evaluate(node[2], cr_names)
+            right, right_relative = self._evaluate(node[3], cr_names)
+            if op == "+" and not (left_relative and right_relative):
+                return left + right, left_relative or right_relative
+            if op == "-" and not right_relative:
+                return left - right, left_relative
+            if op == "-" and left_relative:
+                return left - right, False
+            if left_relative or right_relative:
+                raise AssemblerError("expression needs a relocation", self.line)
+            if op == "*":
+                return left * right, False
+            if op == "/":
+                return _c_divide(left, right, self.line), False
+            if op == "%":
+                return left - right * _c_divide(left, right, self.line), False
+            if op == "<<":
+                return left << right, False
+            if op == ">>":
+                return left >> right, False
+            return {"|": left | right, "&": left & right, "^": left ^ right}[op], False
+        if kind == "suffix":
+            value = self._absolute(node[2])
+            if node[1] == "l":
+                return value & 0xFFFF, False
+            if node[1] == "h":
+                return (value >> 16) & 0xFFFF, False
+            return ((value + 0x8000) >> 16) & 0xFFFF, False
+        raise AssemblerError("memory operand used as a value", self.line)
+
+    def _absolute(self, node, cr_names=False):
+        try:
+            value, relative = self._evaluate(node, cr_names)
+        except _Unresolved as e:
+            raise AssemblerError(f"undefined symbol `{e.name}'", self.line)
+        if relative:
+            raise AssemblerError("expression needs a relocation", self.line)
+        return value
+
+    # Second pass: instruction encoding
+
+    def _register(self, node, kind):
+        if node[0] == "reg":
+            if node[1] != kind:
+                raise AssemblerError(f"expected {REGISTER_KINDS[kind]} register", self.line)
+            return node[2]
+        value = self._absolute(node)
+        if not 0 <= value < (8 if kind == "cr" else 32):
+            raise AssemblerError(f"register number {value} out of range", self.line)
+        return value
+
+    def _operand(self, field, node):
+        """Parse one operand for a field into the value the instruction builders take"""
+        kind = FIELDS[field][0]
+        if kind == "gpr":
+            return self._register(node, "r")
+        if kind == "fpr":
+            return self._register(node, "f")
+        if kind == "crf":
+            return self._register(node, "cr")
+        if kind in ("mem", "memu", "mems"):
+            if node[0] != "mem":
+                raise AssemblerError("expected a d(rA) operand", self.line)
+            return self._immediate(node[1], "SIMM"), self._register(node[2], "r")
+        if kind == "crb":
+            return self._absolute(node, cr_names=True)
+        if kind == "target":
+            try:
+                return self._evaluate(node)
+            except _Unresolved as e:
+                raise AssemblerError(f"undefined symbol `{e.name}'", self.line)
+        if kind == "spr" and node[0] == "sym" and node[1].lower() in SPECIAL_REGISTERS:
+            return SPECIAL_REGISTERS[node[1].lower()]
+        return self._immediate(node, field)
+
+    def _immediate(self, node, field):
+        if node[0] == "suffix":
+            # @l/@h/@ha yield the low 16 bits, sign-extended when the field is signed
+            value = self._absolute(node)
+            return _sign_extend_16(value) if FIELDS[field][0] == "simm" else value
+        return self._absolute(node)
+
+    def _insert(self, word, field, value, mnemonic):
+        kind, shift, bits = FIELDS[field]
+        if kind == "target":
+            return word | self._displacement(word, bits, value)
+        if kind in ("mem", "memu", "mems"):
+            displacement, register = value
+            if kind != "mem" and (register == 0 or (kind == "memu" and register == (word >> 21) & 31)):
+                raise AssemblerError(f"invalid base register for {mnemonic}", self.line)
+            limit = 1 << (bits - 1)
+            if not -limit <= displacement < limit:
+                raise AssemblerError(f"displacement {displacement} out of range", self.line)
+            return word | (displacement & ((1 << bits) - 1)) | (register << 16)
+        if kind == "spr":
+            if not 0 <= value < 1024:
+                raise AssemblerError(f"special register {value} out of range", self.line)
+            return word | ((value & 31) << 16) | ((value >> 5) << 11)
+
+        if kind == "simm":
+            low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        elif kind in ("simmx", "uimmx"):
+            low, high = -(1 << (bits - 1)), (1 << bits) - 1
+        else:
+            low, high = 0, (1 << bits) - 1
+        if not low <= value <= high:
+            raise AssemblerError(f"operand out of range ({value} is not between {low} and {high})", self.line)
+        return word | ((value & ((1 << bits) - 1)) << shift)
+
+    def _displacement(self, word, bits, target):
+        value, relative = target
+        absolute = word & 2
+        if not relative and not absolute:
+            raise AssemblerError("branch to an absolute address needs a relocation", self.line)
+        if relative and absolute:
+            raise AssemblerError("absolute branch to a label needs a relocation", self.line)
+
+        displacement = value if absolute else value - self.offset
+        limit = 1 << (bits - 1)
+        if absolute and bits == 26 and value >= 0xFE000000:
+            displacement = value - 0x100000000
+        if displacement & 3 or not -limit <= displacement < limit:
+            raise AssemblerError("branch target out of range", self.line)
+        self.hint_sign = displacement < 0
+        return displacement & ((1 << bits) - 1) & ~3
+
+    def _signature(self, mnemonic):
+        """Return (word, fields, builder) for a mnemonic, including `.` and `o` variants"""
+        flags = 0
+        base = mnemonic
+        if base.endswith(".") and base not in INSTRUCTIONS and base not in ALIASES:
+            base, flags = base[:-1], 1
+        if base.endswith("o") and base not in INSTRUCTIONS and base not in ALIASES:
+            base, flags = base[:-1], flags | 0x400
+            if base not in OE and base not in ALIAS_OE:
+                return None
+        if flags & 1 and base not in RC and base not in ALIAS_RC:
+            return None
+
+        if base in ALIASES:
+            target, fields, build = ALIASES[base]
+            word, target_fields = INSTRUCTIONS[target]
+            return word | flags, fields, build, target_fields
+        if base in INSTRUCTIONS:
+            word, fields = INSTRUCTIONS[base]
+            return word | flags, fields, None, fields
+        return None
+
+    def _encode(self, mnemonic, nodes):
+        hint = None
+        if mnemonic[-1] in "+-" and mnemonic.startswith("b"):
+            mnemonic, hint = mnemonic[:-1], mnemonic[-1]
+        signature = self._signature(mnemonic)
+        if signature is None:
+            raise AssemblerError(f"unsupported instruction {mnemonic}", self.line)
+        word, fields, build, target_fields = signature
+
+        # gas skips every optional operand when fewer operands than fields are given
+        skip_optional = len(nodes) < len(fields)
+        values = []
+        remaining = iter(nodes)
+        for field in fields:
+            name = field.rstrip("?")
+            if field.endswith("?") and skip_optional:
+                values.append(FIELD_DEFAULTS.get(name, 0))
+                continue
+            node = next(remaining, None)
+            if node is None:
+                raise AssemblerError(f"{mnemonic} takes {len(fields)} operands", self.line)
+            values.append(self._operand(name, node))
+        if next(remaining, None) is not None:
+            raise AssemblerError(f"{mnemonic} takes {len(fields)} operands", self.line)
+
+        if build is not None:
+            values = build(*values)
+        self.hint_sign = None
+        for field, value in zip(target_fields, values):
+            word = self._insert(word, field.rstrip("?"), value, mnemonic)
+
+        if hint is not None:
+            bo = (word >> 21) & 31
+            if word >> 26 not in (16, 19) or (bo & 0x14) == 0x14:
+                raise AssemblerError(f"{mnemonic}{hint} does not take a branch hint", self.line)
+            if self.hint_sign is None:
+                # bclr/bcctr: + sets the prediction bit, - leaves it clear
+                set_y = hint == "+"
+            else:
+                # Static prediction reverses for backward branches
+                set_y = (hint == "+") != self.hint_sign
+            if set_y:
+                word |= 1 << 21
+        return word
+
+
+class _Unresolved(Exception):
+    def __init__(self, name):
+        # Numeric local labels are stored as "<number>\x02<definition count>"
+        self.name = name.split("\x02")[0] + (" (local label)" if "\x02" in name else "")
+        super().__init__(self.name)
+
+
+def assemble(source, symbols=None):
+    """Assemble Gekko source into raw text section bytes, raising AssemblerError if it cannot"""
+    try:
+        return Assembler(symbols).assemble(source)
+    except RecursionError:
+        raise AssemblerError("symbol definitions refer to each other")
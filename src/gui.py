@@ -13,8 +13,9 @@ from tkinter import StringVar
 import tkinter as tk
 
 import os
+import re
 from game_logic import GameLogic
-from downloadSymbols import download_symbol_files
+from downloadSymbols import download_symbol_files, prefetch_symbol_files
 from utils import GAME_TO_ID
 from credits import get_credits_text, get_about_text, get_mit_license_text
 
@@ -23,6 +24,7 @@ class App(customtkinter.CTk):
     def __init__(self):
         super().__init__()
         self.selected_game = None  # Initialize selected_game as an instance variable
+        self.symbol_table = None  # Symbols of the selected game, used for completion
 
         # configure window
         self.title("CodeFusion")
@@ -43,7 +45,15 @@ class App(customtkinter.CTk):
 
         self.is_patching = False  # Flag to control patching state
         self.logic = GameLogic()  # Instantiate GameLogic
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        # Revalidate already downloaded symbol files in the background
+        threading.Thread(target=prefetch_symbol_files, kwargs={"only_existing": True}, daemon=True).start()
+
+
+    def on_close(self):
+        self.logic.shutdown()
+        self.destroy()
 
     def create_sidebar(self):
         self.sidebar_frame = customtkinter.CTkFrame(self, width=140, corner_radius=0)
@@ -168,7 +178,7 @@ class App(customtkinter.CTk):
         output_label.place(x=20, y=80)
 
         self.output_var = StringVar(value="GeckoOS Code")
-        output_options = ["GeckoOS Code", "Patched ROM", "XDelta Patch"]
+        output_options = ["GeckoOS Code", "Patched ROM", "Baked ROM", "XDelta Patch"]
 
         output_frame = customtkinter.CTkFrame(self.gcn_wii_frame, fg_color="transparent")
         output_frame.place(x=120, y=80)
@@ -200,6 +210,26 @@ class App(customtkinter.CTk):
         )
         self.game_dropdown.place(x=120, y=140)
 
+        # Resolve game symbols with the linker instead of a `.set` prelude
+        self.link_symbols_var = tk.BooleanVar(value=False)
+        self.link_symbols_checkbox = customtkinter.CTkCheckBox(
+            self.gcn_wii_frame,
+            text="Link Symbols",
+            variable=self.link_symbols_var,
+            font=("Arial", 14)
+        )
+        self.link_symbols_checkbox.place(x=340, y=140)
+
+        # Rewrite Gecko code lists so the codehandler does less work each frame
+        self.optimize_codes_var = tk.BooleanVar(value=False)
+        self.optimize_codes_checkbox = customtkinter.CTkCheckBox(
+            self.gcn_wii_frame,
+            text="Optimize Codes",
+            variable=self.optimize_codes_var,
+            font=("Arial", 14)
+        )
+        self.optimize_codes_checkbox.place(x=480, y=140)
+
         # ROM file selection
         self.rom_file_label = customtkinter.CTkLabel(self.gcn_wii_frame, text="ROM File:", font=("Arial", 18, "bold"))
         self.rom_file_entry = customtkinter.CTkEntry(self.gcn_wii_frame, width=240)
@@ -219,6 +249,26 @@ class App(customtkinter.CTk):
         self.label2.grid(row=4, column=0, sticky="w", padx=20, pady=(20, 0))
         self.inputCode = customtkinter.CTkTextbox(self.gcn_wii_frame, height=100)
         self.inputCode.grid(row=5, column=0, padx=20, sticky="nsew")
+
+        # Symbol completion popup for the code editor
+        self.completion_list = tk.Listbox(
+            self.gcn_wii_frame,
+            height=6,
+            activestyle="none",
+            exportselection=False,
+            font=("Courier", 12),
+            bg="#343638",
+            fg="#DCE4EE",
+            selectbackground="#1F6AA5",
+            borderwidth=0,
+            highlightthickness=0
+        )
+        self.completion_list.bind("<Double-Button-1>", self.accept_completion)
+        self.inputCode.bind("<KeyRelease>", self.update_completions)
+        self.inputCode.bind("<Tab>", self.accept_completion)
+        self.inputCode.bind("<Escape>", self.hide_completions)
+        self.inputCode.bind("<Down>", lambda event: self.move_completion(1))
+        self.inputCode.bind("<Up>", lambda event: self.move_completion(-1))
         
         # Output display
         self.label3 = customtkinter.CTkLabel(self.gcn_wii_frame, text="GeckoOS Code:", font=("Arial", 14, "bold"))
@@ -230,6 +280,10 @@ class App(customtkinter.CTk):
         self.patchButton = customtkinter.CTkButton(self.gcn_wii_frame, text="Patch", command=self.patch)
         self.patchButton.grid(row=6, column=0, columnspan=2, pady=20)
 
+        # Port button, rewrites addresses for the other revision of the selected game
+        self.portButton = customtkinter.CTkButton(self.gcn_wii_frame, text="Port Revision", command=lambda: threading.Thread(target=self.logic.port_to_revision, args=(self,)).start())
+        self.portButton.grid(row=6, column=1, padx=20, pady=20, sticky="e")
+
         # Configure grid
         self.gcn_wii_frame.grid_columnconfigure(1, weight=1)
         self.gcn_wii_frame.grid_rowconfigure(5, weight=1)
@@ -251,6 +305,8 @@ class App(customtkinter.CTk):
                 self.rom_file_button.place_forget()
                 self.game_label.place_forget()
                 self.game_dropdown.place_forget()
+                self.link_symbols_checkbox.place_forget()
+                self.optimize_codes_checkbox.place(x=20, y=140)
             else:
                 # Show only ROM file selection
                 self.rom_file_label.place(x=20, y=140)
@@ -258,6 +314,11 @@ class App(customtkinter.CTk):
                 self.rom_file_button.place(x=370, y=140)
                 self.game_label.place_forget()
                 self.game_dropdown.place_forget()
+                self.link_symbols_checkbox.place_forget()
+                if self.output_var.get() == "XDelta Patch":
+                    self.optimize_codes_checkbox.place_forget()
+                else:
+                    self.optimize_codes_checkbox.place(x=480, y=140)
         
             # Move Codes section up
             self.label2.grid_configure(row=2, pady=(200, 0))
@@ -277,6 +338,7 @@ class App(customtkinter.CTk):
         else:
             self.label1.grid()
             self.insertionAddress.grid()
+            self.optimize_codes_checkbox.place_forget()
             if self.output_var.get() != "GeckoOS Code":
                 # Show ROM file selection and game selection on same line
                 self.rom_file_label.place(x=20, y=140)
@@ -284,10 +346,12 @@ class App(customtkinter.CTk):
                 self.rom_file_button.place(x=370, y=140)
                 self.game_label.place(x=480, y=140)
                 self.game_dropdown.place(x=580, y=140)
+                self.link_symbols_checkbox.place(x=800, y=140)
             else:
                 # If GeckoOS Code output, show only game selection
                 self.game_label.place(x=20, y=140)
                 self.game_dropdown.place(x=120, y=140)
+                self.link_symbols_checkbox.place(x=340, y=140)
                 self.rom_file_label.place_forget()
                 self.rom_file_entry.place_forget()
                 self.rom_file_button.place_forget()
@@ -352,6 +416,12 @@ class App(customtkinter.CTk):
             self.logic.handle_powerpc_asm_rom(self)
         elif self.input_file_var.get() == "C Code" and self.output_var.get() == "Patched ROM":
             self.logic.handle_c_code_rom(self)
+        elif self.input_file_var.get() == "GeckoOS Code" and self.output_var.get() == "Baked ROM":
+            self.logic.handle_geckoos_code_rom(self, bake=True)
+        elif self.input_file_var.get() == "PowerPC ASM" and self.output_var.get() == "Baked ROM":
+            self.logic.handle_powerpc_asm_rom(self, bake=True)
+        elif self.input_file_var.get() == "C Code" and self.output_var.get() == "Baked ROM":
+            self.logic.handle_c_code_rom(self, bake=True)
         elif self.input_file_var.get() == "GeckoOS Code" and self.output_var.get() == "XDelta Patch":
             self.logic.handle_geckoos_code_delta(self)
         elif self.input_file_var.get() == "PowerPC ASM" and self.output_var.get() == "XDelta Patch":
@@ -371,8 +441,9 @@ class App(customtkinter.CTk):
 
     def on_game_selected(self, choice):
         self.selected_game = choice
+        self.symbol_table = None
         game_id = GAME_TO_ID[choice]
-        symbol_file_path = os.path.join(os.getcwd(), f"symbols/{game_id}.sym")
+        symbol_file_path = self.logic.get_symbol_file_path(game_id)
         if choice != "None" and not os.path.exists(symbol_file_path):
             msg = CTkMessagebox(
                 master=self,
@@ -405,6 +476,68 @@ class App(customtkinter.CTk):
                         height=200
                     )
 
+        # Build the completion index once per selection so typing stays fast
+        if game_id and os.path.exists(symbol_file_path):
+            symbol_table = self.logic.get_symbols(game_id)
+            symbol_table.complete("")
+            self.symbol_table = symbol_table
+
+    def current_word(self):
+        line_before_cursor = self.inputCode.get("insert linestart", "insert")
+        match = re.search(r'[A-Za-z_.$][\w.$]*$', line_before_cursor)
+        return match.group(0) if match else ""
+
+    def update_completions(self, event):
+        if event.keysym in ("Tab", "Escape", "Up", "Down", "Return"):
+            return
+        prefix = self.current_word()
+        if self.symbol_table is None or len(prefix) < 2:
+            self.hide_completions()
+            return
+
+        matches = self.symbol_table.complete(prefix, limit=8)
+        if not matches or matches == [prefix]:
+            self.hide_completions()
+            return
+
+        self.completion_list.delete(0, tk.END)
+        for name in matches:
+            self.completion_list.insert(tk.END, name)
+        self.completion_list.selection_set(0)
+        self.completion_list.configure(height=len(matches))
+
+        # Show the popup just below the cursor
+        cursor_box = self.inputCode.bbox("insert")
+        if cursor_box:
+            x, y, _, height = cursor_box
+            self.completion_list.place(in_=self.inputCode, x=x, y=y + height)
+            self.completion_list.lift()
+
+    def move_completion(self, step):
+        if not self.completion_list.winfo_ismapped():
+            return None
+        selection = self.completion_list.curselection()
+        index = (selection[0] if selection else 0) + step
+        index = max(0, min(index, self.completion_list.size() - 1))
+        self.completion_list.selection_clear(0, tk.END)
+        self.completion_list.selection_set(index)
+        return "break"
+
+    def accept_completion(self, event=None):
+        if not self.completion_list.winfo_ismapped():
+            return None
+        selection = self.completion_list.curselection()
+        if selection:
+            prefix = self.current_word()
+            self.inputCode.delete(f"insert-{len(prefix)}c", "insert")
+            self.inputCode.insert("insert", self.completion_list.get(selection[0]))
+        self.hide_completions()
+        self.inputCode.focus_set()
+        return "break"
+
+    def hide_completions(self, event=None):
+        self.completion_list.place_forget()
+
     def validate_hex_input(self, event):
         current_value = self.insertionAddress.get("1.0", "end-1c")
         # Filter out non-hex characters
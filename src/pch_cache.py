@@ -0,0 +1,96 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from toolchain import get_toolchain
+from cCompiler import GCC_FLAGS
+
+
+def header_tree_stamps(include_dir):
+    """Return [relative path, size, mtime] for every header under include_dir, in a stable order"""
+    stamps = []
+    for root, dirs, files in os.walk(include_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".h"):
+                stat = os.stat(os.path.join(root, name))
+                stamps.append([os.path.relpath(os.path.join(root, name), include_dir), stat.st_size, stat.st_mtime_ns])
+    return stamps
+
+
+class PrecompiledHeaderCache:
+    """GCC precompiled game headers, built on first use and shared by every compile
+
+    Each entry directory holds a one-line wrapper header that includes the
+    real game header, and the wrapper's .gch next to it. Compiles
+    force-include the wrapper; gcc loads the .gch in its place, or parses
+    the real header if it rejects the .gch. Entries are keyed by the header,
+    the compiler flags, the toolchain and the size and mtime of every header
+    in the include tree, so editing any of them builds a new one.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(header_path, flags):
+        stamps = header_tree_stamps(os.path.dirname(header_path))
+        parts = [header_path, flags, stamps, get_toolchain().identity()]
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+    def get(self, header_path, flags=GCC_FLAGS):
+        """Return the header to force-include in place of header_path, or None if gcc cannot precompile it"""
+        key = self.make_key(header_path, flags)
+        wrapper_path = os.path.join(self.cache_dir, key, os.path.basename(header_path))
+        if os.path.exists(wrapper_path + ".gch"):
+            return wrapper_path
+
+        with self._lock:
+            if key in self._failed:
+                return None
+            if not os.path.exists(wrapper_path + ".gch") and not self._build(header_path, flags, key):
+                self._failed.add(key)
+                return None
+        return wrapper_path
+
+    def _build(self, header_path, flags, key):
+        cmd = get_toolchain().command("gcc")
+        if cmd is None:
+            return False
+
+        # Build in a private directory, then rename it into place so other processes never see half a .gch
+        os.makedirs(self.cache_dir, exist_ok=True)
+        build_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".building-")
+        wrapper_path = os.path.join(build_dir, os.path.basename(header_path))
+        with open(wrapper_path, "w") as wrapper_file:
+            wrapper_file.write(f'#include "{header_path}"\n')
+
+        cmd.extend([flag for flag in flags if flag != "-S"] + ["-x", "c-header", wrapper_path, "-o", wrapper_path + ".gch"])
+        try:
+            result = subprocess.run(cmd, env=get_toolchain().env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                print(f"Could not precompile {header_path}; compiling it with every build instead: {result.stderr.decode(errors='replace')}")
+                return False
+            try:
+                os.rename(build_dir, os.path.join(self.cache_dir, key))
+            except OSError:
+                pass  # another process finished the same header first
+            print(f"Precompiled {header_path}.")
+            return True
+        except OSError as e:
+            print(f"Error while precompiling {header_path}: {e}")
+            return False
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
@@ -0,0 +1,134 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import re
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from gecko import ADDRESSED_CODE_TYPES, code_kind, payload_rows
+
+ASM_ADDRESS_PATTERN = re.compile(r'\b0x(8[01][0-9A-Fa-f]{6})\b')
+GECKO_LINE_PATTERN = re.compile(r'^\s*([0-9A-Fa-f]{8})\s+([0-9A-Fa-f]{8})')
+
+
+class AddressRemapper:
+    """Piecewise address translation between two revisions of a game
+
+    Symbols present in both tables are joined by name. Each pair covers
+    the overlap of its two sizes and shifts it by the difference of its
+    start addresses. Neighbouring pieces with the same shift are merged
+    across the gap between them, since unnamed code between two symbols
+    that moved together moved with them.
+    """
+
+    def __init__(self, source_symbols, target_symbols):
+        target_rows = {name: i for i, name in enumerate(target_symbols.names)}
+        pieces = []
+
+        for row, name in enumerate(source_symbols.names):
+            target_row = target_rows.get(name)
+            if target_row is None or name.startswith('@'):
+                continue
+            start = source_symbols.addresses[row]
+            size = max(min(source_symbols.sizes[row], target_symbols.sizes[target_row]), 1)
+            pieces.append((start, start + size, target_symbols.addresses[target_row] - start))
+
+        pieces.sort()
+        self.starts = array('I')
+        self.ends = array('Q')
+        self.deltas = array('q')
+
+        for start, end, delta in pieces:
+            if self.starts and start < self.ends[-1]:
+                continue  # Overlaps the previous piece; keep the first mapping
+            if self.deltas and self.deltas[-1] == delta:
+                self.ends[-1] = end
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.deltas.append(delta)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def translate(self, address):
+        """Return the address in the target revision, or None if no piece covers it"""
+        i = bisect_right(self.starts, address) - 1
+        if i < 0 or address >= self.ends[i]:
+            return None
+        return (address + self.deltas[i]) & 0xFFFFFFFF
+
+    def remap_asm(self, asm_text):
+        """Rewrite every 0x80xxxxxx/0x81xxxxxx literal in assembly source
+
+        Returns the new text and the (line number, address) of every literal
+        that no piece covers; those are left unchanged.
+        """
+        unmapped = []
+        line_starts = list(accumulate((len(line) for line in asm_text.splitlines(True)), initial=0))
+
+        def replacement(match):
+            address = int(match.group(1), 16)
+            translated = self.translate(address)
+            if translated is None:
+                unmapped.append((bisect_right(line_starts, match.start()), address))
+                return match.group(0)
+            return f"0x{translated:08X}"
+
+        return ASM_ADDRESS_PATTERN.sub(replacement, asm_text), unmapped
+
+    def remap_gecko_codes(self, code_text):
+        """Rewrite the target address of every code in a Gecko code list
+
+        Payloads are copied as-is; port assembly source with remap_asm.
+        Returns the new text and the (line number, address) of every code
+        address that no piece covers; those lines are left unchanged.
+        """
+        lines = code_text.splitlines()
+        unmapped = []
+        remaining = 0  # Payload lines left in the current code
+
+        for line_number, line in enumerate(lines, 1):
+            match = GECKO_LINE_PATTERN.match(line)
+            if not match:
+                if line.lstrip().startswith("$"):
+                    remaining = 0  # A new entry always starts a new code
+                continue
+            if remaining:
+                remaining -= 1
+                continue
+
+            first, second = int(match.group(1), 16), int(match.group(2), 16)
+            remaining = payload_rows(code_kind(first), first, second)
+            code_type = first >> 24 & 0xFE
+            if code_type not in ADDRESSED_CODE_TYPES:
+                continue
+
+            address = 0x80000000 | (first & 0x01FFFFFF)
+            endif_flag = 0
+            if 0x20 <= code_type <= 0x2E:
+                endif_flag = address & 1  # Low bit of a conditional's address is the endif flag
+                address &= ~1
+            translated = self.translate(address)
+            if translated is None or translated >> 25 != 0x80000000 >> 25:
+                unmapped.append((line_number, address))
+                continue
+            new_first = (first & 0xFE000000) | (translated & 0x01FFFFFF) | endif_flag
+
+            new_second = second
+            if code_type == 0xC6:
+                translated_target = self.translate(second)
+                if translated_target is None:
+                    unmapped.append((line_number, second))
+                else:
+                    new_second = translated_target
+
+            start, end = match.span(2)
+            lines[line_number - 1] = (line[:match.start(1)] + f"{new_first:08X}" + line[match.end(1):start]
+                                      + f"{new_second:08X}" + line[end:])
+
+        return "\n".join(lines), unmapped
@@ -0,0 +1,185 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from symbol_processor import SymbolTable, SYMBOL_COLUMNS
+
+# On-disk layout of a .idx file (all integers big-endian):
+#   header  - magic, version, source mtime/size, source SHA-1, symbol count, section/name blob lengths
+#   body    - one packed array per SYMBOL_COLUMNS entry, then the section names
+#             and symbol names, each joined with NUL bytes
+INDEX_MAGIC = b"CFSI"
+INDEX_VERSION = 2
+INDEX_EXTENSION = ".idx"
+LINKER_SCRIPT_EXTENSION = ".ld"
+# Symbol sources looked up for a game, in order of preference
+SYMBOL_FILE_EXTENSIONS = (".sym", ".map", ".elf")
+_LINKER_SCRIPT_HEADER = "/* CodeFusion symbols sha1:{} */\n"
+_HEADER = struct.Struct(">4sHxxqQ20sIII")
+
+# Indexes already loaded in this process, keyed by symbol file path
+_loaded_indexes = {}
+
+
+def find_symbol_file(symbol_dir, game_id):
+    """Return the first existing symbol source for a game, defaulting to the dtk .sym path"""
+    for extension in SYMBOL_FILE_EXTENSIONS:
+        path = os.path.join(symbol_dir, game_id + extension)
+        if os.path.exists(path):
+            return path
+    return os.path.join(symbol_dir, game_id + SYMBOL_FILE_EXTENSIONS[0])
+
+
+def get_index_path(symbol_file_path):
+    return os.path.splitext(symbol_file_path)[0] + INDEX_EXTENSION
+
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _write_atomically(path, chunks):
+    """Write byte chunks to a unique temp file beside path, then rename it over path
+
+    Each writer gets its own temp file, so batch workers building the same
+    file never interleave; the last rename wins with a complete file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            outfile.writelines(chunks)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _write_index(index_path, index, source_stat):
+    columns = []
+    for column, typecode in SYMBOL_COLUMNS:
+        values = array(typecode, getattr(index, column))
+        if sys.byteorder == 'little':
+            values.byteswap()
+        columns.append(values.tobytes())
+    section_blob = '\0'.join(index.section_names).encode('utf-8')
+    name_blob = '\0'.join(index.names).encode('utf-8')
+
+    header = _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, source_stat.st_mtime_ns, source_stat.st_size,
+                          index.source_hash, len(index.names), len(section_blob), len(name_blob))
+
+    # Write next to the final file and rename so a crash never leaves a torn index
+    _write_atomically(index_path, [header, *columns, section_blob, name_blob])
+
+
+def _read_index(index_path):
+    """Memory-map an index file and return (source stamp, SymbolTable), or None if unusable"""
+    try:
+        with open(index_path, 'rb') as infile:
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if len(mapped) < _HEADER.size:
+                    return None
+                (magic, version, mtime_ns, size, source_hash,
+                 count, section_len, name_len) = _HEADER.unpack_from(mapped, 0)
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    return None
+                columns_len = sum(array(typecode).itemsize * count for _, typecode in SYMBOL_COLUMNS)
+                if len(mapped) != _HEADER.size + columns_len + section_len + name_len:
+                    return None
+
+                offset = _HEADER.size
+                columns = {}
+                for column, typecode in SYMBOL_COLUMNS:
+                    values = array(typecode)
+                    end = offset + values.itemsize * count
+                    values.frombytes(mapped[offset:end])
+                    if sys.byteorder == 'little':
+                        values.byteswap()
+                    columns[column] = values
+                    offset = end
+
+                section_names = mapped[offset:offset + section_len].decode('utf-8').split('\0')
+                offset += section_len
+                names = mapped[offset:offset + name_len].decode('utf-8').split('\0') if count else []
+    except (OSError, ValueError, UnicodeDecodeError):
+        return None
+
+    return (mtime_ns, size), SymbolTable(names, section_names=section_names, source_hash=source_hash, **columns)
+
+
+def build_symbol_index(symbol_file_path):
+    """Parse a symbol file and write its .idx next to it"""
+    source_stat = os.stat(symbol_file_path)
+    index = SymbolTable.from_file(symbol_file_path)
+
+    try:
+        _write_index(get_index_path(symbol_file_path), index, source_stat)
+        print(f"Built symbol index for {symbol_file_path} ({len(index)} symbols).")
+    except OSError as e:
+        print(f"Error while writing symbol index for {symbol_file_path}: {e}")
+
+    return index
+
+
+def load_symbol_index(symbol_file_path):
+    """Return the SymbolTable for a symbol file, rebuilding its index only when the source changed"""
+    source_stat = os.stat(symbol_file_path)
+    stamp = (source_stat.st_mtime_ns, source_stat.st_size)
+
+    cached = _loaded_indexes.get(symbol_file_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    index_path = get_index_path(symbol_file_path)
+    result = _read_index(index_path)
+    index = None
+
+    if result is not None:
+        index_stamp, candidate = result
+        if index_stamp == stamp:
+            index = candidate
+        elif _hash_file(symbol_file_path) == candidate.source_hash:
+            # Touched but unchanged; refresh the stored mtime so the next load skips hashing
+            try:
+                _write_index(index_path, candidate, source_stat)
+            except OSError:
+                pass
+            index = candidate
+
+    if index is None:
+        index = build_symbol_index(symbol_file_path)
+
+    _loaded_indexes[symbol_file_path] = (stamp, index)
+    return index
+
+
+def get_linker_script(symbol_file_path):
+    """Return the path of the linker script for a symbol file, regenerating it only when the source changed"""
+    index = load_symbol_index(symbol_file_path)
+    script_path = os.path.splitext(symbol_file_path)[0] + LINKER_SCRIPT_EXTENSION
+    expected_header = _LINKER_SCRIPT_HEADER.format(index.source_hash.hex())
+
+    try:
+        with open(script_path, 'r') as script_file:
+            if script_file.readline() == expected_header:
+                return script_path
+    except OSError:
+        pass
+
+    _write_atomically(script_path, [(expected_header + index.linker_script()).encode('utf-8')])
+    print(f"Generated linker script {script_path}.")
+
+    return script_path
@@ -5,18 +5,370 @@
 # License: MIT
 # ===========================================
 
+import hashlib
+import mmap
 import re
 import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from elf32 import ElfFile
+
+DTK_SYMBOL_PATTERN = re.compile(rb'(\S+)\s*=\s*(?:([^\s:]+):)?0x([0-9A-Fa-f]+);(?:\s*//(.*))?')
+CW_MAP_SECTION_PATTERN = re.compile(rb'^(\S+) section layout')
+CW_MAP_SYMBOL_PATTERN = re.compile(
+    rb'^\s+[0-9A-Fa-f]{8}\s+([0-9A-Fa-f]+)\s+([0-9A-Fa-f]{8})(?:\s+[0-9A-Fa-f]{8})?\s+(?:\d+\s+)?(\S+)(\s+\(entry of)?')
+CW_MAP_LINKER_SYMBOL_PATTERN = re.compile(rb'^\s+(\S+)\s+([0-9A-Fa-f]{8})\s*$')
+ASM_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_.$][\w.$]*')
+PLAIN_SYMBOL_PATTERN = re.compile(r'[A-Za-z_.$][\w.$]*\Z')
+
+# dtk `type:` and `scope:` values, stored in the table as their position in these tuples
+SYMBOL_KINDS = ("unknown", "function", "object", "label")
+SYMBOL_SCOPES = ("unknown", "global", "local", "weak")
+
+# Column name and array typecode of every per-symbol column besides the names
+SYMBOL_COLUMNS = (("addresses", 'I'), ("sizes", 'I'), ("sections", 'H'), ("kinds", 'B'), ("scopes", 'B'))
+
+Symbol = namedtuple("Symbol", ["name", "address", "size", "section", "kind", "scope"])
+
+# ELF symbol types and bindings mapped to SYMBOL_KINDS / SYMBOL_SCOPES codes
+ELF_SYMBOL_KINDS = {0: 3, 1: 2, 2: 1}  # STT_NOTYPE, STT_OBJECT, STT_FUNC
+ELF_SYMBOL_SCOPES = {0: 2, 1: 1, 2: 3}  # STB_LOCAL, STB_GLOBAL, STB_WEAK
+
+
+class SymbolTable:
+    """In-memory game symbol table that renders straight into build input
+
+    Symbols are stored column-wise: `names` is a list and every other
+    attribute is an array with one entry per symbol. Sections are stored
+    as indexes into `section_names`, whose first entry is the empty
+    section used by absolute symbols.
+    """
+
+    def __init__(self, names=None, addresses=None, sizes=None, sections=None, kinds=None, scopes=None,
+                 section_names=None, source_hash=None):
+        self.names = names if names is not None else []
+        self.addresses = addresses if addresses is not None else array('I')
+        count = len(self.names)
+        self.sizes = sizes if sizes is not None else array('I', bytes(4 * count))
+        self.sections = sections if sections is not None else array('H', bytes(2 * count))
+        self.kinds = kinds if kinds is not None else array('B', bytes(count))
+        self.scopes = scopes if scopes is not None else array('B', bytes(count))
+        self.section_names = section_names if section_names is not None else [""]
+        self.source_hash = source_hash
+        self._section_codes = None
+        self._positions = None
+        self._order = None
+        self._sorted_addresses = None
+        self._sorted_names = None
+        self._set_directives = None
+
+    @classmethod
+    def from_file(cls, input_file):
+        """Parse a symbol file, detecting whether it is an ELF, a CodeWarrior map or a dtk symbols.txt"""
+        with open(input_file, 'rb') as infile:
+            head = infile.read(4096)
+        if head.startswith(b'\x7fELF'):
+            return cls.from_elf_file(input_file)
+        if b' section layout' in head or b'Link map of' in head:
+            return cls.from_cw_map_file(input_file)
+        return cls.from_dtk_file(input_file)
+
+    @classmethod
+    def from_dtk_file(cls, input_file):
+        """Parse a dtk symbols.txt file in one streaming pass, hashing it along the way"""
+        table = cls()
+        kind_codes = {kind.encode(): i for i, kind in enumerate(SYMBOL_KINDS)}
+        scope_codes = {scope.encode(): i for i, scope in enumerate(SYMBOL_SCOPES)}
+        digest = hashlib.sha1()
+
+        with open(input_file, 'rb') as infile:
+            for line in infile:
+                digest.update(line)
+                match = DTK_SYMBOL_PATTERN.match(line)
+                if not match:
+                    continue
+
+                label, section, address, comment = match.groups()
+                size = kind = scope = 0
+                if comment:
+                    for attribute in comment.split():
+                        key, _, value = attribute.partition(b':')
+                        if key == b'type':
+                            kind = kind_codes.get(value, 0)
+                        elif key == b'size':
+                            size = int(value, 0)
+                        elif key == b'scope':
+                            scope = scope_codes.get(value, 0)
+
+                table.append(label.decode('utf-8'), int(address, 16), size, section or b"", kind, scope)
+
+        table.source_hash = digest.digest()
+        return table
+
+    @classmethod
+    def from_cw_map_file(cls, input_file):
+        """Parse a CodeWarrior linker map in one streaming pass
+
+        Only the section layout tables and the linker generated symbols are
+        read; section and object file entries are skipped. Symbols in .init
+        and .text are functions, everything else is an object.
+        """
+        table = cls()
+        digest = hashlib.sha1()
+        section = None
+        in_linker_symbols = False
+
+        with open(input_file, 'rb') as infile:
+            for line in infile:
+                digest.update(line)
+
+                match = CW_MAP_SECTION_PATTERN.match(line)
+                if match:
+                    section = match.group(1)
+                    in_linker_symbols = False
+                    continue
+                if line.startswith(b'Linker generated symbols'):
+                    section = None
+                    in_linker_symbols = True
+                    continue
+                if line.strip() and not line[:1].isspace():
+                    # Any other unindented line ends the table we were in
+                    section = None
+                    in_linker_symbols = False
+                    continue
+
+                if in_linker_symbols:
+                    match = CW_MAP_LINKER_SYMBOL_PATTERN.match(line)
+                    if match:
+                        table.append(match.group(1).decode('utf-8'), int(match.group(2), 16), kind=3, scope=1)
+                    continue
+                if section is None:
+                    continue
+
+                match = CW_MAP_SYMBOL_PATTERN.match(line)
+                if not match:
+                    continue
+                size, address, label, entry_of = match.groups()
+                if label.startswith(b'.'):
+                    continue  # Section or object file chunk, not a symbol
+                if entry_of:
+                    kind = 3
+                elif section in (b'.init', b'.text'):
+                    kind = 1
+                else:
+                    kind = 2
+                table.append(label.decode('utf-8'), int(address, 16), int(size, 16), section, kind)
+
+        table.source_hash = digest.digest()
+        return table
+
+    @classmethod
+    def from_elf_file(cls, input_file):
+        """Read the .symtab of an ELF32 file through a memory map"""
+        table = cls()
+
+        with open(input_file, 'rb') as infile:
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                try:
+                    elf = ElfFile(data)
+                except ValueError:
+                    raise ValueError(f"{input_file} is not an ELF32 file")
+                section_names = [section.name.encode('utf-8') for section in elf.sections]
+
+                for symbol in elf.symbols():
+                    kind = ELF_SYMBOL_KINDS.get(symbol.kind)
+                    if kind is None or symbol.section == 0 or not symbol.name:
+                        continue  # Sections, files and undefined symbols
+                    section = section_names[symbol.section] if symbol.section < len(section_names) else b""
+                    table.append(symbol.name, symbol.value, symbol.size, section, kind,
+                                 ELF_SYMBOL_SCOPES.get(symbol.binding, 0))
+
+                table.source_hash = hashlib.sha1(data).digest()
+                elf.release()
+
+        return table
+
+    def append(self, name, address, size=0, section=b"", kind=0, scope=0):
+        """Add one symbol; section is the raw section name as bytes"""
+        section_codes = self._section_codes
+        if section_codes is None:
+            section_codes = self._section_codes = {name.encode('utf-8'): i for i, name in enumerate(self.section_names)}
+        section_code = section_codes.get(section)
+        if section_code is None:
+            section_code = section_codes[section] = len(self.section_names)
+            self.section_names.append(section.decode('utf-8'))
+
+        self.names.append(name)
+        self.addresses.append(address & 0xFFFFFFFF)
+        self.sizes.append(size)
+        self.sections.append(section_code)
+        self.kinds.append(kind)
+        self.scopes.append(scope)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._get_positions()
+
+    def __iter__(self):
+        return zip(self.names, self.addresses)
+
+    def _get_positions(self):
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.names)}
+        return self._positions
+
+    def _get_order(self):
+        if self._order is None:
+            addresses = self.addresses
+            self._order = array('I', sorted(range(len(addresses)), key=addresses.__getitem__))
+            self._sorted_addresses = array('I', (addresses[i] for i in self._order))
+        return self._order
+
+    def _get_sorted_names(self):
+        if self._sorted_names is None:
+            self._sorted_names = sorted({name for name in self.names if not name.startswith('@')})
+        return self._sorted_names
+
+    def complete(self, prefix, limit=10):
+        """Return up to limit symbol names starting with prefix, in sorted order"""
+        names = self._get_sorted_names()
+        i = bisect_left(names, prefix)
+        matches = []
+        while i < len(names) and len(matches) < limit and names[i].startswith(prefix):
+            matches.append(names[i])
+            i += 1
+        return matches
+
+    def lookup(self, name):
+        """Return the address of a symbol, or None if it is unknown"""
+        position = self._get_positions().get(name)
+        return None if position is None else self.addresses[position]
+
+    def get(self, name):
+        """Return the full Symbol record for a name, or None if it is unknown"""
+        position = self._get_positions().get(name)
+        return None if position is None else self.symbol_at(position)
+
+    def symbol_at(self, position):
+        return Symbol(self.names[position], self.addresses[position], self.sizes[position],
+                      self.section_names[self.sections[position]], SYMBOL_KINDS[self.kinds[position]],
+                      SYMBOL_SCOPES[self.scopes[position]])
+
+    def resolve(self, address):
+        """Return (row, offset) of the symbol containing an address, or None
+
+        Symbols without a size only match their exact address, so labels
+        inside a function do not hide the function around them.
+        """
+        order = self._get_order()
+        sorted_addresses = self._sorted_addresses
+        sizes = self.sizes
+        i = bisect_right(sorted_addresses, address) - 1
+
+        # Walk back past size-0 labels and symbols sharing a start address to
+        # the nearest sized symbol; stop once one of those falls short
+        while i >= 0:
+            start = sorted_addresses[i]
+            row = order[i]
+            offset = address - start
+            if offset < sizes[row] or offset == 0:
+                return row, offset
+            if sizes[row] and (i == 0 or sorted_addresses[i - 1] != start):
+                return None
+            i -= 1
+        return None
+
+    def describe(self, address):
+        """Format an address as `symbol+0xOFFSET`, or None if no symbol covers it"""
+        found = self.resolve(address)
+        if found is None:
+            return None
+        row, offset = found
+        return f"{self.names[row]}+0x{offset:X}" if offset else self.names[row]
+
+    def query(self, start=0, end=0x100000000, kind=None, section=None):
+        """Return the rows of the symbols in [start, end) in address order
+
+        kind and section optionally restrict the result, e.g.
+        query(a, b, kind="function", section=".text").
+        """
+        order = self._get_order()
+        lo = bisect_left(self._sorted_addresses, start)
+        hi = bisect_left(self._sorted_addresses, end)
+        rows = order[lo:hi]
+
+        if kind is not None:
+            kind_code = SYMBOL_KINDS.index(kind)
+            kinds = self.kinds
+            rows = [i for i in rows if kinds[i] == kind_code]
+        if section is not None:
+            if section not in self.section_names:
+                return []
+            section_code = self.section_names.index(section)
+            sections = self.sections
+            rows = [i for i in rows if sections[i] == section_code]
+
+        return list(rows)
+
+    def referenced_positions(self, asm_text):
+        """Return the sorted rows of every symbol named in some assembly text"""
+        return self.named_positions(ASM_IDENTIFIER_PATTERN.findall(asm_text))
+
+    def named_positions(self, words):
+        """Return the sorted rows of the symbols among a collection of identifiers"""
+        positions = self._get_positions()
+        return sorted({positions[word] for word in set(words) if word in positions})
+
+    def set_directives(self, asm_text=None, words=None):
+        """Render the symbols as `.set` lines for the assembler
+
+        When asm_text, or the identifiers already collected from it as
+        words, is given only the symbols it references are emitted.
+        """
+        if asm_text is None and words is None:
+            if self._set_directives is None:
+                self._set_directives = self._render_set(range(len(self.names)))
+            return self._set_directives
+
+        rows = self.named_positions(words) if words is not None else self.referenced_positions(asm_text)
+        positions = [i for i in rows if not self.names[i].startswith('@')]
+        directives = self._render_set(positions)
+        full_size = len(self.set_directives())
+        saved = full_size - len(directives)
+        print(f"Symbol prelude: emitted {len(positions)} of {len(self.names)} symbols, "
+              f"saved {saved} bytes ({saved * 100 // max(full_size, 1)}%) of assembler input.")
+        return directives
+
+    def linker_script(self):
+        """Render the symbols as linker script assignments"""
+        lines = []
+        for name, address in self:
+            if name.startswith('@'):
+                continue
+            if not PLAIN_SYMBOL_PATTERN.match(name):
+                name = f'"{name}"'
+            lines.append(f"{name} = 0x{address:08X};\n")
+        return ''.join(lines)
+
+    def lst_lines(self):
+        """Render the symbols in the `address:name` .lst format"""
+        return ''.join(f'{address:08X}:{name}\n' for name, address in self)
+
+    def _render_set(self, positions):
+        names = self.names
+        addresses = self.addresses
+        lines = [f".set {names[i]},0x{addresses[i]:08X}" for i in positions if not names[i].startswith('@')]
+        return '\n'.join(lines) + '\n'
+
 
 def dtkSymbolsTxtToLst(input_file, output_file):
-    pattern = re.compile(r'(\S+)\s*=\s*(?:\S+:)?(0x[0-9A-Fa-f]+);')
-
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-        for line in infile:
-            match = pattern.match(line)
-            if match:
-                label, address = match.groups()
-                outfile.write(f'{address[2:]}:{label}\n')
+    symbols = SymbolTable.from_dtk_file(input_file)
+
+    with open(output_file, 'w') as outfile:
+        outfile.write(symbols.lst_lines())
 
 
 def parse_lst_file(lst_file_path, output_filename):
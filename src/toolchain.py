@@ -0,0 +1,129 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+from wine_session import get_wine_session
+
+# Host cross toolchains to look for, most preferred first (devkitPPC, then distro packages)
+NATIVE_PREFIXES = ("powerpc-eabi-", "powerpc-unknown-eabi-", "powerpc-linux-gnu-")
+TOOLS = ("gcc", "as", "ld", "objcopy")
+
+# Windows executables shipped in dependencies/, run under wine on other hosts
+BUNDLED_TOOLS = {
+    "gcc": ("powerpc-gcc", "bin", "powerpc-eabi-gcc.exe"),
+    "as": ("codewrite", "powerpc-gekko-as.exe"),
+    "ld": ("codewrite", "powerpc-gekko-ld.exe"),
+    "objcopy": ("codewrite", "powerpc-gekko-objcopy.exe")
+}
+
+
+class Toolchain:
+    """The PowerPC gcc/as/ld/objcopy used for builds
+
+    A native host toolchain runs directly; the bundled Windows one is
+    wrapped with wine on non-Windows hosts.
+    """
+
+    def __init__(self, paths, native, versions):
+        self.paths = paths
+        self.native = native
+        self.versions = versions
+        self.wine = get_wine_session()
+
+    @property
+    def env(self):
+        return None if self.native else self.wine.env
+
+    def command(self, tool):
+        """Return the command list that runs a tool, or None if it is missing"""
+        path = self.paths.get(tool)
+        if path is None or not os.path.exists(path):
+            print(f"Error: {tool} executable not found at {path}")
+            return None
+        return [path] if self.native else self.wine.command([path])
+
+    def identity(self):
+        """Describe the toolchain for build cache keys"""
+        identity = []
+        for tool in TOOLS:
+            path = self.paths.get(tool)
+            try:
+                stat = os.stat(path)
+                identity.append([tool, path, stat.st_size, stat.st_mtime_ns, self.versions.get(tool)])
+            except (OSError, TypeError):
+                identity.append([tool, path, None, None, None])
+        return identity
+
+    def describe(self):
+        kind = "native" if self.native else "bundled"
+        return f"{kind} toolchain ({self.versions.get('gcc') or self.paths.get('gcc')})"
+
+
+def _tool_version(path):
+    """Return the first line of `tool --version`, or None if it does not run"""
+    try:
+        result = subprocess.run([path, "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout.decode(errors="replace").splitlines()[0].strip()
+
+
+def find_native_toolchain():
+    """Find a host powerpc gcc/as/ld/objcopy set whose tools all run"""
+    search_dirs = []
+    devkitppc = os.environ.get("DEVKITPPC")
+    if devkitppc:
+        search_dirs.append(os.path.join(devkitppc, "bin"))
+
+    for prefix in NATIVE_PREFIXES:
+        paths = {}
+        for tool in TOOLS:
+            path = None
+            for directory in search_dirs:
+                candidate = os.path.join(directory, prefix + tool)
+                if os.access(candidate, os.X_OK):
+                    path = candidate
+                    break
+            paths[tool] = path or shutil.which(prefix + tool)
+        if not all(paths.values()):
+            continue
+
+        versions = {tool: _tool_version(path) for tool, path in paths.items()}
+        if all(versions.values()):
+            return Toolchain(paths, True, versions)
+        print(f"Ignoring {prefix}* toolchain: not every tool runs.")
+    return None
+
+
+def bundled_toolchain(base_path):
+    paths = {tool: os.path.join(base_path, "dependencies", *parts) for tool, parts in BUNDLED_TOOLS.items()}
+    return Toolchain(paths, False, {})
+
+
+_toolchain = None
+_toolchain_lock = threading.Lock()
+
+def get_toolchain(base_path=None):
+    """Detect and validate the toolchain once per process, preferring a native one off Windows"""
+    global _toolchain
+    with _toolchain_lock:
+        if _toolchain is None:
+            if base_path is None:
+                base_path = sys._MEIPASS if getattr(sys, 'frozen', False) else os.getcwd()
+            if platform.system() != "Windows":
+                _toolchain = find_native_toolchain()
+            if _toolchain is None:
+                _toolchain = bundled_toolchain(base_path)
+            print(f"Using {_toolchain.describe()}.")
+        return _toolchain
@@ -16,6 +16,12 @@ GAME_TO_ID = {
     "Mario Party 7 (USA)": "GP7E01"
 }
 
+# Revisions of the same game whose code lists can be ported between each other
+GAME_REVISIONS = {
+    "GMPE01_00": "GMPE01_01",
+    "GMPE01_01": "GMPE01_00"
+}
+
 # Mapping of game IDs to their symbol file URLs
 SYMBOL_URL_MAPPING = {
     "GMPE01_00": "https://raw.githubusercontent.com/mariopartyrd/marioparty4/refs/heads/main/config/GMPE01_00/symbols.txt",
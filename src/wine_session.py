@@ -0,0 +1,79 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import os
+import platform
+import shutil
+import subprocess
+import threading
+
+class WineSession:
+    """Runs the bundled Windows tools, keeping one wineserver warm for every call
+
+    Starting wine from cold pays for wineserver startup and prefix loading on
+    every tool invocation. start() launches a persistent wineserver and warms
+    the prefix once, so later calls only pay for the tool itself. On Windows
+    every method is a no-op passthrough.
+    """
+
+    def __init__(self):
+        self.enabled = platform.system() != "Windows"
+        self.env = {**os.environ, "WINEDEBUG": "-all"} if self.enabled else None
+        self.started = False
+        self._lock = threading.Lock()
+
+    def command(self, cmd):
+        """Prefix a tool command with wine when not running on Windows"""
+        return ["wine"] + cmd if self.enabled else cmd
+
+    def _server_running(self):
+        if shutil.which("pgrep") is None:
+            return False
+        result = subprocess.run(["pgrep", "-x", "wineserver"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return result.returncode == 0
+
+    def start(self):
+        """Start a persistent wineserver and warm the prefix, unless one is already up"""
+        with self._lock:
+            if not self.enabled or self.started or shutil.which("wineserver") is None:
+                return
+            if self._server_running():
+                print("Reusing the running wineserver.")
+                return
+
+            try:
+                subprocess.run(["wineserver", "-p"], env=self.env, check=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self.started = True
+                # The first wine process loads the prefix; pay that cost now instead of on the first build
+                subprocess.run(self.command(["cmd", "/c", "exit"]), env=self.env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+                print("Started persistent wineserver.")
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"Error while starting wineserver: {e}")
+
+    def stop(self):
+        """Shut down the wineserver if this session started it"""
+        with self._lock:
+            if not self.started:
+                return
+            try:
+                subprocess.run(["wineserver", "-k"], env=self.env, timeout=30,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                print("Stopped persistent wineserver.")
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"Error while stopping wineserver: {e}")
+            self.started = False
+
+_session = None
+
+def get_wine_session():
+    """Return the process-wide wine session"""
+    global _session
+    if _session is None:
+        _session = WineSession()
+    return _session
@@ -0,0 +1,38 @@
+# ============================================
+# CodeFusion
+# Author: Tabitha Hanegan (naylahanegan@gmail.com)
+# Date: 4/21/2025
+# License: MIT
+# ===========================================
+
+import os
+import shutil
+import tempfile
+
+WORKSPACE_PREFIX = "codefusion-"
+
+
+class Workspace:
+    """A private scratch directory for one build job
+
+    Every intermediate file of a job (temp.asm, a.out, b.out, the extracted
+    ISO, ...) lives here instead of the current directory, so any number of
+    builds can run at once without clobbering each other. Tools are always
+    given absolute paths into the workspace.
+    """
+
+    def __init__(self, root=None):
+        self.path = tempfile.mkdtemp(prefix=WORKSPACE_PREFIX, dir=root)
+
+    def file(self, *parts):
+        """Return the absolute path of a file inside the workspace"""
+        return os.path.join(self.path, *parts)
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()